@@ -32,50 +32,21 @@ while [[ $# -gt 0 ]]; do
     esac
 done
 
-# Step 0: Login and Save Session (Initial once)
-echo "Logging in and saving session..."
-"$VENV_PYTHON" "$PROJECT_DIR/src/login.py"
+# All steps (session check, balance, conditional charge, 720, 645) run in
+# a single Python process that shares one browser and one logged-in page.
+WORKFLOW_ARGS=()
 
-# Step 1: Check balance
-echo "Checking balance..."
-# Using tee to show output in real-time while capturing it
-"$VENV_PYTHON" "$PROJECT_DIR/src/balance.py" 2>&1 | tee balance.log
-BALANCE_OUTPUT=$(cat balance.log)
-rm balance.log
-
-AVAILABLE_AMOUNT=$(echo "$BALANCE_OUTPUT" | grep "Available Amount:" | sed 's/[^0-9]//g')
-
-if [ -z "$AVAILABLE_AMOUNT" ]; then
-    echo "Error: Could not parse available amount"
-    exit 1
-fi
-
-# Step 2: Charge if needed
-MIN_REQUIRED=10000
-if [ "$AVAILABLE_AMOUNT" -lt "$MIN_REQUIRED" ]; then
-    echo "Balance low (₩${AVAILABLE_AMOUNT}). Charging ₩10,000..."
-    "$VENV_PYTHON" "$PROJECT_DIR/src/charge.py" 10000
-    
-    echo "Updating balance after charge..."
-    "$VENV_PYTHON" "$PROJECT_DIR/src/balance.py"
+if [ "$BUY_720" = false ]; then
+    WORKFLOW_ARGS+=(--skip-720)
 fi
 
-# Step 3: Buy Lotto 720
-if [ "$BUY_720" = true ]; then
-    echo "Buying Lotto 720..."
-    "$VENV_PYTHON" "$PROJECT_DIR/src/lotto720.py"
-else
-    echo "Skipping Lotto 720"
-fi
-
-# Step 4: Buy Lotto 645
-# if [ "$BUY_645" = true ]; then
-#     echo "Buying Lotto 645..."
-#     "$VENV_PYTHON" "$PROJECT_DIR/src/lotto645.py"
-# else
-#     echo "Skipping Lotto 645"
+# Lotto 645 is currently disabled in the scheduled workflow
+# if [ "$BUY_645" = false ]; then
+#     WORKFLOW_ARGS+=(--skip-645)
 # fi
+WORKFLOW_ARGS+=(--skip-645)
+
+"$VENV_PYTHON" "$PROJECT_DIR/src/workflow.py" "${WORKFLOW_ARGS[@]}"
 
 echo ""
 echo "All tasks completed successfully!"
-
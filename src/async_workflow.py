@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+from playwright.async_api import async_playwright, Page, TimeoutError as PlaywrightTimeoutError
+from login import (
+    USER_ID, PASSWD, LOGIN_URL, SESSION_PROBE, SESSION_PROBE_URL, GLOBAL_TIMEOUT, LOGIN_ERROR_SCREENSHOT_STATES,
+    POPUP_AUTO_CLOSE, POPUP_OBSERVER_JS, POPUP_SWEEP_JS,
+    context_options, login_failure, persist_session, probe_answer, refreshed_session,
+)
+from balance import (
+    BALANCE_URL, BALANCE_SELECTOR, BALANCE_TEXT_JS, DEPOSIT_SELECTORS, AVAILABLE_SELECTORS, parse_balance,
+)
+from page_state import (
+    detect_state_async, LOGGED_IN, LOGGED_OUT, INVALID_CREDENTIALS, ERROR_PAGE, LOGIN_FAILED, READY,
+)
+from har import attach_har_async
+from session import SESSION_PATH, session_lock, session_status, write_meta
+from routing import install_router_async, use_profile
+from browser_daemon import daemon_endpoint, hold_lease
+import lotto645
+import lotto720
+from ledger import RESULT_LAYER_JS, parse_response_data, parse_result, purchase_summary
+
+from spans import TimedReporter
+
+# .env loading is handled by login module import
+
+LOTTO720_COST = 5000        # 모든 조 5매
+LOTTO645_GAME_COST = 1000
+
+
+class DepositBudget:
+    """
+    Shared deposit budget for purchases running at the same time.
+    Each flow reserves its cost before clicking buy, so together they never
+    spend more than the available balance.
+    """
+
+    def __init__(self, available: int):
+        self.available = available
+        self.reserved = 0
+        self._lock = asyncio.Lock()
+
+    async def reserve(self, amount: int, label: str) -> bool:
+        async with self._lock:
+            if self.reserved + amount > self.available:
+                print(f"{label}: budget exceeded (need ₩{amount:,}, left ₩{self.available - self.reserved:,})")
+                return False
+            self.reserved += amount
+            return True
+
+    async def release(self, amount: int):
+        async with self._lock:
+            self.reserved -= amount
+
+
+async def new_context_async(browser, storage_state=None, har_name=None):
+    """login.new_context for the async API."""
+    context = await browser.new_context(**context_options(storage_state))
+    await install_router_async(context)
+    if POPUP_AUTO_CLOSE:
+        await context.add_init_script(POPUP_OBSERVER_JS)
+    if har_name:
+        await attach_har_async(context, har_name)
+    return context
+
+
+async def launch_browser_async(playwright, headless=True):
+    """login.launch_browser for the async API."""
+    endpoint = daemon_endpoint() if headless and os.environ.get('BROWSER_DAEMON', 'true').lower() == 'true' else None
+    if endpoint:
+        hold_lease()
+        try:
+            browser = await playwright.chromium.connect_over_cdp(endpoint, timeout=3000)
+            print(f"Attached to browser daemon at {endpoint}")
+            return browser
+        except Exception as e:
+            print(f"Browser daemon unavailable ({e}). Launching browser...")
+    return await playwright.chromium.launch(headless=headless)
+
+
+async def new_page(context) -> Page:
+    page = await context.new_page()
+
+    async def handle_dialog(dialog):
+        try:
+            await dialog.accept()
+        except Exception as e:
+            if "already handled" not in str(e).lower():
+                print(f"Dialog handling error: {e}")
+
+    page.on("dialog", handle_dialog)
+    return page
+
+
+async def dismiss_popups(page: Page) -> int:
+    """login.dismiss_popups for the async API."""
+    try:
+        closed = await page.evaluate(POPUP_SWEEP_JS)
+        if closed:
+            print(f"Dismissed {closed} popup(s)")
+        return closed
+    except Exception:
+        return 0
+
+
+async def wait_for_count_increase(page: Page, selector: str, previous: int, timeout: int = 5000) -> bool:
+    """waits.wait_for_count_increase for the async API."""
+    try:
+        await page.wait_for_function(
+            "([sel, n]) => document.querySelectorAll(sel).length > n",
+            arg=[selector, previous],
+            timeout=timeout,
+        )
+        return True
+    except Exception as e:
+        print(f"Wait for {selector} failed: {e}")
+        return False
+
+
+async def is_logged_in(page: Page, probe: bool = SESSION_PROBE) -> bool:
+    """login.is_logged_in for the async API."""
+    context = page.context
+    if probe:
+        try:
+            if session_status(await context.cookies())["state"] == "fresh":
+                print("Session verified recently. Skipping probe.")
+                return True
+            response = await context.request.get(SESSION_PROBE_URL, max_redirects=0, timeout=GLOBAL_TIMEOUT)
+            result = probe_answer(response)
+            if result is not None:
+                if result:
+                    write_meta(await context.cookies())
+                return result
+        except Exception as e:
+            print(f"Session probe error: {e}")
+
+    try:
+        if page.url == "about:blank" or "dhlottery.co.kr" not in page.url:
+            print("Navigating to check session state...")
+            await page.goto(LOGIN_URL, timeout=GLOBAL_TIMEOUT, wait_until="commit")
+        state = await detect_state_async(page, (LOGGED_IN, LOGGED_OUT, ERROR_PAGE), timeout=2000)
+        print(f"Page state: {state} ({page.url})")
+        return state == LOGGED_IN
+    except Exception:
+        return False
+
+
+async def login(page: Page) -> None:
+    """login.login for the async API (ensure_session already checked the session)."""
+    if not USER_ID or not PASSWD:
+        raise ValueError("USER_ID or PASSWD not found in environment variables.")
+    use_profile(page, "default")
+
+    print('Starting login process...')
+    if LOGIN_URL not in page.url:
+        await page.goto(LOGIN_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+    await dismiss_popups(page)
+    await page.wait_for_selector("#inpUserId", state="visible", timeout=GLOBAL_TIMEOUT)
+
+    print(f"Logging in as {USER_ID[:3]}***...")
+    await page.locator("#inpUserId").fill(USER_ID)
+    await page.locator("#inpUserPswdEncn").fill(PASSWD)
+    state = await detect_state_async(page, (LOGGED_IN, INVALID_CREDENTIALS, ERROR_PAGE, LOGIN_FAILED),
+                                     timeout=GLOBAL_TIMEOUT, action=lambda: page.click("#btnLogin"),
+                                     login_response=True)
+
+    print(f"Verifying login... ({state})")
+    failure = login_failure(state, page.url)
+    if failure:
+        if state in LOGIN_ERROR_SCREENSHOT_STATES:
+            await page.screenshot(path=f"login_error_{int(time.time())}.png")
+        raise Exception(failure)
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=2000)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def ensure_session(page: Page, sr: TimedReporter = None) -> bool:
+    """
+    login.ensure_session for the async API: the refresh runs under the session
+    lock, and a session refreshed by another script meanwhile is reused.
+    Called before the purchases start, so blocking the loop on the lock is fine.
+
+    Returns:
+        bool: True if a login was performed
+    """
+    context = page.context
+    status = session_status(await context.cookies())
+    if status["state"] == "fresh":
+        print(f"Session is fresh ({status['reason']}).")
+        return False
+
+    with session_lock():
+        cookies = refreshed_session(await context.cookies())
+        if cookies:
+            await context.add_cookies(cookies)
+            print("Using the session refreshed by another run.")
+            return False
+
+        if status["state"] == "verify" and await is_logged_in(page):
+            print("Session is valid.")
+            return False
+        if status["state"] == "refresh":
+            # Log in again before the server drops the session mid-purchase
+            await context.clear_cookies()
+
+        print(f"Session {status['state']} ({status['reason']}). Logging in...")
+        if sr:
+            sr.stage("LOGIN")
+        await login(page)
+        persist_session(await context.storage_state())
+        return True
+
+
+async def get_balance(page: Page) -> dict:
+    """balance.get_balance for the async API."""
+    use_profile(page, "default")
+    print("Navigating to My Page...")
+    await page.goto(BALANCE_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+    state = await detect_state_async(page, (READY, LOGGED_OUT, ERROR_PAGE), timeout=GLOBAL_TIMEOUT,
+                                     ready_selector=BALANCE_SELECTOR)
+    if state in (LOGGED_OUT, ERROR_PAGE):
+        print(f"Redirected to login/error page ({state}). Attempting login...")
+        await login(page)
+        await page.goto(BALANCE_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+        state = await detect_state_async(page, (READY, LOGGED_OUT), timeout=GLOBAL_TIMEOUT,
+                                         ready_selector=BALANCE_SELECTOR)
+    if state != READY:
+        print(f"Balance elements not visible ({state})")
+        if state == LOGGED_OUT or "/login" in page.url:
+            raise Exception("Authentication required to view balance.")
+    return parse_balance(await page.evaluate(BALANCE_TEXT_JS, [DEPOSIT_SELECTORS, AVAILABLE_SELECTORS]))
+
+
+async def parse_buy_response(game: str, response) -> dict:
+    """ledger.parse_response for the async API."""
+    try:
+        return parse_response_data(game, await response.json())
+    except Exception as e:
+        print(f"Purchase response not readable: {e}")
+        return None
+
+
+async def list_count(page: Page, selector: str):
+    """lotto720.list_count for the async API."""
+    if not await page.locator(selector).count():
+        return None
+    return await page.locator(f"{selector} li").count()
+
+
+async def wait_for_list_fill(page: Page, selector: str, before) -> bool:
+    """lotto720.wait_for_list_fill for the async API."""
+    if before is None:
+        return False
+    if not await wait_for_count_increase(page, f"{selector} li", before, timeout=lotto720.LIST_FILL_TIMEOUT):
+        print(f"{selector} did not change. Continuing.")
+        return False
+    return True
+
+
+async def purchase_720(page: Page, budget: DepositBudget) -> dict:
+    """lotto720.purchase for the async API (모든 조 자동 5매)."""
+    if not await budget.reserve(LOTTO720_COST, "Lotto 720"):
+        return {"processed_count": 0, "status": "skipped"}
+    try:
+        use_profile(page, "default")
+        print(f"Navigating to Lotto 720 game: {lotto720.GAME_URL}")
+        await page.goto(lotto720.GAME_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+        await dismiss_popups(page)
+
+        select_btn = "a.btn_gray_st1.large.full, a:has-text('번호 선택하기')"
+        await page.wait_for_selector(select_btn, state="visible", timeout=GLOBAL_TIMEOUT)
+        await page.locator(select_btn).first.click()
+
+        auto_btn = page.locator("a.btn_wht.xsmall:has-text('자동번호'), a:has-text('자동번호')").first
+        await auto_btn.wait_for(state="visible", timeout=GLOBAL_TIMEOUT)
+        all_jo = page.locator("li:has-text('모든조'), span.group.all").first
+        if await all_jo.is_visible():
+            await all_jo.click()
+
+        # Same waits as lotto720.purchase: auto-number response and lists are
+        # optional signals, the spinner and the buy button decide
+        selected_before = await list_count(page, lotto720.SELECTED_LIST_SELECTOR)
+        try:
+            async with page.expect_response(lotto720.AUTO_RESPONSE_PATTERN,
+                                            timeout=lotto720.AUTO_RESPONSE_TIMEOUT):
+                await auto_btn.click()
+        except PlaywrightTimeoutError:
+            print("Auto-number response not seen. Relying on the spinner.")
+        await page.wait_for_selector("text=통신중입니다", state="hidden", timeout=5000)
+        await wait_for_list_fill(page, lotto720.SELECTED_LIST_SELECTOR, selected_before)
+
+        tickets_before = await list_count(page, lotto720.TICKET_LIST_SELECTOR)
+        await page.locator("a.btn_blue.full.large:has-text('선택완료'), a:has-text('선택완료')").first.click()
+        await wait_for_list_fill(page, lotto720.TICKET_LIST_SELECTOR, tickets_before)
+
+        buy_btn = page.locator("a.btn_blue.large.full:has-text('구매하기'), a:has-text('구매하기')").first
+        await buy_btn.wait_for(state="visible", timeout=GLOBAL_TIMEOUT)
+        async with page.expect_response(lotto720.BUY_RESPONSE_PATTERN, timeout=GLOBAL_TIMEOUT) as response_info:
+            await buy_btn.click()
+
+        result, source = await parse_buy_response("720", await response_info.value), "response"
+        if result is None:
+            await page.wait_for_selector(", ".join(lotto720.RESULT_SELECTORS), state="visible", timeout=GLOBAL_TIMEOUT)
+            result, source = parse_result("720", await page.evaluate(RESULT_LAYER_JS, lotto720.RESULT_SELECTORS)), "page"
+            final_confirm = page.locator("a.btn_lgray.medium:has-text('확인'), a.btn_blue:has-text('확인'), a:has-text('확인')").first
+            if await final_confirm.is_visible():
+                await final_confirm.click()
+        summary = purchase_summary("720", result, source)
+        if summary.get("status") == "failed":
+            await budget.release(LOTTO720_COST)
+        return summary
+    except Exception:
+        await budget.release(LOTTO720_COST)
+        try:
+            await page.screenshot(path=f"lotto720_error_{int(time.time())}.png")
+        except Exception:
+            pass
+        raise
+
+
+async def purchase_645_slip(page: Page, auto_games: int, manual_numbers: list, budget: DepositBudget) -> dict:
+    """lotto645.purchase (one slip) for the async API."""
+    total_games = auto_games + len(manual_numbers)
+    cost = total_games * LOTTO645_GAME_COST
+    if not await budget.reserve(cost, "Lotto 6/45"):
+        return {"processed_count": 0, "status": "skipped"}
+    try:
+        use_profile(page, "default")
+        print(f"Navigating to Lotto 6/45 mobile game: {lotto645.GAME_URL}")
+        await page.goto(lotto645.GAME_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+        await dismiss_popups(page)
+        await page.wait_for_selector("button:has-text('자동 1매 추가'), .lt-num", state="visible", timeout=GLOBAL_TIMEOUT)
+
+        # Each added game must show up in the game list before the next click
+        games = f"{lotto645.GAME_LIST_SELECTOR} li"
+        auto_btn = page.locator("button:has-text('자동 1매 추가')")
+        for i in range(auto_games):
+            before = await page.locator(games).count()
+            await auto_btn.click()
+            if not await wait_for_count_increase(page, games, before):
+                raise Exception(f"Automatic game {i + 1} was not added")
+
+        if manual_numbers:
+            await page.evaluate(lotto645.BOARD_INDEX_JS, ".lt-num")
+        select_done = page.locator("#btnSelectNum, button:has-text('선택완료')").first
+        for numbers in manual_numbers:
+            print(f"Adding manual game: {numbers}")
+            wanted = sorted(int(n) for n in numbers)
+            arg = [wanted, lotto645.SELECTED_DISPLAY_SELECTOR]
+            result = await page.evaluate(lotto645.SELECT_GAME_JS, arg)
+            if result["stale"]:
+                await page.evaluate(lotto645.BOARD_INDEX_JS, ".lt-num")
+                result = await page.evaluate(lotto645.SELECT_GAME_JS, arg)
+            if not lotto645.check_selection(result, wanted):
+                raise Exception(f"Could not select manual numbers {numbers}")
+            before = await page.locator(games).count()
+            await select_done.click()
+            if not await wait_for_count_increase(page, games, before):
+                raise Exception(f"Manual game {numbers} was not added")
+
+        print(f"Clicking 'Purchase' (구매하기) for {total_games} games...")
+        async with page.expect_response(lotto645.BUY_RESPONSE_PATTERN, timeout=GLOBAL_TIMEOUT) as response_info:
+            await page.locator("#btnBuy, button:has-text('구매하기')").first.click(timeout=5000)
+            confirm_btn = page.locator("#popupLayerConfirm button:has-text('확인'), button:has-text('확인'), a:has-text('확인')").first
+            try:
+                await confirm_btn.wait_for(state="visible", timeout=3000)
+                await confirm_btn.click()
+            except Exception:
+                print("No confirmation popup found, assuming initial dialog handler handled it.")
+
+        result, source = await parse_buy_response("645", await response_info.value), "response"
+        if result is None:
+            try:
+                await page.wait_for_selector(", ".join(lotto645.RESULT_SELECTORS), state="visible", timeout=5000)
+                result, source = parse_result("645", await page.evaluate(RESULT_LAYER_JS, lotto645.RESULT_SELECTORS)), "page"
+            except Exception:
+                result = None
+        summary = purchase_summary("645", result, source)
+        if summary.get("status") == "failed":
+            await budget.release(cost)
+        return summary
+    except Exception:
+        await budget.release(cost)
+        try:
+            await page.screenshot(path=f"lotto645_error_{int(time.time())}.png")
+        except Exception:
+            pass
+        raise
+
+
+async def purchase_645(page: Page, auto_games: int, manual_numbers: list, budget: DepositBudget) -> dict:
+    """
+    lotto645.purchase_slips for the async API: same purchase limit, ledger
+    check and slip split (lotto645.plan_slips), one slip at a time.
+    """
+    slips = lotto645.plan_slips(auto_games, manual_numbers)
+    if not slips:
+        print('No games selected to purchase!')
+        return {"processed_count": 0}
+    if len(slips) == 1:
+        return await purchase_645_slip(page, *slips[0], budget)
+    summary = {"processed_count": 0, "games": []}
+    for i, (slip_auto, slip_manual) in enumerate(slips, 1):
+        print(f"Slip {i}/{len(slips)}: {slip_auto} auto, {len(slip_manual)} manual")
+        result = await purchase_645_slip(page, slip_auto, slip_manual, budget)
+        if result.get("status") == "skipped":
+            summary["status"] = "skipped"
+            break
+        if not lotto645.add_slip_result(summary, result):
+            break
+    return summary
+
+
+async def run(sr: TimedReporter, buy_720: bool = True, buy_645: bool = True) -> dict:
+    """
+    로그인/잔액 확인 후 720과 645를 같은 컨텍스트의 두 페이지에서 동시에 구매합니다.
+    두 구매는 DepositBudget으로 잔액을 나눠 쓰며, 충전은 하지 않습니다(workflow.py 사용).
+    """
+    async with async_playwright() as playwright:
+        HEADLESS = os.environ.get('HEADLESS', 'true').lower() == 'true'
+        browser = await launch_browser_async(playwright, headless=HEADLESS)
+        storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
+        context = await new_context_async(browser, storage_state, har_name="async_workflow")
+        try:
+            page = await new_page(context)
+
+            sr.stage("CHECK_SESSION")
+            await ensure_session(page, sr)
+
+            sr.stage("GET_BALANCE")
+            balance_info = await get_balance(page)
+            print(f"Available Amount: {balance_info['available_amount']:,}")
+            budget = DepositBudget(balance_info['available_amount'])
+
+            sr.stage("PURCHASE")
+            tasks, names = [], []
+            if buy_720:
+                tasks.append(purchase_720(page, budget))
+                names.append("lotto720")
+            if buy_645:
+                auto_games, manual_numbers = lotto645.load_game_config()
+                page_645 = await new_page(context) if tasks else page
+                tasks.append(purchase_645(page_645, auto_games, manual_numbers, budget))
+                names.append("lotto645")
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            summary = {"available_amount": balance_info['available_amount'], "spent": budget.reserved}
+            errors = []
+            for name, result in zip(names, results):
+                if isinstance(result, BaseException):
+                    errors.append(f"{name}: {result!r}")
+                    summary[name] = {"status": "failed"}
+                else:
+                    summary[name] = result
+            if errors:
+                raise Exception("Purchase failed: " + "; ".join(errors))
+            return summary
+        finally:
+            await context.close()
+            await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent 720/645 purchase (async API, no charging)")
+    parser.add_argument("--skip-720", action="store_true", help="연금복권 720 구매 건너뛰기")
+    parser.add_argument("--skip-645", action="store_true", help="로또 6/45 구매 건너뛰기")
+    args = parser.parse_args()
+
+    sr = TimedReporter("Lotto Workflow (async)")
+    try:
+        summary = asyncio.run(run(sr, buy_720=not args.skip_720, buy_645=not args.skip_645))
+        sr.success(summary)
+    except Exception:
+        sr.fail(traceback.format_exc())
+        sys.exit(1)
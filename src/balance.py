@@ -5,20 +5,60 @@ import time
 from pathlib import Path
 from dotenv import load_dotenv
 from playwright.sync_api import Playwright, sync_playwright, Page
-from login import login, SESSION_PATH, DEFAULT_USER_AGENT, DEFAULT_VIEWPORT, DEFAULT_HEADERS, GLOBAL_TIMEOUT
+from login import login, ensure_session, new_context, launch_browser, SESSION_PATH, GLOBAL_TIMEOUT
+from routing import use_profile
+from page_state import detect_state, READY, LOGGED_OUT, ERROR_PAGE
+
+BALANCE_URL = "https://m.dhlottery.co.kr/mypage/home"
+BALANCE_SELECTOR = "#navTotalAmt, .pntDpstAmt, .header_money"
+# Mobile Specific: #navTotalAmt is common for total, .pntDpstAmt for deposit
+DEPOSIT_SELECTORS = ["#navTotalAmt", ".pntDpstAmt", ".header_money"]
+# Often on mobile, the total deposit is what's displayed.
+AVAILABLE_SELECTORS = ["#divCrntEntrsAmt", ".totalAmt", ".pntDpstAmt"]
+
+# First visible text for each selector list, read in one evaluate
+BALANCE_TEXT_JS = """
+(lists) => lists.map(selectors => {
+    for (const selector of selectors) {
+        const el = document.querySelector(selector);
+        if (el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length) &&
+                getComputedStyle(el).visibility !== 'hidden')
+            return (el.innerText || '').trim();
+    }
+    return null;
+})
+"""
 
 import sys
 import traceback
-from script_reporter import ScriptReporter
+from spans import TimedReporter
+
+
+def parse_balance(texts: list) -> dict:
+    """
+    Amounts from the BALANCE_TEXT_JS result (sync and async get_balance).
+    Available falls back to the deposit balance when not shown separately.
+    """
+    deposit_text, available_text = texts
+    deposit_text = deposit_text or "0"
+    if available_text is None:
+        available_text = deposit_text
+    print(f" -> Found balance: '{deposit_text}' (available '{available_text}')")
+    # Parse amounts (remove non-digits)
+    return {
+        'deposit_balance': int(re.sub(r'[^0-9]', '', deposit_text) or "0"),
+        'available_amount': int(re.sub(r'[^0-9]', '', available_text) or "0"),
+    }
 
 
 def get_balance(page: Page) -> dict:
     """
     마이페이지에서 예치금 잔액과 구매가능 금액을 조회합니다.
     """
+    use_profile(page, "default")
     print("Navigating to My Page...")
     try:
-        page.goto("https://m.dhlottery.co.kr/mypage/home", timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+        page.goto(BALANCE_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
     except Exception as e:
         print(f"Navigation to My Page failed: {e}")
         page.screenshot(path=f"balance_nav_failed_{int(time.time())}.png")
@@ -26,90 +66,43 @@ def get_balance(page: Page) -> dict:
 
     print(f"Current URL: {page.url}")
     
-    # Check if redirected to login or error
-    if "/login" in page.url or "method=login" in page.url or "/errorPage" in page.url:
-        print("Not logged in. Redirected to login/error page. Attempting login...")
+    # Race the balance element against login/error redirects
+    state = detect_state(page, (READY, LOGGED_OUT, ERROR_PAGE), timeout=GLOBAL_TIMEOUT, ready_selector=BALANCE_SELECTOR)
+    if state in (LOGGED_OUT, ERROR_PAGE):
+        print(f"Redirected to login/error page ({state}). Attempting login...")
         login(page)
         # Re-navigate after login
-        page.goto("https://m.dhlottery.co.kr/mypage/home", timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
-    
-    # Try to find balance information
-    try:
-        # Wait for either total amount or deposit amount to be visible
-        page.wait_for_selector("#navTotalAmt, .pntDpstAmt, .header_money", state="visible", timeout=GLOBAL_TIMEOUT)
-    except Exception as e:
-        print(f"Balance elements not visible: {e}")
+        page.goto(BALANCE_URL, timeout=GLOBAL_TIMEOUT, wait_until="domcontentloaded")
+        state = detect_state(page, (READY, LOGGED_OUT), timeout=GLOBAL_TIMEOUT, ready_selector=BALANCE_SELECTOR)
+
+    if state != READY:
+        print(f"Balance elements not visible ({state})")
         page.screenshot(path=f"balance_elements_failed_{int(time.time())}.png")
         # Final check if we are actually logged in
-        if "/login" in page.url:
+        if state == LOGGED_OUT or "/login" in page.url:
              raise Exception("Authentication required to view balance.")
 
-    # 1. Get deposit balance (예치금 잔액)
-    # Mobile Specific: #navTotalAmt is common for total, .pntDpstAmt for deposit
-    deposit_selectors = ["#navTotalAmt", ".pntDpstAmt", ".header_money"]
-    deposit_text = "0"
-    for selector in deposit_selectors:
-        try:
-            el = page.locator(selector).first
-            if el.is_visible(timeout=1000):
-                deposit_text = el.inner_text().strip()
-                print(f" -> Found balance: '{deposit_text}' (via {selector})")
-                break
-        except:
-            continue
-    
-    # 2. Extract specifically 'Available' if possible, otherwise use the found balance
-    # Often on mobile, the total deposit is what's displayed.
-    available_selectors = ["#divCrntEntrsAmt", ".totalAmt", ".pntDpstAmt"]
-    available_text = deposit_text # Default to same if not found separately
-    for selector in available_selectors:
-        try:
-            el = page.locator(selector).first
-            if el.is_visible(timeout=500):
-                available_text = el.inner_text().strip()
-                break
-        except:
-            continue
-    
-    # Parse amounts (remove non-digits)
-    deposit_balance = int(re.sub(r'[^0-9]', '', deposit_text) or "0")
-    available_amount = int(re.sub(r'[^0-9]', '', available_text) or "0")
-    
-    return {
-        'deposit_balance': deposit_balance,
-        'available_amount': available_amount
-    }
+    return parse_balance(page.evaluate(BALANCE_TEXT_JS, [DEPOSIT_SELECTORS, AVAILABLE_SELECTORS]))
 
 
-def run(playwright: Playwright, sr: ScriptReporter) -> dict:
+def run(playwright: Playwright, sr: TimedReporter) -> dict:
     """로그인 후 잔액 정보를 조회합니다."""
     # Create browser, context, and page
     HEADLESS = os.environ.get('HEADLESS', 'true').lower() == 'true'
-    browser = playwright.chromium.launch(headless=HEADLESS)
+    browser = launch_browser(playwright, headless=HEADLESS)
 
     # Load session if exists
     storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
     
     # Use context managers for clean exit
-    context = browser.new_context(
-        storage_state=storage_state,
-        user_agent=DEFAULT_USER_AGENT,
-        viewport=DEFAULT_VIEWPORT,
-        extra_http_headers=DEFAULT_HEADERS
-    )
+    context = new_context(browser, storage_state, har_name="balance")
     
     try:
         page = context.new_page()
         
-        # Perform login only if needed
-        from login import is_logged_in
+        # Log in only when the stored session is stale
         sr.stage("CHECK_SESSION")
-        if not is_logged_in(page):
-            print("Session expired or missing. Logging in...")
-            sr.stage("LOGIN")
-            login(page)
-        else:
-            print("Session is valid.")
+        ensure_session(page, sr)
         
         # Get balance information
         sr.stage("GET_BALANCE")
@@ -128,7 +121,7 @@ def run(playwright: Playwright, sr: ScriptReporter) -> dict:
 
 
 if __name__ == "__main__":
-    sr = ScriptReporter("Balance Check")
+    sr = TimedReporter("Balance Check")
     try:
         with sync_playwright() as playwright:
             balance_info = run(playwright, sr)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+import argparse
+import atexit
+import ipaddress
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Optional long-lived headless Chromium that scripts attach to over CDP
+# (login.launch_browser) instead of cold-starting their own browser.
+# Shuts down after BROWSER_IDLE_TIMEOUT seconds without client pages and
+# restarts Chromium when its process tree exceeds BROWSER_MEMORY_MB.
+# Attached scripts hold a lease (one file per pid) for their whole run, so a
+# script that has connected but not opened a page yet still counts as a client.
+# State and leases live in a per-user 0700 directory; a state file owned by
+# someone else or pointing off the loopback interface is ignored, so another
+# local user cannot hand our scripts their browser.
+
+_RUNTIME_DIR = os.environ.get('XDG_RUNTIME_DIR')
+DAEMON_STATE_DIR = Path(_RUNTIME_DIR) / "lotto" if _RUNTIME_DIR else Path.home() / ".cache" / "lotto"
+DAEMON_STATE_PATH = os.environ.get('BROWSER_DAEMON_STATE', str(DAEMON_STATE_DIR / "browser.json"))
+DAEMON_LEASE_DIR = f"{DAEMON_STATE_PATH}.clients"
+DAEMON_PORT = int(os.environ.get('BROWSER_DAEMON_PORT', '9222'))
+IDLE_TIMEOUT = int(os.environ.get('BROWSER_IDLE_TIMEOUT', '1800'))
+MEMORY_LIMIT_MB = int(os.environ.get('BROWSER_MEMORY_MB', '768'))
+CHECK_INTERVAL = 5
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def _private_dir(path) -> bool:
+    """Creates path with mode 0700; False when it is not ours."""
+    path = Path(path)
+    try:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if path.stat().st_uid != os.getuid():
+            print(f"Browser daemon directory {path} belongs to another user. Ignoring it.")
+            return False
+        path.chmod(0o700)
+        return True
+    except OSError as e:
+        print(f"Could not prepare browser daemon directory {path}: {e}")
+        return False
+
+
+def _is_loopback(endpoint: str) -> bool:
+    host = urlsplit(endpoint or "").hostname
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host or "").is_loopback
+    except ValueError:
+        return False
+
+
+def _read_state():
+    """The daemon state file, or None when missing, unreadable or not owned by us."""
+    try:
+        with open(DAEMON_STATE_PATH) as f:
+            if os.fstat(f.fileno()).st_uid != os.getuid():
+                print(f"Ignoring {DAEMON_STATE_PATH}: owned by another user")
+                return None
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _write_state(state: dict):
+    if not _private_dir(Path(DAEMON_STATE_PATH).parent):
+        raise RuntimeError(f"Cannot write browser daemon state to {DAEMON_STATE_PATH}")
+    tmp_path = f"{DAEMON_STATE_PATH}.{os.getpid()}.tmp"
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, DAEMON_STATE_PATH)
+
+
+def _get_json(url: str, timeout: float = 1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def daemon_endpoint():
+    """
+    Returns the CDP endpoint of a running daemon, or None.
+    Only reads the state file and checks the pid, so it costs no network round-trip.
+    """
+    state = _read_state()
+    if not state or not _pid_alive(state.get("pid", -1)):
+        return None
+    endpoint = state.get("endpoint")
+    if not _is_loopback(endpoint):
+        print(f"Ignoring browser daemon endpoint {endpoint}: not a loopback address")
+        return None
+    return endpoint
+
+
+def hold_lease():
+    """
+    Marks this process as a daemon client until it exits.
+    launch_browser calls it before attaching, so the daemon never restarts or
+    stops Chromium between a script's connect and its first page.
+    """
+    path = Path(DAEMON_LEASE_DIR) / str(os.getpid())
+    if path.exists():
+        return
+    if not _private_dir(path.parent):
+        return
+    try:
+        path.touch()
+    except OSError as e:
+        print(f"Could not write browser daemon lease: {e}")
+        return
+    atexit.register(release_lease)
+
+
+def release_lease():
+    try:
+        os.remove(Path(DAEMON_LEASE_DIR) / str(os.getpid()))
+    except OSError:
+        pass
+
+
+def leased_clients() -> int:
+    """Live processes holding a lease (leases left by dead processes are removed)."""
+    count = 0
+    for path in Path(DAEMON_LEASE_DIR).glob("*"):
+        try:
+            pid = int(path.name)
+            if path.stat().st_uid != os.getuid():
+                continue
+        except (OSError, ValueError):
+            continue
+        if _pid_alive(pid):
+            count += 1
+        else:
+            path.unlink(missing_ok=True)
+    return count
+
+
+def _process_tree_rss_mb(root_pid: int) -> float:
+    """Resident memory of root_pid and all its descendants (Linux /proc)."""
+    children = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+    total_kb, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total_kb += int(line.split()[1])
+                    break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+class BrowserDaemon:
+    def __init__(self, port: int = DAEMON_PORT, idle_timeout: int = IDLE_TIMEOUT, memory_limit_mb: int = MEMORY_LIMIT_MB):
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.endpoint = f"http://127.0.0.1:{port}"
+        self.process = None
+        self.user_data_dir = None
+        self._initial_targets = set()
+
+    def _executable(self) -> str:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as playwright:
+            return playwright.chromium.executable_path
+
+    def start_browser(self):
+        self.user_data_dir = tempfile.mkdtemp(prefix="dhlotto-browser-")
+        args = [
+            self._executable(),
+            "--headless=new",
+            f"--remote-debugging-port={self.port}",
+            "--remote-debugging-address=127.0.0.1",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--disable-dev-shm-usage",
+            "about:blank",
+        ]
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                _get_json(f"{self.endpoint}/json/version")
+                break
+            except Exception:
+                time.sleep(0.1)
+        else:
+            self.stop_browser()
+            raise RuntimeError("Chromium did not expose the debugging endpoint")
+        self._initial_targets = {t["id"] for t in self._page_targets()}
+        _write_state({"pid": self.process.pid, "daemon_pid": os.getpid(), "endpoint": self.endpoint,
+                      "started_at": time.time()})
+        print(f"Browser daemon ready at {self.endpoint} (pid {self.process.pid})")
+
+    def stop_browser(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+        try:
+            os.remove(DAEMON_STATE_PATH)
+        except OSError:
+            pass
+
+    def _page_targets(self) -> list:
+        return [t for t in _get_json(f"{self.endpoint}/json/list") if t.get("type") == "page"]
+
+    def client_pages(self) -> int:
+        """Pages opened by attached scripts (the startup tab does not count)."""
+        try:
+            return len([t for t in self._page_targets() if t["id"] not in self._initial_targets])
+        except Exception:
+            return 0
+
+    def in_use(self) -> bool:
+        """A script holds a lease or has pages open."""
+        return leased_clients() > 0 or self.client_pages() > 0
+
+    def serve(self):
+        self.start_browser()
+        last_active = time.time()
+        try:
+            while True:
+                time.sleep(CHECK_INTERVAL)
+                if self.process.poll() is not None:
+                    print("Chromium exited. Restarting...")
+                    self.stop_browser()
+                    self.start_browser()
+                    continue
+
+                busy = self.in_use()
+                if busy:
+                    last_active = time.time()
+                elif time.time() - last_active > self.idle_timeout:
+                    print(f"Idle for {self.idle_timeout}s. Shutting down.")
+                    break
+
+                rss = _process_tree_rss_mb(self.process.pid)
+                if rss > self.memory_limit_mb and not busy:
+                    # Measuring memory takes a while: check again right before terminating
+                    if self.in_use():
+                        print("Client attached meanwhile. Postponing the restart.")
+                        continue
+                    print(f"Memory {rss:.0f} MB over {self.memory_limit_mb} MB cap. Restarting Chromium...")
+                    self.stop_browser()
+                    self.start_browser()
+        finally:
+            self.stop_browser()
+
+
+def stop_daemon():
+    state = _read_state()
+    if state is None:
+        print("Browser daemon is not running")
+        return
+    # Stop the daemon itself (it cleans up Chromium); killing only Chromium
+    # would make the daemon restart it.
+    pid = state.get("daemon_pid")
+    if not pid or not _pid_alive(pid):
+        pid = state.get("pid")
+    if pid and _pid_alive(pid):
+        os.kill(pid, signal.SIGTERM)
+    print("Browser daemon stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm Chromium daemon for the lotto scripts")
+    parser.add_argument("command", choices=["start", "stop", "status"])
+    args = parser.parse_args()
+
+    if args.command == "status":
+        endpoint = daemon_endpoint()
+        print(f"Browser daemon running at {endpoint}" if endpoint else "Browser daemon is not running")
+        sys.exit(0 if endpoint else 1)
+    elif args.command == "stop":
+        stop_daemon()
+    else:
+        if daemon_endpoint():
+            print(f"Browser daemon already running at {daemon_endpoint()}")
+            sys.exit(0)
+        daemon = BrowserDaemon()
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        daemon.serve()
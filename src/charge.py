@@ -6,16 +6,178 @@ import time
 from pathlib import Path
 from dotenv import load_dotenv
 from playwright.sync_api import Playwright, sync_playwright, Page
-from login import login, SESSION_PATH, DEFAULT_USER_AGENT, DEFAULT_VIEWPORT, DEFAULT_HEADERS, GLOBAL_TIMEOUT
+from login import login, ensure_session, new_context, launch_browser, SESSION_PATH, GLOBAL_TIMEOUT
+from routing import use_profile
+from waits import wait_for_load_state
+from glyph_cache import GlyphCache, glyph_key
+from recognizers import TemplateRecognizer, get_recognizer, preprocess_button
+from spans import TimedReporter, span, timed_iter
 
 import traceback
-from script_reporter import ScriptReporter
 
 # .env loading is handled by login module import
 
 CHARGE_PIN = os.environ.get('CHARGE_PIN')
 
-def parse_keypad(page: Page) -> dict:
+# 키패드 레이어가 움직이지 않을 때까지(연속 2프레임 동일) 기다린 뒤
+# 레이어/버튼 rect와 devicePixelRatio를 한 번에 반환
+KEYPAD_GEOMETRY_JS = """
+async ([layerSelector, buttonSelector]) => {
+    const rect = el => { const r = el.getBoundingClientRect(); return {x: r.x, y: r.y, w: r.width, h: r.height}; };
+    const frame = () => new Promise(resolve => requestAnimationFrame(resolve));
+    const layerEl = document.querySelector(layerSelector);
+    if (!layerEl) return {layer: null, buttons: [], dpr: window.devicePixelRatio};
+    let last = JSON.stringify(rect(layerEl));
+    for (let i = 0; i < 30; i++) {
+        await frame();
+        const now = JSON.stringify(rect(layerEl));
+        if (now === last) break;
+        last = now;
+    }
+    const buttons = Array.from(document.querySelectorAll(buttonSelector)).map((el, index) => ({index, ...rect(el)}));
+    return {layer: rect(layerEl), buttons, dpr: window.devicePixelRatio};
+}
+"""
+
+
+def capture_keypad(page: Page) -> tuple:
+    """
+    키패드를 캡처하여 버튼 element 목록과 전처리된 버튼 이미지 목록을 반환합니다.
+    (위 -> 아래, 왼쪽 -> 오른쪽 순서)
+    """
+    from PIL import Image
+    import io
+
+    keypad_selector = ".nppfs-keypad"
+    try:
+        page.wait_for_selector(keypad_selector, state="visible", timeout=GLOBAL_TIMEOUT)
+    except Exception:
+        raise Exception("Keypad not visible")
+
+    # 레이어/버튼 위치와 devicePixelRatio를 한 번의 evaluate로 수집 (애니메이션 종료 대기 포함)
+    geometry = page.evaluate(KEYPAD_GEOMETRY_JS, [keypad_selector, "img.kpd-data"])
+    if not geometry["layer"]:
+        raise Exception("Keypad not visible")
+    if not geometry["buttons"]:
+        raise Exception("No keypad buttons found")
+
+    layer = geometry["layer"]
+    dpr = geometry["dpr"] or 1
+    buttons = page.locator("img.kpd-data")
+    button_positions = [dict(b, element=buttons.nth(b['index'])) for b in geometry["buttons"] if b['w'] > 0]
+
+    # 전체 키패드 영역 스크린샷 (device 해상도, 좌표는 CSS px * dpr로 변환)
+    screenshot_bytes = page.screenshot(clip={'x': layer['x'], 'y': layer['y'], 'width': layer['w'], 'height': layer['h']})
+    keypad_img = Image.open(io.BytesIO(screenshot_bytes))
+    scale = keypad_img.width / layer['w'] if layer['w'] else dpr
+
+    button_positions.sort(key=lambda b: (b['y'], b['x']))
+
+    # 전처리는 버튼당 1회만 수행
+    images = []
+    for btn_info in button_positions:
+        lx = (btn_info['x'] - layer['x']) * scale
+        ly = (btn_info['y'] - layer['y']) * scale
+        button_img = keypad_img.crop((round(lx), round(ly), round(lx + btn_info['w'] * scale), round(ly + btn_info['h'] * scale)))
+        images.append(preprocess_button(button_img))
+
+    return [b['element'] for b in button_positions], images
+
+
+def check_cache_hits(images: list, cached: list) -> list:
+    """
+    Cheap safety net for glyph cache hits: the in-process template matcher
+    (font templates only, independent of the cache) must read the same digit.
+    Disagreeing hits become None and go to the full recognizer instead.
+    """
+    hits = [i for i, d in enumerate(cached) if d]
+    if not hits:
+        return cached
+    try:
+        checks = TemplateRecognizer(include_cache=False).recognize([images[i] for i in hits])
+    except ImportError:
+        # numpy 없음: 거리/마진 기준을 통과한 캐시 일치만으로 판단
+        return cached
+    cached = list(cached)
+    for i, (digit, _confidence) in zip(hits, checks):
+        if digit != cached[i]:
+            print(f"Keypad button {i}: glyph cache says {cached[i]}, template reads {digit}. Sent to OCR")
+            cached[i] = None
+    return cached
+
+
+def iter_keypad(page: Page, needed: str = "0123456789", glyphs: list = None):
+    """
+    키패드 숫자를 인식되는 즉시 (숫자, element)로 내보냅니다.
+    글리프 캐시 일치 버튼(템플릿 검사 통과)을 인식기 없이 먼저 내보내고,
+    나머지 버튼만 인식기의 신뢰도 순으로 처리합니다.
+    needed의 숫자가 모두 확인되면 남은 버튼은 인식하지 않고 종료합니다.
+
+    Args:
+        page: Playwright Page 객체
+        needed: 필요한 숫자들 (예: PIN)
+        glyphs: (선택) 내보낸 버튼의 (glyph_key, 숫자) 목록을 받을 리스트, 충전 성공 후 캐시 학습용
+    """
+    with span("ocr", "keypad_capture"):
+        elements, images = capture_keypad(page)
+    missing = set(needed)
+    found = set()
+    decided = {}
+
+    # 학습된 글리프 캐시로 먼저 매칭, 모르는 버튼만 인식기로
+    with span("ocr", "keypad_glyph_cache"):
+        cache = GlyphCache.load()
+        keys = [glyph_key(img) for img in images]
+        cached = [cache.lookup(key) for key in keys]
+        for digit in set(d for d in cached if d):
+            if cached.count(digit) > 1:
+                # 중복 매칭은 신뢰하지 않음
+                cached = [None if d == digit else d for d in cached]
+        cached = check_cache_hits(images, cached)
+
+    def emit(i, digit):
+        decided[i] = digit
+        if digit and digit not in found:
+            found.add(digit)
+            missing.discard(digit)
+            if glyphs is not None:
+                glyphs.append((keys[i], digit))
+            return True
+        return False
+
+    unknown = [i for i, d in enumerate(cached) if d is None]
+    print(f"Keypad glyph cache: {len(images) - len(unknown)}/{len(images)} matched")
+    recognizer = None
+    confidences = []
+    try:
+        # 필요한 숫자부터 내보냄
+        for i in sorted((i for i, d in enumerate(cached) if d), key=lambda i: cached[i] not in missing):
+            if emit(i, cached[i]):
+                yield cached[i], elements[i]
+            if not missing:
+                return
+
+        if unknown:
+            recognizer = get_recognizer()
+            # 스트리밍 중 클릭 시간은 제외하고 인식기 안에서 보낸 시간만 기록
+            results = timed_iter(recognizer.iter_recognize([images[i] for i in unknown]),
+                                 "ocr", f"keypad_{recognizer.name}", buttons=len(unknown))
+            try:
+                for j, digit, confidence in results:
+                    if emit(unknown[j], digit):
+                        confidences.append(confidence)
+                        yield digit, elements[unknown[j]]
+                    if not missing:
+                        break
+            finally:
+                results.close()
+    finally:
+        if confidences:
+            print(f"Keypad {recognizer.name}: min confidence {min(confidences):.2f}")
+        print(f"Keypad mapping: {sorted(found)} ({len(decided)}/{len(images)} buttons decoded)")
+
+
+def parse_keypad(page: Page, glyphs: list = None) -> dict:
     """
     랜덤 키패드 이미지를 OCR로 분석하여 각 숫자의 위치를 파악합니다.
     
@@ -27,79 +189,27 @@ def parse_keypad(page: Page) -> dict:
     
     Args:
         page: Playwright Page 객체
+        glyphs: (선택) 내보낸 버튼의 (glyph_key, 숫자) 목록을 받을 리스트, 충전 성공 후 캐시 학습용
         
     Returns:
         dict: {숫자(str): element} 형태의 버튼 매핑 (0-9만 포함)
     """
-    import pytesseract
-    from PIL import Image, ImageEnhance, ImageFilter
-    import io
+    return dict(iter_keypad(page, glyphs=glyphs))
 
-    # Tesseract 경로 설정
-    tesseract_cmd = os.environ.get('TESSERACT_PATH')
-    if not tesseract_cmd:
-        common_paths = ["/usr/local/bin/tesseract", "/opt/homebrew/bin/tesseract", "/usr/bin/tesseract"]
-        for path in common_paths:
-            if os.path.exists(path):
-                tesseract_cmd = path
-                break
-    if tesseract_cmd:
-        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 
-    keypad_selector = ".nppfs-keypad"
+def remember_keypad(glyphs: list, typed: str):
+    """
+    충전 성공 후 실제로 입력한 PIN 숫자의 버튼 글리프만 캐시에 저장합니다.
+    (성공한 충전으로 검증되지 않은 인식 결과는 학습하지 않음)
+    """
+    cache = GlyphCache.load()
+    for key, digit in glyphs:
+        if digit in typed:
+            cache.learn(key, digit)
     try:
-        page.wait_for_selector(keypad_selector, state="visible", timeout=GLOBAL_TIMEOUT)
-    except Exception:
-        raise Exception("Keypad not visible")
-    
-    # 버튼 위치 정보 수집
-    buttons = page.locator("img.kpd-data")
-    count = buttons.count()
-    if count == 0:
-        raise Exception("No keypad buttons found")
-
-    button_positions = []
-    for i in range(count):
-        btn = buttons.nth(i)
-        box = btn.bounding_box()
-        if box and box['width'] > 0:
-            button_positions.append({'element': btn, 'x': box['x'], 'y': box['y'], 'w': box['width'], 'h': box['height']})
-
-    # 전체 키패드 영역 스크린샷
-    time.sleep(0.3) # 애니메이션 대기 시간 단축
-    keypad_layer = page.locator(keypad_selector)
-    keypad_box = keypad_layer.bounding_box()
-    screenshot_bytes = page.screenshot(clip=keypad_box)
-    keypad_img = Image.open(io.BytesIO(screenshot_bytes))
-
-    number_map = {}
-    button_positions.sort(key=lambda b: (b['y'], b['x']))
-
-    for idx, btn_info in enumerate(button_positions):
-        lx = btn_info['x'] - keypad_box['x']
-        ly = btn_info['y'] - keypad_box['y']
-        button_img = keypad_img.crop((lx, ly, lx + btn_info['w'], ly + btn_info['h']))
-        
-        # 전처리: 흑백 변환 및 대비 향상
-        gray = button_img.convert('L')
-        enhanced = ImageEnhance.Contrast(gray).enhance(2.0)
-        binary = enhanced.point(lambda p: p > 128 and 255)
-        
-        # OCR (가장 효율적인 설정부터 시도)
-        configs = [r'--oem 3 --psm 10 -c tessedit_char_whitelist=0123456789', r'--oem 3 --psm 8 -c tessedit_char_whitelist=0123456789']
-        
-        found_text = None
-        for config in configs:
-            result = pytesseract.image_to_string(binary, config=config).strip()
-            if result.isdigit() and len(result) == 1:
-                found_text = result
-                break
-        
-        if found_text and found_text not in number_map:
-            number_map[found_text] = btn_info['element']
-
-    print(f"Keypad mapping: {sorted(number_map.keys())}")
-    return number_map
+        cache.save()
+    except OSError as e:
+        print(f"Could not save keypad glyph cache: {e}")
 
 def charge_deposit(page: Page, amount: int) -> bool:
     """
@@ -109,6 +219,9 @@ def charge_deposit(page: Page, amount: int) -> bool:
         print("Error: CHARGE_PIN not found")
         return False
 
+    # 키패드 OCR에 이미지 렌더링 필요
+    use_profile(page, "keypad")
+
     print(f"Navigating to charge page for {amount:,} won...")
     page.goto("https://m.dhlottery.co.kr/mypage/mndpChrg", timeout=GLOBAL_TIMEOUT, wait_until="networkidle")
     
@@ -135,19 +248,21 @@ def charge_deposit(page: Page, amount: int) -> bool:
         print("Keypad did not appear.")
         return False
 
-    number_map = parse_keypad(page)
-    if len(number_map) < 10:
-        print(f"Keypad recognition incomplete ({len(number_map)}/10). Retrying crop logic...")
-        # (Optinal: 추가 로직 넣을 수 있음)
-        
+    # PIN 숫자가 인식되는 즉시 순서대로 입력 (전체 키패드 인식을 기다리지 않음)
+    glyphs = []
+    number_map = {}
+    typed = 0
     print(f"Entering PIN...")
-    for digit in CHARGE_PIN:
-        if digit in number_map:
-            number_map[digit].click()
+    for digit, element in iter_keypad(page, needed=CHARGE_PIN, glyphs=glyphs):
+        number_map[digit] = element
+        while typed < len(CHARGE_PIN) and CHARGE_PIN[typed] in number_map:
+            number_map[CHARGE_PIN[typed]].click()
+            typed += 1
             time.sleep(0.1) # 속도 향상
-        else:
-            print(f"Digit {digit} not found")
-            return False
+
+    if typed < len(CHARGE_PIN):
+        print(f"Keypad recognition incomplete ({len(number_map)}/10). Digit {CHARGE_PIN[typed]} not found")
+        return False
             
     print("PIN entered. Waiting for confirmation...")
     
@@ -164,6 +279,7 @@ def charge_deposit(page: Page, amount: int) -> bool:
             # 팝업 닫기 시도
             if page.locator("button#btnAlertPop").is_visible():
                 page.click("button#btnAlertPop")
+            remember_keypad(glyphs, CHARGE_PIN)
             return True
         else:
             print(f"Unexpected message or state: {page.url}")
@@ -173,29 +289,24 @@ def charge_deposit(page: Page, amount: int) -> bool:
         # URL이라도 확인
         if "result=OK" in page.url:
             print("Charge likely successful (URL result=OK)")
+            remember_keypad(glyphs, CHARGE_PIN)
             return True
         return False
 
-def run(playwright: Playwright, amount: int, sr: ScriptReporter):
+def run(playwright: Playwright, amount: int, sr: TimedReporter):
     HEADLESS = os.environ.get('HEADLESS', 'false').lower() == 'true'
     
-    browser = playwright.chromium.launch(headless=HEADLESS, slow_mo=0 if HEADLESS else 200)
+    browser = launch_browser(playwright, headless=HEADLESS, slow_mo=0 if HEADLESS else 200)
     storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
-    context = browser.new_context(
-        storage_state=storage_state,
-        user_agent=DEFAULT_USER_AGENT,
-        viewport=DEFAULT_VIEWPORT,
-        extra_http_headers=DEFAULT_HEADERS
-    )
+    context = new_context(browser, storage_state, har_name="charge")
     page = context.new_page()
     
     try:
-        from login import is_logged_in, setup_dialog_handler
+        from login import setup_dialog_handler
         setup_dialog_handler(page) # 알럿 자동 처리
         
-        if not is_logged_in(page):
-            sr.stage("LOGIN")
-            login(page)
+        sr.stage("CHECK_SESSION")
+        ensure_session(page, sr)
             
         sr.stage("CHARGE")
         success = charge_deposit(page, amount)
@@ -207,7 +318,8 @@ def run(playwright: Playwright, amount: int, sr: ScriptReporter):
     except Exception:
         raise
     finally:
-        time.sleep(2) # 결과 확인용 대기
+        # 결과 반영(네트워크 종료)까지만 대기
+        wait_for_load_state(page, "networkidle", timeout=2000, replaced=2.0, name="charge_settle")
         context.close()
         browser.close()
 
@@ -220,7 +332,7 @@ if __name__ == "__main__":
         except ValueError:
             pass
             
-    sr = ScriptReporter("Balance Charge")
+    sr = TimedReporter("Balance Charge")
     with sync_playwright() as playwright:
         try:
             success = run(playwright, amount, sr)
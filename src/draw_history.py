@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from os import environ
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Winning-number history for 로또 6/45 and 연금복권 720.
+# Each game is one fixed-width structured NumPy array saved as .npy, so
+# load_history() is an np.load(mmap_mode="r"): no parsing, pages are read
+# only when touched. update() fetches only the rounds after the last stored
+# one, skips the network entirely when the calendar says no new draw has
+# happened, and revalidates "not published yet" answers with conditional
+# requests (ETag / Last-Modified kept in a small JSON cache).
+#
+# 6/45 uses the public getLottoNumber JSON API. 720 has no equivalent, so its
+# source is LOTTO720_HISTORY_URL, returning per round:
+#   {"returnValue": "success", "round": 1, "date": "2020-05-07",
+#    "group": 3, "numbers": "123456", "bonus": "654321"}
+# Both URLs take a {round} placeholder and can point at mock_site.py.
+# Settings are read lazily because .env is loaded by login.py / main.
+
+KST = timezone(timedelta(hours=9))
+GAMES = {
+    # first draw (KST) and weekly draw time
+    "645": {"first": datetime(2002, 12, 7, 20, 45, tzinfo=KST), "file": "lotto645.npy"},
+    "720": {"first": datetime(2020, 5, 7, 19, 5, tzinfo=KST), "file": "lotto720.npy"},
+}
+DEFAULT_URLS = {
+    "645": "https://www.dhlottery.co.kr/common.do?method=getLottoNumber&drwNo={round}",
+    "720": "",
+}
+RETRY_AFTER_SECONDS = 600   # a "not published yet" answer is trusted this long
+REQUEST_TIMEOUT = 10
+
+DTYPES = {
+    "645": [("round", "<u2"), ("date", "<i4"), ("numbers", "u1", (6,)), ("bonus", "u1"), ("mask", "<u8")],
+    "720": [("round", "<u2"), ("date", "<i4"), ("group", "u1"), ("numbers", "u1", (6,)), ("bonus", "u1", (6,))],
+}
+EPOCH = date(1970, 1, 1)
+
+
+def history_dir() -> Path:
+    return Path(environ.get('HISTORY_DIR', str(Path.home() / ".cache" / "lotto" / "history")))
+
+
+def history_url(game: str) -> str:
+    return environ.get(f'LOTTO{game}_HISTORY_URL', DEFAULT_URLS[game])
+
+
+def history_path(game: str) -> Path:
+    return history_dir() / GAMES[game]["file"]
+
+
+def to_day(value: str) -> int:
+    """'YYYY-MM-DD' -> days since 1970-01-01 (the stored date)."""
+    return (date.fromisoformat(value[:10]) - EPOCH).days
+
+
+def from_day(days: int) -> str:
+    return (EPOCH + timedelta(days=int(days))).isoformat()
+
+
+def expected_round(game: str, now: datetime = None) -> int:
+    """Latest round that should have been drawn by now (weekly draws)."""
+    now = now or datetime.now(KST)
+    first = GAMES[game]["first"]
+    if now < first:
+        return 0
+    return (now - first) // timedelta(weeks=1) + 1
+
+
+_dtypes = {}
+
+
+def history_dtype(game: str):
+    """np.dtype for DTYPES[game], built once (building it costs more than the mmap)."""
+    if game not in _dtypes:
+        import numpy as np
+        _dtypes[game] = np.dtype(DTYPES[game])
+    return _dtypes[game]
+
+
+def empty_history(game: str):
+    import numpy as np
+    return np.zeros(0, dtype=history_dtype(game))
+
+
+def load_history(game: str, path=None):
+    """
+    Memory-maps the stored rounds (ascending, contiguous from round 1 when
+    complete). Returns an empty array when nothing is stored yet.
+
+    The file is a regular .npy written by _save_history with DTYPES[game];
+    only the header length is read here (np.load would parse the header dict,
+    ~10x slower than the mapping itself).
+    """
+    import mmap
+    import numpy as np
+
+    path = Path(path or history_path(game))
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return empty_history(game)
+    with f:
+        head = f.read(12)
+        if head[:6] != b"\x93NUMPY":
+            raise ValueError(f"{path} is not a history file")
+        offset = 10 + int.from_bytes(head[8:10], "little") if head[6] == 1 else 12 + int.from_bytes(head[8:12], "little")
+        size = os.fstat(f.fileno()).st_size
+        dtype = history_dtype(game)
+        if (size - offset) % dtype.itemsize:
+            return np.load(path, mmap_mode="r")  # written with another layout
+        if size == offset:
+            return empty_history(game)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(buffer, dtype=dtype, offset=offset)
+
+
+def round_index(history, round_number: int):
+    """Row for a round number, or None."""
+    import numpy as np
+
+    i = int(np.searchsorted(history["round"], round_number))
+    return i if i < len(history) and history["round"][i] == round_number else None
+
+
+def _save_history(game: str, history, path=None):
+    import numpy as np
+
+    path = Path(path or history_path(game))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(history))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# --- fetching --------------------------------------------------------------
+
+class _HttpCache:
+    """Validators (ETag/Last-Modified) and last 'not published' times per URL."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+
+    def get(self, url: str) -> dict:
+        return self.entries.get(url, {})
+
+    def put(self, url: str, **values):
+        self.entries[url] = dict(self.entries.get(url, {}), **values)
+        self.dirty = True
+
+    def drop(self, url: str):
+        if self.entries.pop(url, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class _Fetcher:
+    """Keep-alive GETs (one connection per host) with conditional headers."""
+
+    def __init__(self, cache: _HttpCache):
+        self.cache = cache
+        self.connections = {}
+        self.requests = 0
+        self.not_modified = 0
+
+    def _connection(self, parts):
+        key = (parts.scheme, parts.netloc)
+        if key not in self.connections:
+            cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            self.connections[key] = cls(parts.netloc, timeout=REQUEST_TIMEOUT)
+        return self.connections[key]
+
+    def get_json(self, url: str):
+        """
+        Returns the decoded JSON body, or None for 304 Not Modified / 404.
+        """
+        parts = urlsplit(url)
+        validators = self.cache.get(url)
+        headers = {"User-Agent": "Mozilla/5.0 (lotto history)", "Accept": "application/json"}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        for attempt in range(2):
+            conn = self._connection(parts)
+            try:
+                conn.request("GET", target, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # stale keep-alive connection: reconnect once
+                conn.close()
+                self.connections.pop((parts.scheme, parts.netloc), None)
+                if attempt:
+                    raise
+        self.requests += 1
+        if response.status == 304:
+            self.not_modified += 1
+            return None
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise RuntimeError(f"GET {url}: HTTP {response.status}")
+        self.cache.put(url, etag=response.getheader("ETag"), last_modified=response.getheader("Last-Modified"))
+        return json.loads(body.decode("utf-8-sig"))
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+
+
+def _parse_645(data: dict) -> tuple:
+    numbers = sorted(int(data[f"drwtNo{i}"]) for i in range(1, 7))
+    mask = sum(1 << n for n in numbers)
+    return (int(data["drwNo"]), to_day(data["drwNoDate"]), numbers, int(data["bnusNo"]), mask)
+
+
+def _parse_720(data: dict) -> tuple:
+    digits = lambda value: [int(d) for d in str(value).zfill(6)]
+    return (int(data["round"]), to_day(data["date"]), int(data["group"]), digits(data["numbers"]), digits(data["bonus"]))
+
+
+PARSERS = {"645": _parse_645, "720": _parse_720}
+
+
+def fetch_round(fetcher: _Fetcher, game: str, round_number: int):
+    """One round as a record tuple, or None if it is not published (yet)."""
+    url = history_url(game).format(round=round_number)
+    cached = fetcher.cache.get(url)
+    if cached.get("missing_at") and time.time() - cached["missing_at"] < RETRY_AFTER_SECONDS:
+        return None
+    data = fetcher.get_json(url)
+    if not data or data.get("returnValue", "success") != "success":
+        fetcher.cache.put(url, missing_at=time.time())
+        return None
+    fetcher.cache.drop(url)  # published rounds never change; keep the cache small
+    return PARSERS[game](data)
+
+
+def update(game: str, max_rounds: int = None, force: bool = False, now: datetime = None) -> int:
+    """
+    Appends the rounds after the last stored one.
+
+    Returns:
+        int: number of rounds added
+    """
+    import numpy as np
+
+    url = history_url(game)
+    if not url:
+        print(f"{game}: LOTTO{game}_HISTORY_URL is not set, skipping")
+        return 0
+    history = load_history(game)
+    last = int(history["round"][-1]) if len(history) else 0
+    expected = expected_round(game, now)
+    if last >= expected and not force:
+        print(f"{game}: up to date (round {last})")
+        return 0
+
+    history_dir().mkdir(parents=True, exist_ok=True)
+    cache = _HttpCache(history_dir() / "http_cache.json")
+    fetcher = _Fetcher(cache)
+    records = []
+    start = time.perf_counter()
+    try:
+        round_number = last + 1
+        while (force or round_number <= expected) and (max_rounds is None or len(records) < max_rounds):
+            record = fetch_round(fetcher, game, round_number)
+            if record is None:
+                break
+            records.append(record)
+            round_number += 1
+    finally:
+        # keep whatever was fetched before an error
+        fetcher.close()
+        if records:
+            added = np.array(records, dtype=history_dtype(game))
+            _save_history(game, np.concatenate([np.asarray(history), added]))
+        cache.save()
+    print(f"{game}: +{len(records)} round(s) (now {last + len(records)}), {fetcher.requests} request(s), "
+          f"{fetcher.not_modified} not modified, {time.perf_counter() - start:.2f}s")
+    return len(records)
+
+
+def winning_masks(path=None):
+    """45-bit masks of every stored 6/45 winning combination (for number_gen)."""
+    return load_history("645", path)["mask"]
+
+
+def format_round(game: str, row) -> str:
+    if game == "645":
+        numbers = " ".join(f"{n:2d}" for n in row["numbers"])
+        return f"{int(row['round']):5d} {from_day(row['date'])}  {numbers}  + {int(row['bonus']):2d}"
+    numbers = "".join(str(d) for d in row["numbers"])
+    bonus = "".join(str(d) for d in row["bonus"])
+    return f"{int(row['round']):5d} {from_day(row['date'])}  {int(row['group'])}조 {numbers}  보너스 {bonus}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Winning-number history (6/45, 720)")
+    parser.add_argument("command", choices=["update", "show", "info"])
+    parser.add_argument("--game", choices=["645", "720", "all"], default="all")
+    parser.add_argument("--max", type=int, help="update: fetch at most this many rounds")
+    parser.add_argument("--force", action="store_true", help="update: ask for the next round even if not due")
+    parser.add_argument("--last", type=int, default=5, help="show: number of recent rounds")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    games = ["645", "720"] if args.game == "all" else [args.game]
+    try:
+        for game in games:
+            if args.command == "update":
+                update(game, args.max, args.force)
+            elif args.command == "show":
+                history = load_history(game)
+                for row in history[-args.last:]:
+                    print(f"[{game}] {format_round(game, row)}")
+            else:
+                import numpy  # noqa: F401  (time the load, not the import)
+                start = time.perf_counter()
+                history = load_history(game)
+                elapsed = time.perf_counter() - start
+                path = history_path(game)
+                size = path.stat().st_size if path.exists() else 0
+                rounds = f"{int(history['round'][0])}-{int(history['round'][-1])}" if len(history) else "-"
+                print(f"{game}: {len(history)} round(s) [{rounds}], {size:,} bytes, "
+                      f"{history.dtype.itemsize} bytes/round, loaded in {elapsed * 1e6:.0f} µs, "
+                      f"expected latest {expected_round(game)}")
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
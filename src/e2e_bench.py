@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+# End-to-end latency benchmark against the local mock site (mock_site.py).
+# Drives the real flow functions (login, get_balance, charge_deposit,
+# lotto720.purchase, lotto645.purchase) in a fresh context per iteration and
+# reports wall time per flow and per stage. Never touches the live site.
+
+MOCK_PIN = "123456"
+
+# Mock credentials only, and no HTTP session probe: context.request bypasses
+# context.route, so the probe would reach the live site. Must be set before
+# importing login/charge/glyph_cache, which read them at import time.
+os.environ.update({"USER_ID": "mockuser", "PASSWD": "mockpass", "CHARGE_PIN": MOCK_PIN, "SESSION_PROBE": "false"})
+_BENCH_DIR = tempfile.mkdtemp(prefix="lotto-bench-")
+os.environ.setdefault("KEYPAD_CACHE_PATH", os.path.join(_BENCH_DIR, "glyphs.json"))
+os.environ["LEDGER_PATH"] = os.path.join(_BENCH_DIR, "ledger.db")
+
+from playwright.sync_api import sync_playwright
+from login import login, launch_browser, new_context, setup_dialog_handler
+from balance import get_balance
+from charge import charge_deposit
+from mock_site import MockSite, FAILURE_POINTS, parse_failures
+from keypad_bench import percentile
+from spans import TimedReporter
+import lotto645
+import lotto720
+
+
+def flow_login(page, sr):
+    sr.stage("LOGIN")
+    login(page)
+    return True
+
+
+def flow_balance(page, sr):
+    sr.stage("GET_BALANCE")
+    return get_balance(page)["deposit_balance"] > 0
+
+
+def flow_charge(page, sr):
+    sr.stage("CHARGE")
+    return charge_deposit(page, 10000)
+
+
+def flow_720(page, sr):
+    return lotto720.purchase(page, sr).get("processed_count", 0) > 0
+
+
+def flow_645(page, sr):
+    return lotto645.purchase(page, 1, [[1, 2, 3, 4, 5, 6]], sr).get("processed_count", 0) > 0
+
+
+FLOWS = {
+    "login": flow_login,
+    "balance": flow_balance,
+    "charge": flow_charge,
+    "720": flow_720,
+    "645": flow_645,
+}
+
+
+def run_iteration(browser, site: MockSite, flows: list) -> dict:
+    """
+    Runs the flows in order on one fresh context (cookies carry over between flows).
+
+    Returns:
+        {flow: {'wall', 'ok', 'error', 'stages': {stage: seconds}, 'waits': seconds}}
+    """
+    context = new_context(browser)
+    site.attach(context)
+    page = context.new_page()
+    setup_dialog_handler(page)
+    results = {}
+    try:
+        for name in flows:
+            sr = TimedReporter(f"bench {name}", adapters=[], metrics_dir="")
+            error = None
+            start = time.perf_counter()
+            try:
+                ok = bool(FLOWS[name](page, sr))
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+            wall = time.perf_counter() - start
+            (sr.success if ok else sr.fail)(error)
+            stages = {}
+            for span in sr.spans:
+                if span["kind"] == "stage":
+                    stages[span["name"]] = stages.get(span["name"], 0.0) + span["duration"]
+            waits = sum(s["duration"] for s in sr.spans if s["kind"] == "wait")
+            results[name] = {"wall": wall, "ok": ok, "error": error, "stages": stages, "waits": waits}
+    finally:
+        context.close()
+    return results
+
+
+def summarize(runs: list) -> dict:
+    """Aggregates iteration results into p50/p95/mean per flow and stage."""
+    def stats(values: list) -> dict:
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "mean": sum(values) / len(values) if values else 0.0,
+        }
+
+    summary = {}
+    for name in FLOWS:
+        results = [run[name] for run in runs if name in run]
+        if not results:
+            continue
+        stage_values = {}
+        for r in results:
+            for stage, seconds in r["stages"].items():
+                stage_values.setdefault(stage, []).append(seconds)
+        errors = {}
+        for r in results:
+            if r["error"]:
+                errors[r["error"]] = errors.get(r["error"], 0) + 1
+        summary[name] = {
+            "runs": len(results),
+            "failures": sum(not r["ok"] for r in results),
+            "wall": stats([r["wall"] for r in results]),
+            "waits": stats([r["waits"] for r in results]),
+            "stages": {stage: stats(values) for stage, values in stage_values.items()},
+            "errors": errors,
+        }
+    return summary
+
+
+def print_report(summary: dict, site_stats: dict):
+    print(f"{'flow / stage':<24}{'runs':>6}{'fail':>6}{'p50 s':>9}{'p95 s':>9}{'mean s':>9}{'waits s':>9}")
+    for name, s in summary.items():
+        print(f"{name:<24}{s['runs']:>6}{s['failures']:>6}{s['wall']['p50']:>9.3f}{s['wall']['p95']:>9.3f}"
+              f"{s['wall']['mean']:>9.3f}{s['waits']['mean']:>9.3f}")
+        for stage, st in s["stages"].items():
+            print(f"  {stage:<22}{'':>12}{st['p50']:>9.3f}{st['p95']:>9.3f}{st['mean']:>9.3f}")
+        for error, count in s["errors"].items():
+            print(f"  ! {count}x {error[:100]}")
+    server = {k: v for k, v in site_stats.items() if not k.startswith(("GET ", "POST "))}
+    print("Mock site: " + ", ".join(f"{k}={v}" for k, v in sorted(server.items())))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark against the local mock site")
+    parser.add_argument("-n", "--iterations", type=int, default=10)
+    parser.add_argument("--flows", default=",".join(FLOWS), help=f"comma separated, in order: {', '.join(FLOWS)}")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mock server latency per response")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--popup-rate", type=float, default=0.3, help="chance of a blocking popup on the login page")
+    parser.add_argument("--fail", default="", help=f"failure injection, e.g. login=0.1,charge=0.2 ({', '.join(FAILURE_POINTS)})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write per-iteration results and the summary as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+    unknown = [f for f in flows if f not in FLOWS]
+    if unknown:
+        print(f"Unknown flow(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    site = MockSite(args.latency_ms, args.jitter_ms, args.popup_rate, parse_failures(args.fail),
+                    pin=MOCK_PIN, seed=args.seed).start()
+    runs = []
+    try:
+        with sync_playwright() as playwright:
+            browser = launch_browser(playwright, headless=True)
+            try:
+                for i in range(args.iterations):
+                    start = time.perf_counter()
+                    runs.append(run_iteration(browser, site, flows))
+                    print(f"Iteration {i + 1}/{args.iterations}: {time.perf_counter() - start:.2f}s")
+            finally:
+                browser.close()
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        site.stop()
+
+    summary = summarize(runs)
+    print_report(summary, dict(site.stats))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "summary": summary, "runs": runs, "site": dict(site.stats)}, f, indent=2)
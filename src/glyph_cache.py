@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from recognizers import glyph_image
+
+# Learned keypad glyphs: normalized button bitmap -> digit.
+# The random keypad only shuffles the same glyph artwork, so once a glyph has
+# been typed in a successful charge it can be recognized without OCR.
+
+CACHE_VERSION = 2                # 2: keys share recognizers.glyph_image normalization
+GLYPH_SIZE = 16                  # glyphs are normalized to GLYPH_SIZE x GLYPH_SIZE bits
+MATCH_DISTANCE = 12              # max differing bits (of 256) for a cache hit
+MATCH_MARGIN = 16                # nearest other digit must be this many bits further away
+MAX_ENTRIES_PER_DIGIT = 4        # keep a few variants per digit (scaling/DPR differences)
+MAX_AGE_DAYS = 90                # evict glyphs not seen for this long (artwork changed)
+
+KEYPAD_CACHE_PATH = os.environ.get(
+    'KEYPAD_CACHE_PATH',
+    str(Path.home() / ".cache" / "lotto" / "keypad_glyphs.json"),
+)
+
+
+def glyph_key(image) -> int:
+    """
+    Packs the normalized glyph (recognizers.glyph_image: outline trimmed,
+    denoised, cropped to the ink) into a GLYPH_SIZE x GLYPH_SIZE bit int.
+    None for a blank crop.
+    """
+    small = glyph_image(image)
+    if small is None:
+        return None
+    key = 0
+    for value in small.getdata():
+        key = (key << 1) | (1 if value > 127 else 0)
+    return key
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class GlyphCache:
+    """On-disk glyph -> digit cache with versioning and LRU/age eviction."""
+
+    def __init__(self, path: str = KEYPAD_CACHE_PATH, entries: list = None):
+        self.path = path
+        self.entries = entries or []
+
+    @classmethod
+    def load(cls, path: str = KEYPAD_CACHE_PATH) -> "GlyphCache":
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != CACHE_VERSION:
+            print("Keypad glyph cache version changed. Starting fresh.")
+            return cls(path)
+        entries = [dict(e, bits=int(e["bits"], 16)) for e in data.get("entries", [])]
+        return cls(path, entries)
+
+    def save(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": CACHE_VERSION,
+            "glyph_size": GLYPH_SIZE,
+            "entries": [dict(e, bits=format(e["bits"], "x")) for e in self.entries],
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _nearest(self, key: int):
+        best, best_distance = None, MATCH_DISTANCE + 1
+        for entry in self.entries:
+            distance = hamming(entry["bits"], key)
+            if distance < best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def lookup(self, key: int):
+        """
+        Returns the cached digit for a glyph, None if unknown or ambiguous.
+        A hit needs the nearest entry within MATCH_DISTANCE and every entry
+        for another digit at least MATCH_MARGIN bits further away.
+        """
+        if key is None:
+            return None
+        entry = self._nearest(key)
+        if entry is None:
+            return None
+        distance = hamming(entry["bits"], key)
+        others = [hamming(e["bits"], key) for e in self.entries if e["digit"] != entry["digit"]]
+        if others and min(others) - distance < MATCH_MARGIN:
+            return None
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["last_seen"] = time.time()
+        return entry["digit"]
+
+    def learn(self, key: int, digit: str):
+        """Stores a confirmed glyph. A conflicting nearby entry is replaced."""
+        if key is None:
+            return
+        now = time.time()
+        entry = self._nearest(key)
+        if entry is not None:
+            if entry["digit"] == digit:
+                entry["last_seen"] = now
+                return
+            # Same artwork now means another digit: the site changed its glyphs
+            self.entries.remove(entry)
+        self.entries.append({"bits": key, "digit": digit, "hits": 0, "last_seen": now})
+        self.evict()
+
+    def evict(self):
+        cutoff = time.time() - MAX_AGE_DAYS * 86400
+        self.entries = [e for e in self.entries if e["last_seen"] >= cutoff]
+        by_digit = {}
+        for entry in sorted(self.entries, key=lambda e: e["last_seen"], reverse=True):
+            by_digit.setdefault(entry["digit"], []).append(entry)
+        self.entries = [e for group in by_digit.values() for e in group[:MAX_ENTRIES_PER_DIGIT]]
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import json
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# HAR record / replay for the flows.
+# HAR_MODE=record captures each script's context into HAR_DIR/<name>.har
+# (real network, real purchases!) and sanitizes it when the context closes.
+# HAR_MODE=replay serves the context from that archive with no network at
+# all; responses are replayed per (method, URL) in recorded order, so a login
+# POST with a different body still gets its recorded redirect.
+# Both modes print how much of the flow was network vs. our own code.
+
+HAR_MODE = os.environ.get('HAR_MODE', 'off').lower()
+HAR_DIR = os.environ.get('HAR_DIR', str(Path(__file__).resolve().parent.parent / "har"))
+HAR_URL_FILTER = re.compile(r"dhlottery\.co\.kr")
+
+REDACTED = "REDACTED"
+SECRET_FIELDS = re.compile(r"(id|pw|pass|pswd|encn|pin|card|acnt|account|phone|email|name)", re.I)
+SECRET_HEADERS = {"cookie", "authorization"}
+SECRET_PATTERNS = [
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),          # email
+    re.compile(r"01[016789]-?\d{3,4}-?\d{4}"),         # 휴대폰 번호
+]
+_DROP_RESPONSE_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+
+
+def har_path(name: str) -> Path:
+    return Path(HAR_DIR) / f"{name}.har"
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+# --- sanitizing ----------------------------------------------------------
+
+def _redact_query(url: str) -> str:
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, REDACTED if SECRET_FIELDS.search(k) else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _redact_text(text: str, literals: list) -> str:
+    for literal in literals:
+        text = text.replace(literal, REDACTED)
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(REDACTED, text)
+    return text
+
+
+def sanitize_har(data: dict, literals: list = None) -> dict:
+    """
+    Removes credentials and personal data from a HAR in place:
+    cookies, Cookie/Authorization headers, Set-Cookie values, secret-looking
+    form/query fields, the account's own id/password anywhere in text, and
+    emails/phone numbers in text bodies.
+    """
+    literals = [s for s in (literals or []) if s and len(s) >= 4]
+    for entry in data.get("log", {}).get("entries", []):
+        request, response = entry["request"], entry["response"]
+        request["url"] = _redact_query(request["url"])
+        request["cookies"] = []
+        request["headers"] = [h for h in request["headers"] if h["name"].lower() not in SECRET_HEADERS]
+        request["queryString"] = [
+            dict(q, value=REDACTED if SECRET_FIELDS.search(q["name"]) else q["value"])
+            for q in request.get("queryString", [])
+        ]
+        post = request.get("postData")
+        if post:
+            post["params"] = [
+                dict(p, value=REDACTED if SECRET_FIELDS.search(p["name"]) else p.get("value", ""))
+                for p in post.get("params", [])
+            ]
+            text = post.get("text", "")
+            if "x-www-form-urlencoded" in post.get("mimeType", ""):
+                text = urlencode([(k, REDACTED if SECRET_FIELDS.search(k) else v)
+                                  for k, v in parse_qsl(text, keep_blank_values=True)])
+            post["text"] = _redact_text(text, literals)
+
+        response["cookies"] = []
+        for header in response["headers"]:
+            if header["name"].lower() == "set-cookie":
+                name, _, rest = header["value"].partition("=")
+                attributes = rest.partition(";")[2]
+                header["value"] = f"{name}={REDACTED};{attributes}" if attributes else f"{name}={REDACTED}"
+        content = response.get("content", {})
+        if content.get("text") and content.get("encoding") != "base64":
+            content["text"] = _redact_text(content["text"], literals)
+    return data
+
+
+def sanitize_file(path, literals: list = None):
+    with open(path) as f:
+        data = json.load(f)
+    sanitize_har(data, literals)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# --- profiling -----------------------------------------------------------
+
+def profile_har(data: dict) -> dict:
+    """
+    Splits a recorded flow into network and non-network time.
+    network_busy is the union of all request intervals, so parallel requests
+    are not double counted; everything else in the span is our code, rendering
+    and waits.
+    """
+    intervals, phases, slowest = [], {}, []
+    for entry in data.get("log", {}).get("entries", []):
+        if entry.get("time", -1) < 0:
+            continue
+        start = _parse_time(entry["startedDateTime"])
+        duration = entry["time"] / 1000
+        intervals.append((start, start + duration))
+        for phase, ms in entry.get("timings", {}).items():
+            if isinstance(ms, (int, float)) and ms > 0:
+                phases[phase] = phases.get(phase, 0.0) + ms / 1000
+        slowest.append((duration, entry["request"]["method"], entry["request"]["url"]))
+    if not intervals:
+        return {"requests": 0, "span": 0.0, "network_busy": 0.0, "phases": {}, "slowest": []}
+
+    intervals.sort()
+    busy, (cur_start, cur_end) = 0.0, intervals[0]
+    for start, end in intervals[1:]:
+        if start > cur_end:
+            busy += cur_end - cur_start
+            cur_start, cur_end = start, end
+        else:
+            cur_end = max(cur_end, end)
+    busy += cur_end - cur_start
+    span = max(e for _, e in intervals) - intervals[0][0]
+    return {
+        "requests": len(intervals),
+        "span": span,
+        "network_busy": busy,
+        "phases": phases,
+        "slowest": sorted(slowest, reverse=True)[:5],
+    }
+
+
+def print_profile(profile: dict, wall: float = None):
+    wall = wall or profile["span"]
+    busy = profile["network_busy"]
+    share = busy / wall if wall else 0.0
+    print(f"HAR profile: {profile['requests']} request(s), network {busy:.2f}s of {wall:.2f}s "
+          f"({share:.0%}), own code/rendering/waits {max(wall - busy, 0):.2f}s")
+    if profile["phases"]:
+        print("  phases: " + ", ".join(f"{k}={v:.2f}s" for k, v in sorted(profile["phases"].items(), key=lambda kv: -kv[1])))
+    for duration, method, url in profile["slowest"]:
+        print(f"  {duration:6.3f}s {method} {url[:100]}")
+
+
+# --- replay --------------------------------------------------------------
+
+class HarReplayer:
+    """Serves a context from a HAR file; unknown requests are aborted (no network)."""
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.data = json.load(f)
+        self.entries = {}
+        self.fallback = {}
+        for entry in self.data.get("log", {}).get("entries", []):
+            method, url = entry["request"]["method"], entry["request"]["url"].split("#")[0]
+            self.entries.setdefault((method, url), deque()).append(entry)
+            self.fallback.setdefault((method, url.split("?")[0]), deque()).append(entry)
+        self.served = 0
+        self.missing = []
+
+    def _next(self, method: str, url: str):
+        url = url.split("#")[0]
+        for index, key in ((self.entries, (method, url)), (self.fallback, (method, url.split("?")[0]))):
+            queue = index.get(key)
+            if queue:
+                # recorded order; the last response repeats
+                return queue.popleft() if len(queue) > 1 else queue[0]
+        return None
+
+    def _fulfillment(self, route, router=None):
+        """"fallback" for blocked requests, None for unknown ones (abort), else fulfill kwargs."""
+        request = route.request
+        if router is not None and router.should_block(request.resource_type, request.url):
+            return "fallback"
+        entry = self._next(request.method, request.url)
+        if entry is None or entry["response"]["status"] <= 0:
+            self.missing.append(f"{request.method} {request.url}")
+            return None
+        response = entry["response"]
+        content = response.get("content", {})
+        text = content.get("text", "")
+        body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode()
+        headers = {h["name"]: h["value"] for h in response["headers"]
+                   if h["name"].lower() not in _DROP_RESPONSE_HEADERS}
+        self.served += 1
+        return {"status": response["status"], "headers": headers, "body": body}
+
+    def handle(self, route, router=None):
+        try:
+            fulfillment = self._fulfillment(route, router)
+            if fulfillment == "fallback":
+                route.fallback()
+            elif fulfillment is None:
+                route.abort()
+            else:
+                route.fulfill(**fulfillment)
+        except Exception:
+            # Page/context already closed
+            pass
+
+    async def handle_async(self, route, router=None):
+        try:
+            fulfillment = self._fulfillment(route, router)
+            if fulfillment == "fallback":
+                await route.fallback()
+            elif fulfillment is None:
+                await route.abort()
+            else:
+                await route.fulfill(**fulfillment)
+        except Exception:
+            pass
+
+
+def _record_closer(path: Path, started: float):
+    def on_close(_):
+        # Playwright writes the HAR before the close event fires
+        try:
+            sanitize_file(path, [os.environ.get('USER_ID'), os.environ.get('PASSWD')])
+            with open(path) as f:
+                print_profile(profile_har(json.load(f)), time.time() - started)
+            print(f"HAR recorded (sanitized): {path}")
+        except (OSError, ValueError) as e:
+            print(f"HAR post-processing failed: {e}")
+    return on_close
+
+
+def _replayer(path: Path) -> HarReplayer:
+    if not path.exists():
+        raise FileNotFoundError(f"HAR_MODE=replay but {path} does not exist (record it with HAR_MODE=record)")
+    return HarReplayer(path)
+
+
+def _replay_closer(replayer: HarReplayer, started: float):
+    recorded = profile_har(replayer.data)
+
+    def on_close(_):
+        wall = time.time() - started
+        print(f"HAR replay: {replayer.served} served, {len(replayer.missing)} missing, {wall:.2f}s "
+              f"(recorded network time {recorded['network_busy']:.2f}s)")
+        for miss in replayer.missing[:5]:
+            print(f"  missing: {miss[:120]}")
+    return on_close
+
+
+def attach_har(context, name: str, mode: str = None):
+    """
+    Hooks HAR recording or replay into a freshly created context (called by
+    login.new_context). Returns None when HAR_MODE is off.
+    """
+    mode = (mode or HAR_MODE)
+    if mode not in ("record", "replay"):
+        return None
+    path = har_path(name)
+    started = time.time()
+
+    if mode == "record":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        context.route_from_har(path, url=HAR_URL_FILTER, update=True, update_content="embed", update_mode="full")
+        context.on("close", _record_closer(path, started))
+        return path
+
+    replayer = _replayer(path)
+    context.route("**/*", lambda route: replayer.handle(route, getattr(context, "_request_router", None)))
+    context.on("close", _replay_closer(replayer, started))
+    return replayer
+
+
+async def attach_har_async(context, name: str, mode: str = None):
+    """attach_har for playwright.async_api contexts."""
+    mode = (mode or HAR_MODE)
+    if mode not in ("record", "replay"):
+        return None
+    path = har_path(name)
+    started = time.time()
+
+    if mode == "record":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        await context.route_from_har(path, url=HAR_URL_FILTER, update=True, update_content="embed", update_mode="full")
+        context.on("close", _record_closer(path, started))
+        return path
+
+    replayer = _replayer(path)
+    await context.route("**/*", lambda route: replayer.handle_async(route, getattr(context, "_request_router", None)))
+    context.on("close", _replay_closer(replayer, started))
+    return replayer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HAR archive tools")
+    parser.add_argument("command", choices=["profile", "sanitize"])
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    from login import load_environment
+    load_environment()
+    for file in args.files:
+        if args.command == "sanitize":
+            sanitize_file(file, [os.environ.get('USER_ID'), os.environ.get('PASSWD')])
+            print(f"Sanitized {file}")
+        else:
+            with open(file) as f:
+                print(f"{file}:")
+                print_profile(profile_har(json.load(f)))
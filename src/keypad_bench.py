@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from recognizers import (
+    OCR_CONFIGS, TEMPLATE_FONTS, RecognitionError, Recognizer, TemplateRecognizer, TesseractRecognizer,
+    FallbackRecognizer, _load_font, _ocr_digit, _tesseract_on_path, configure_tesseract, preprocess_button,
+)
+
+# Offline keypad OCR benchmark.
+# Renders randomized 12-button keypads in the site's style (4x3 grid, shuffled
+# digits, 전체삭제/백스페이스 icons) with scale/DPR/noise variants, crops them
+# the same way charge.capture_keypad does and scores each recognizer.
+
+CLEAR, BACKSPACE = "CLEAR", "BKSP"
+LABELS = list("0123456789") + [CLEAR, BACKSPACE]
+# Digit artwork for the corpus. None of these are template fonts
+# (recognizers.TEMPLATE_FONTS), so the benchmark does not grade the
+# templates against the pixels they were rendered from.
+CORPUS_FONTS = [
+    "DejaVuSerif.ttf", "DejaVuSerif-Bold.ttf", "DejaVuSansMono.ttf", "DejaVuSansMono-Bold.ttf",
+    "LiberationSans-Bold.ttf", "LiberationSans-Regular.ttf", "NanumGothicBold.ttf", "Verdana.ttf",
+]
+
+
+def available_fonts(names: list) -> list:
+    """Font names from `names` that PIL can load on this machine."""
+    from PIL import ImageFont
+
+    found = []
+    for name in names:
+        try:
+            ImageFont.truetype(name, 12)
+        except OSError:
+            continue
+        found.append(name)
+    return found
+
+
+def render_keypad(rng: random.Random, button_size: int = 72, dpr: float = 1.0,
+                  noise: float = 0.0, blur: float = 0.0, font_path: str = None):
+    """
+    Renders one shuffled keypad.
+
+    Returns:
+        (image, buttons, labels): screenshot-like image at device resolution,
+        button rects in CSS pixels [{'x','y','w','h'}] and the label per button.
+    """
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+    labels = LABELS[:]
+    rng.shuffle(labels)
+    gap, cols, rows = 6, 3, 4
+    width_css = cols * button_size + (cols + 1) * gap
+    height_css = rows * button_size + (rows + 1) * gap
+    s = dpr
+    img = Image.new('RGB', (round(width_css * s), round(height_css * s)), (226, 229, 234))
+    draw = ImageDraw.Draw(img)
+    font_size = round(button_size * rng.uniform(0.38, 0.5) * s)
+    font = ImageFont.truetype(font_path, font_size) if font_path else _load_font(font_size)
+
+    buttons = []
+    for n, label in enumerate(labels):
+        r, c = divmod(n, cols)
+        x, y = gap + c * (button_size + gap), gap + r * (button_size + gap)
+        buttons.append({'x': x, 'y': y, 'w': button_size, 'h': button_size})
+        box = [x * s, y * s, (x + button_size) * s, (y + button_size) * s]
+        shade = rng.randint(245, 255)
+        draw.rounded_rectangle(box, radius=round(8 * s), fill=(shade, shade, shade), outline=(200, 203, 210))
+        cx = (box[0] + box[2]) / 2 + rng.uniform(-3, 3) * s
+        cy = (box[1] + box[3]) / 2 + rng.uniform(-3, 3) * s
+        ink = (rng.randint(20, 60),) * 3
+        if label == BACKSPACE:
+            w = button_size * 0.22 * s
+            draw.polygon([(cx - w, cy), (cx - w / 2, cy - w / 2), (cx + w, cy - w / 2),
+                          (cx + w, cy + w / 2), (cx - w / 2, cy + w / 2)], outline=ink, width=max(1, round(2 * s)))
+        elif label == CLEAR:
+            w = button_size * 0.15 * s
+            draw.line([(cx - w, cy - w), (cx + w, cy + w)], fill=ink, width=max(1, round(3 * s)))
+            draw.line([(cx - w, cy + w), (cx + w, cy - w)], fill=ink, width=max(1, round(3 * s)))
+        else:
+            draw.text((cx, cy), label, fill=ink, font=font, anchor="mm")
+
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur * s))
+    if noise:
+        import numpy as np
+
+        arr = np.asarray(img, dtype=np.float32)
+        arr += np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, noise, arr.shape)
+        img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+    return img, buttons, labels
+
+
+def crop_buttons(img, buttons: list, width_css: float) -> list:
+    """Crops buttons exactly like charge.capture_keypad (CSS rect * screenshot scale)."""
+    scale = img.width / width_css
+    crops = []
+    for b in buttons:
+        lx, ly = b['x'] * scale, b['y'] * scale
+        crop = img.crop((round(lx), round(ly), round(lx + b['w'] * scale), round(ly + b['h'] * scale)))
+        crops.append(preprocess_button(crop))
+    return crops
+
+
+def generate_corpus(count: int, seed: int = 0, fonts: list = None):
+    """
+    Yields (crops, labels, variant, image) for `count` randomized keypads.
+    Each keypad's digits use one font picked from `fonts` (default: the
+    installed CORPUS_FONTS); an empty list means the template font.
+    """
+    rng = random.Random(seed)
+    if fonts is None:
+        fonts = available_fonts(CORPUS_FONTS)
+        if not fonts:
+            print(f"None of the corpus fonts are installed. Falling back to the template font ({TEMPLATE_FONTS[0]})")
+    for _ in range(count):
+        variant = {
+            'button_size': rng.choice([56, 64, 72, 84]),
+            'dpr': rng.choice([1.0, 2.0, 3.0]),
+            'noise': rng.choice([0.0, 6.0, 12.0]),
+            'blur': rng.choice([0.0, 0.0, 0.6]),
+            'font_path': rng.choice(fonts) if fonts else None,
+        }
+        img, buttons, labels = render_keypad(rng, **variant)
+        width_css = 3 * variant['button_size'] + 4 * 6
+        yield crop_buttons(img, buttons, width_css), labels, variant, img
+
+
+class SingleConfigTesseract(Recognizer):
+    """One tesseract config, run serially (baseline for comparing configs)."""
+
+    def __init__(self, config: str, name: str):
+        self.config = config
+        self.name = name
+
+    def recognize(self, images: list) -> list:
+        results = []
+        for image in images:
+            try:
+                digit = _ocr_digit(image, self.config, 5.0)
+            except Exception:
+                digit = None
+            results.append((digit, 1.0 if digit else 0.0))
+        return results
+
+
+def build_engines(names: list, with_cache: bool) -> dict:
+    has_tesseract = bool(configure_tesseract()) or _tesseract_on_path()
+    engines = {}
+    for name in names:
+        if name.startswith("tesseract") and not has_tesseract:
+            print(f"Skipping {name}: tesseract not installed")
+            continue
+        if name == "tesseract":
+            engines[name] = TesseractRecognizer()
+        elif name.startswith("tesseract:psm"):
+            psm = name.split("psm", 1)[1]
+            config = next(c for c in OCR_CONFIGS if f"--psm {psm} " in c)
+            engines[name] = SingleConfigTesseract(config, name)
+        elif name == "template":
+            engines[name] = TemplateRecognizer(include_cache=with_cache)
+        elif name == "auto":
+            fallback = TesseractRecognizer() if has_tesseract else None
+            engines[name] = FallbackRecognizer(TemplateRecognizer(include_cache=with_cache), fallback)
+        else:
+            raise ValueError(f"Unknown engine: {name}")
+    return engines
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def benchmark(engines: dict, corpus: list) -> dict:
+    """
+    Scores every engine on the same corpus.
+
+    Returns:
+        {engine: {accuracy, keypad_success, false_digits, errors, latency_p50_ms,
+                  latency_p95_ms, confusion{true: {pred: n}}}}
+        errors counts keypads the engine refused with RecognitionError (all unread).
+    """
+    report = {}
+    for name, engine in engines.items():
+        correct = total = false_digits = complete = errors = 0
+        latencies = []
+        confusion = {d: {} for d in "0123456789"}
+        for crops, labels, _variant, _img in corpus:
+            start = time.perf_counter()
+            try:
+                results = engine.recognize(crops)
+            except RecognitionError:
+                errors += 1
+                results = [(None, 0.0)] * len(crops)
+            latencies.append((time.perf_counter() - start) * 1000)
+            keypad_ok = True
+            for (digit, _conf), label in zip(results, labels):
+                if label in confusion:
+                    total += 1
+                    predicted = digit or "none"
+                    confusion[label][predicted] = confusion[label].get(predicted, 0) + 1
+                    if digit == label:
+                        correct += 1
+                    else:
+                        keypad_ok = False
+                elif digit:
+                    # 전체삭제/백스페이스 read as a digit
+                    false_digits += 1
+                    keypad_ok = False
+            complete += keypad_ok
+        report[name] = {
+            'accuracy': correct / total if total else 0.0,
+            'keypad_success': complete / len(corpus) if corpus else 0.0,
+            'false_digits': false_digits,
+            'errors': errors,
+            'latency_p50_ms': percentile(latencies, 50),
+            'latency_p95_ms': percentile(latencies, 95),
+            'confusion': confusion,
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'engine':<16}{'accuracy':>10}{'keypads':>10}{'false':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, r in report.items():
+        print(f"{name:<16}{r['accuracy']:>10.1%}{r['keypad_success']:>10.1%}{r['false_digits']:>7}{r['errors']:>8}"
+              f"{r['latency_p50_ms']:>10.1f}{r['latency_p95_ms']:>10.1f}")
+    for name, r in report.items():
+        errors = {
+            true: {pred: n for pred, n in preds.items() if pred != true}
+            for true, preds in r['confusion'].items()
+        }
+        errors = {t: p for t, p in errors.items() if p}
+        if errors:
+            print(f"{name} confusions: " + ", ".join(
+                f"{t}->{p}x{n}" for t, preds in sorted(errors.items()) for p, n in sorted(preds.items())))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Offline keypad OCR accuracy/latency benchmark")
+    parser.add_argument("-n", "--count", type=int, default=50, help="number of synthetic keypads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", default="template,auto,tesseract,tesseract:psm10,tesseract:psm8",
+                        help="comma separated: template, auto, tesseract, tesseract:psm10, tesseract:psm8")
+    parser.add_argument("--font", help="comma separated TrueType fonts for digits "
+                                       "(default: installed CORPUS_FONTS, none of which are template fonts)")
+    parser.add_argument("--with-cache", action="store_true", help="include learned glyph cache templates")
+    parser.add_argument("--save", help="directory to write keypad PNGs and labels.jsonl")
+    parser.add_argument("--json", help="write the report as JSON to this path")
+    parser.add_argument("--min-accuracy", type=float, help="exit 1 if any engine is below this accuracy (CI)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    fonts = [f.strip() for f in args.font.split(",") if f.strip()] if args.font else None
+    corpus = list(generate_corpus(args.count, args.seed, fonts))
+
+    if args.save:
+        out = Path(args.save)
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / "labels.jsonl", "w") as f:
+            for n, (_crops, labels, variant, img) in enumerate(corpus):
+                img.save(out / f"keypad_{n:04d}.png")
+                f.write(json.dumps({"file": f"keypad_{n:04d}.png", "labels": labels, **variant}) + "\n")
+        print(f"Saved {len(corpus)} keypads to {out}")
+
+    engines = build_engines([e.strip() for e in args.engines.split(",") if e.strip()], args.with_cache)
+    report = benchmark(engines, corpus)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.min_accuracy is not None and any(r['accuracy'] < args.min_accuracy for r in report.values()):
+        sys.exit(1)
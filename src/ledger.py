@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from os import environ
+from pathlib import Path
+
+# Local purchase ledger (SQLite).
+# Every purchase and the tickets it issued are stored once, read from the
+# confirmation layer right after buying, so winning checks, spend reports and
+# duplicate detection are indexed queries instead of scraping the mypage
+# history. WAL mode lets a report run while a purchase is being written.
+# LEDGER_PATH is read lazily (.env is loaded by login.py); empty disables.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,                 -- '645' | '720'
+    round INTEGER NOT NULL,
+    purchased_at TEXT NOT NULL,         -- ISO 8601, local time
+    cost INTEGER NOT NULL,
+    ticket_count INTEGER NOT NULL,
+    source TEXT NOT NULL,               -- 'page' | 'response' | 'import'
+    raw TEXT
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    purchase_id INTEGER NOT NULL REFERENCES purchases(id),
+    game TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    purchased_at TEXT NOT NULL,
+    slot TEXT,                          -- 6/45 A~E
+    mode TEXT,                          -- 자동 | 수동 | 반자동
+    grp INTEGER,                        -- 720 조
+    numbers TEXT NOT NULL,              -- '1 2 3 4 5 6' | '123456'
+    mask INTEGER,                       -- 6/45 45-bit mask (tickets.ticket_masks)
+    tier INTEGER,                       -- NULL = not checked, 0 = no prize
+    checked_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_purchases_round ON purchases(game, round);
+CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases(purchased_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_round ON tickets(game, round);
+CREATE INDEX IF NOT EXISTS idx_tickets_date ON tickets(purchased_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_mask ON tickets(game, mask);
+CREATE INDEX IF NOT EXISTS idx_tickets_unchecked ON tickets(game, round) WHERE tier IS NULL;
+"""
+
+GAME_COST = {"645": 1000, "720": 1000}  # per ticket
+
+
+def ledger_path() -> str:
+    path = environ.get('LEDGER_PATH', str(Path.home() / ".local" / "share" / "lotto" / "ledger.db"))
+    return str(Path(path).expanduser()) if path else ""
+
+
+def ledger_enabled() -> bool:
+    # HAR replay purchases nothing
+    return bool(ledger_path()) and environ.get('HAR_MODE', 'off').lower() != "replay"
+
+
+# --- confirmation page parsing ---------------------------------------------
+
+# 보이는 결과 레이어 하나의 텍스트와 li 항목을 한 번의 evaluate로 읽음
+RESULT_LAYER_JS = """
+(selectors) => {
+    const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length) &&
+        getComputedStyle(el).visibility !== 'hidden';
+    for (const selector of selectors) {
+        for (const el of document.querySelectorAll(selector)) {
+            if (!visible(el)) continue;
+            return {
+                selector,
+                text: el.innerText,
+                items: Array.from(el.querySelectorAll('li')).map(li => li.innerText.trim()).filter(Boolean),
+            };
+        }
+    }
+    return null;
+}
+"""
+
+_ROUND = re.compile(r"제?\s*(\d{1,5})\s*회")
+_AMOUNT = re.compile(r"(?:결제|구매)\s*금액[^\d]*([\d,]+)\s*원")
+_GAME_645 = re.compile(r"\b([A-E])\s*(자동|수동|반자동)?\s*((?:\d{1,2}[\s,]+){5}\d{1,2})\b")
+_TICKET_720 = re.compile(r"([1-5])\s*조\s*(\d{6})")
+_FAILED = re.compile(r"실패|오류|초과|부족|불가")
+
+
+def parse_645_result(layer: dict) -> dict:
+    """
+    Parses a 6/45 confirmation layer ({'text', 'items'} from RESULT_LAYER_JS).
+
+    Returns:
+        {'ok', 'failed', 'round', 'games': [{'slot', 'mode', 'numbers'}], 'cost', 'message'} or None
+    """
+    if not layer:
+        return None
+    text = layer.get("text") or ""
+    games = []
+    for line in (layer.get("items") or []) + [text]:
+        for slot, mode, numbers in _GAME_645.findall(line):
+            if any(g["slot"] == slot for g in games):
+                continue
+            games.append({"slot": slot, "mode": mode or None,
+                          "numbers": sorted(int(n) for n in re.split(r"[\s,]+", numbers.strip()))})
+    round_match, amount_match = _ROUND.search(text), _AMOUNT.search(text)
+    return {
+        "ok": bool(games) and not _FAILED.search(text),
+        "failed": bool(_FAILED.search(text)),
+        "round": int(round_match.group(1)) if round_match else None,
+        "games": games,
+        "cost": int(amount_match.group(1).replace(",", "")) if amount_match else GAME_COST["645"] * len(games),
+        "message": " ".join(text.split())[:200],
+    }
+
+
+def parse_720_result(layer: dict) -> dict:
+    """
+    Parses a 720 confirmation layer.
+
+    Returns:
+        {'ok', 'failed', 'round', 'tickets': [{'group', 'numbers'}], 'cost', 'message'} or None
+    """
+    if not layer:
+        return None
+    text = layer.get("text") or ""
+    tickets = []
+    for group, numbers in _TICKET_720.findall("\n".join((layer.get("items") or []) + [text])):
+        ticket = {"group": int(group), "numbers": numbers}
+        if ticket not in tickets:
+            tickets.append(ticket)
+    round_match, amount_match = _ROUND.search(text), _AMOUNT.search(text)
+    return {
+        "ok": bool(tickets) and not _FAILED.search(text),
+        "failed": bool(_FAILED.search(text)),
+        "round": int(round_match.group(1)) if round_match else None,
+        "tickets": tickets,
+        "cost": int(amount_match.group(1).replace(",", "")) if amount_match else GAME_COST["720"] * len(tickets),
+        "message": " ".join(text.split())[:200],
+    }
+
+
+# --- purchase responses ------------------------------------------------------
+
+_OK_CODES = ("100", "OK", "SUCCESS", "0000")
+_MODES = {"1": "수동", "2": "반자동", "3": "자동"}
+_BALANCE_KEYS = ("balance", "remainAmount", "nRemainAmount", "crntEntrsAmt")
+
+
+def _amount(value):
+    if value is None or value == "":
+        return None
+    return int(re.sub(r"[^0-9]", "", str(value)) or 0)
+
+
+def _choice_game(value) -> dict:
+    """'A|01|02|03|04|05|063' (last digit = 1 수동, 2 반자동, 3 자동) or {'slot', 'mode', 'numbers'}."""
+    if isinstance(value, dict):
+        return {"slot": value.get("slot"), "mode": value.get("mode"),
+                "numbers": sorted(int(n) for n in value["numbers"])}
+    slot, *cells = str(value).split("|")
+    mode = _MODES.get(cells[-1][2:]) if len(cells[-1]) == 3 else None
+    numbers = cells[:-1] + [cells[-1][:2]]
+    return {"slot": slot, "mode": mode, "numbers": sorted(int(n) for n in numbers)}
+
+
+def parse_response_data(game: str, data) -> dict:
+    """
+    Parses a purchase response payload (645 execBuy.do, 720 connPro.jsp).
+    Accepts both the flat form ({'result': 'OK', 'round', 'games'|'tickets',
+    'amount', 'balance', 'message'}) and the nested 645 form
+    ({'result': {'resultCode': '100', 'buyRound', 'arrGameChoiceNum', 'nBuyAmount'}}).
+
+    Returns:
+        parse_645_result / parse_720_result shaped dict plus 'code' and
+        'balance', or None when the payload is not readable (e.g. encrypted)
+        or reports success without issued numbers (read the receipt instead)
+    """
+    if not isinstance(data, dict):
+        return None
+    body = data["result"] if isinstance(data.get("result"), dict) else data
+    code = body.get("resultCode", data.get("result"))
+    if code is None:
+        return None
+    ok = str(code).upper() in _OK_CODES
+    message = body.get("resultMsg") or data.get("message") or ""
+    round_value = body.get("buyRound") or data.get("round")
+    balance = None
+    for key in _BALANCE_KEYS:
+        if body.get(key, data.get(key)) is not None:
+            balance = _amount(body.get(key, data.get(key)))
+            break
+    result = {
+        "ok": ok,
+        "failed": not ok,
+        "code": str(code),
+        "round": int(round_value) if round_value else None,
+        "message": str(message)[:200],
+        "balance": balance,
+    }
+    if game == "645":
+        games = body.get("arrGameChoiceNum") or data.get("games") or []
+        result["games"] = [_choice_game(g) for g in games] if ok else []
+        issued = len(result["games"])
+    else:
+        tickets = [_TICKET_720.search(str(t)) for t in data.get("tickets") or []]
+        result["tickets"] = [{"group": int(m.group(1)), "numbers": m.group(2)} for m in tickets if m] if ok else []
+        issued = len(result["tickets"])
+    if ok and not issued:
+        print("Purchase response reports success but lists no numbers. Reading the receipt instead.")
+        return None
+    cost = _amount(body.get("nBuyAmount", data.get("amount")))
+    result["cost"] = cost if cost is not None else GAME_COST[game] * issued
+    if result["round"] is None:
+        result["round"] = next_round(game)
+    return result
+
+
+def parse_response(game: str, response) -> dict:
+    """parse_response_data for a Playwright Response (None if not JSON)."""
+    try:
+        return parse_response_data(game, response.json())
+    except Exception as e:
+        print(f"Purchase response not readable: {e}")
+        return None
+
+
+def parse_result(game: str, layer: dict) -> dict:
+    """parse_645_result / parse_720_result; a receipt without a round gets the round on sale."""
+    result = (parse_645_result if game == "645" else parse_720_result)(layer)
+    if result and result["round"] is None:
+        result["round"] = next_round(game)
+    return result
+
+
+def read_purchase(page, game: str, selectors: list) -> dict:
+    """
+    Reads the first visible confirmation layer in one evaluate and parses it.
+
+    Returns:
+        parse_result() dict, or None when no layer could be read
+    """
+    try:
+        layer = page.evaluate(RESULT_LAYER_JS, selectors)
+    except Exception as e:
+        print(f"Could not read purchase result: {e}")
+        return None
+    return parse_result(game, layer)
+
+
+# --- ledger ------------------------------------------------------------------
+
+class Ledger:
+    """SQLite purchase ledger (WAL, indexed by game/round and date)."""
+
+    def __init__(self, path: str = None):
+        self.path = path or ledger_path()
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_purchase(self, game: str, round_number: int, tickets: list, cost: int = None,
+                        purchased_at: str = None, source: str = "page", raw=None) -> int:
+        """
+        Stores one purchase and its tickets in a single transaction
+        (tickets are inserted with executemany).
+
+        tickets: 6/45 [{'slot', 'mode', 'numbers': [6 ints]}],
+                 720 [{'group', 'numbers': '123456'}]
+
+        Returns:
+            int: purchase id
+        """
+        purchased_at = purchased_at or datetime.now().isoformat(timespec="seconds")
+        cost = GAME_COST[game] * len(tickets) if cost is None else cost
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO purchases (game, round, purchased_at, cost, ticket_count, source, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (game, round_number, purchased_at, cost, len(tickets), source,
+                 json.dumps(raw, ensure_ascii=False) if raw is not None else None))
+            purchase_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO tickets (purchase_id, game, round, purchased_at, slot, mode, grp, numbers, mask) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._ticket_row(purchase_id, game, round_number, purchased_at, t) for t in tickets])
+        return purchase_id
+
+    @staticmethod
+    def _ticket_row(purchase_id, game, round_number, purchased_at, ticket: dict) -> tuple:
+        if game == "645":
+            numbers = sorted(int(n) for n in ticket["numbers"])
+            return (purchase_id, game, round_number, purchased_at, ticket.get("slot"), ticket.get("mode"), None,
+                    " ".join(map(str, numbers)), sum(1 << n for n in numbers))
+        return (purchase_id, game, round_number, purchased_at, None, None, int(ticket["group"]),
+                str(ticket["numbers"]).zfill(6), None)
+
+    def duplicates(self, round_number: int, numbers: list) -> list:
+        """6/45 games already bought for this round (indexed by game, mask)."""
+        masks = [sum(1 << int(n) for n in game) for game in numbers]
+        if not masks:
+            return []
+        rows = self.conn.execute(
+            f"SELECT numbers FROM tickets WHERE game = '645' AND round = ? "
+            f"AND mask IN ({','.join('?' * len(masks))})", (round_number, *masks)).fetchall()
+        return [[int(n) for n in row["numbers"].split()] for row in rows]
+
+    def tickets(self, game: str, unchecked_only: bool = False, max_round: int = None) -> list:
+        """Ticket rows for the winning checker."""
+        query = "SELECT id, round, grp, numbers FROM tickets WHERE game = ?"
+        params = [game]
+        if unchecked_only:
+            query += " AND tier IS NULL"
+        if max_round is not None:
+            query += " AND round <= ?"
+            params.append(max_round)
+        return self.conn.execute(query + " ORDER BY round, id", params).fetchall()
+
+    def set_tiers(self, ids: list, tiers: list):
+        """Stores checked tiers in one batched transaction."""
+        checked_at = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany("UPDATE tickets SET tier = ?, checked_at = ? WHERE id = ?",
+                                  [(int(t), checked_at, int(i)) for i, t in zip(ids, tiers)])
+
+    def spend(self, since: str = None, until: str = None) -> list:
+        """Spend per game and month (indexed by purchased_at)."""
+        query = ("SELECT game, substr(purchased_at, 1, 7) AS month, COUNT(*) AS purchases, "
+                 "SUM(ticket_count) AS tickets, SUM(cost) AS cost FROM purchases WHERE 1 = 1")
+        params = []
+        if since:
+            query += " AND purchased_at >= ?"
+            params.append(since)
+        if until:
+            query += " AND purchased_at < ?"
+            params.append(until)
+        return [dict(row) for row in self.conn.execute(query + " GROUP BY game, month ORDER BY month, game", params)]
+
+    def winners(self, game: str = None) -> list:
+        query = "SELECT game, round, grp, numbers, tier, purchased_at FROM tickets WHERE tier > 0"
+        params = []
+        if game:
+            query += " AND game = ?"
+            params.append(game)
+        return [dict(row) for row in self.conn.execute(query + " ORDER BY round", params)]
+
+
+def record_result(game: str, result: dict, source: str = "page"):
+    """
+    Writes a parsed purchase result to the ledger (no-op when disabled or
+    nothing was issued). Never raises: the purchase itself already happened.
+    """
+    if not result or not result.get("ok") or not ledger_enabled():
+        return None
+    tickets = result["games"] if game == "645" else result["tickets"]
+    try:
+        with Ledger() as ledger:
+            purchase_id = ledger.record_purchase(game, result["round"], tickets, result.get("cost"),
+                                                 source=source, raw=result)
+        print(f"Ledger: recorded {len(tickets)} {game} ticket(s) for round {result['round']} (#{purchase_id})")
+        return purchase_id
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not write ledger: {e}")
+        return None
+
+
+def purchase_summary(game: str, result: dict, source: str = "page") -> dict:
+    """
+    Records a parsed purchase (response or page) and builds the flow result.
+
+    Returns:
+        {'processed_count', 'round', 'cost', 'games'|'tickets', 'balance'} on success,
+        {'processed_count': 0, 'status': 'failed'|'unknown', ...} otherwise
+    """
+    label = "Lotto 6/45" if game == "645" else "Lotto 720"
+    if result is None or not (result["ok"] or result["failed"]):
+        print(f"{label}: Purchase result not readable. Check the purchase history.")
+        return {"processed_count": 0, "status": "unknown"}
+    if not result["ok"]:
+        print(f"{label}: Purchase failed: {result['message']}")
+        return {"processed_count": 0, "status": "failed", "message": result["message"]}
+    record_result(game, result, source)
+    issued = result["games"] if game == "645" else result["tickets"]
+    print(f"{label}: {len(issued)} ticket(s) issued for round {result['round']} ({source}).")
+    summary = {"processed_count": len(issued), "round": result["round"], "cost": result["cost"]}
+    if game == "645":
+        summary["games"] = [g["numbers"] for g in issued]
+    else:
+        summary["tickets"] = [f"{t['group']}조 {t['numbers']}" for t in issued]
+    if result.get("balance") is not None:
+        summary["balance"] = result["balance"]
+    return summary
+
+
+def already_bought(numbers: list, round_number: int = None) -> list:
+    """6/45 games in `numbers` already in the ledger for the round on sale."""
+    if not numbers or not ledger_enabled() or not Path(ledger_path()).exists():
+        return []
+    try:
+        with Ledger() as ledger:
+            return ledger.duplicates(round_number or next_round("645"), numbers)
+    except sqlite3.Error as e:
+        print(f"Could not read ledger: {e}")
+        return []
+
+
+def next_round(game: str) -> int:
+    """Round currently on sale (the one after the latest draw)."""
+    from draw_history import expected_round
+    return expected_round(game) + 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Purchase ledger reports")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub_spend = sub.add_parser("spend", help="spend per month")
+    sub_spend.add_argument("--since", help="YYYY-MM-DD")
+    sub_spend.add_argument("--until", help="YYYY-MM-DD")
+    sub_list = sub.add_parser("list", help="tickets of a round")
+    sub_list.add_argument("game", choices=["645", "720"])
+    sub_list.add_argument("--round", type=int)
+    sub.add_parser("winners", help="checked winning tickets")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    if not ledger_path():
+        print("LEDGER_PATH is empty (ledger disabled)")
+        sys.exit(1)
+
+    with Ledger() as ledger:
+        if args.command == "spend":
+            rows = ledger.spend(args.since, args.until)
+            for row in rows:
+                print(f"{row['month']}  {row['game']}  {row['purchases']:3d} purchase(s)  "
+                      f"{row['tickets']:4d} ticket(s)  {row['cost']:>9,}원")
+            print(f"Total: {sum(r['cost'] for r in rows):,}원")
+        elif args.command == "list":
+            round_number = args.round or next_round(args.game)
+            rows = ledger.conn.execute(
+                "SELECT round, slot, mode, grp, numbers, tier, purchased_at FROM tickets "
+                "WHERE game = ? AND round = ? ORDER BY id", (args.game, round_number)).fetchall()
+            for row in rows:
+                label = f"{row['slot'] or ''} {row['mode'] or ''}" if args.game == "645" else f"{row['grp']}조"
+                tier = "-" if row["tier"] is None else row["tier"]
+                print(f"{row['round']}회 {label.strip():8s} {row['numbers']:20s} tier={tier}  {row['purchased_at']}")
+            print(f"{len(rows)} ticket(s) for {args.game} round {round_number}")
+        else:
+            for row in ledger.winners():
+                print(f"{row['game']} {row['round']}회 {row['grp'] or ''} {row['numbers']}: tier {row['tier']}")
@@ -1,14 +1,23 @@
 #!/usr/bin/env python3
 import os
 import time
-import re
 from os import environ
 from pathlib import Path
 from dotenv import load_dotenv
-from playwright.sync_api import Page, Playwright
+from playwright.sync_api import Page
 import sys
 import traceback
-from script_reporter import ScriptReporter
+from spans import TimedReporter
+from routing import install_router, use_profile
+from waits import wait_for_load_state
+from browser_daemon import daemon_endpoint, hold_lease
+from page_state import (
+    detect_state, LOGGED_IN, LOGGED_OUT, INVALID_CREDENTIALS, ERROR_PAGE, LOGIN_FAILED,
+)
+from har import HAR_MODE, attach_har
+from session import (
+    SESSION_PATH, load_state, save_state, write_meta, session_lock, session_status, session_fingerprint,
+)
 
 # Robustly match .env file
 def load_environment():
@@ -41,7 +50,6 @@ USER_ID = environ.get('USER_ID')
 PASSWD = environ.get('PASSWD')
 
 # Constants
-SESSION_PATH = "/tmp/dhlotto_session.json"
 DEFAULT_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Mobile/15E148 Safari/604.1"
 DEFAULT_VIEWPORT = {"width": 393, "height": 852}
 DEFAULT_HEADERS = {
@@ -50,14 +58,154 @@ DEFAULT_HEADERS = {
     "Sec-CH-UA-Platform": '"iOS"'
 }
 GLOBAL_TIMEOUT = 10000 # 10 seconds global timeout for better reliability
+# Close notice popups automatically as they are added to any page (MutationObserver)
+POPUP_AUTO_CLOSE = environ.get('POPUP_AUTO_CLOSE', 'false').lower() == 'true'
 
-def save_session(context, path=SESSION_PATH):
+# 보이는 팝업 닫기 버튼을 한 번의 evaluate로 모두 클릭
+# ('오늘 하루 보지 않기'를 먼저 눌러 같은 레이어의 '닫기'는 건너뜀)
+_POPUP_SWEEP = """
+(root) => {
+    const SELECTOR = '.btn_close, .close, .btn_pop_close';
+    const TEXTS = ['오늘 하루 보지 않기', '닫기'];
+    const label = el => (el.innerText || el.textContent || '').trim();
+    const rank = el => {
+        const text = label(el);
+        const i = text.length <= 20 ? TEXTS.findIndex(t => text.includes(t)) : -1;
+        return i >= 0 ? i : (el.matches(SELECTOR) ? TEXTS.length : -1);
+    };
+    const visible = el => el.isConnected && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length) &&
+        getComputedStyle(el).visibility !== 'hidden';
+    const nodes = Array.from(root.querySelectorAll(SELECTOR + ', a, button'));
+    if (root.matches && root.matches(SELECTOR + ', a, button')) nodes.unshift(root);
+    const candidates = nodes.map(el => [rank(el), el]).filter(([r]) => r >= 0).sort((a, b) => a[0] - b[0]);
+    let closed = 0;
+    for (const [, el] of candidates) {
+        if (!visible(el)) continue;
+        el.click();
+        closed++;
+    }
+    return closed;
+}
+"""
+POPUP_SWEEP_JS = f"() => ({_POPUP_SWEEP})(document)"
+# Init script: sweep once the DOM is ready, then every subtree added later.
+# Only added nodes are watched, so layers the flows open by toggling a class
+# (number selection, purchase confirm) are never touched.
+POPUP_OBSERVER_JS = f"""
+(() => {{
+    const sweep = {_POPUP_SWEEP};
+    const start = () => {{
+        sweep(document);
+        new MutationObserver(records => {{
+            for (const record of records)
+                for (const node of record.addedNodes)
+                    if (node.nodeType === 1 && node.isConnected) sweep(node);
+        }}).observe(document.documentElement, {{childList: true, subtree: true}});
+    }};
+    if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', start);
+    else start();
+}})();
+"""
+
+LOGIN_URL = "https://m.dhlottery.co.kr/login"
+LOGIN_ERROR_SCREENSHOT_STATES = (ERROR_PAGE, LOGIN_FAILED)
+
+# Session probe (HTTP only, no rendering)
+SESSION_PROBE_URL = LOGIN_URL
+# HAR record/replay only sees page traffic, so the probe (context.request) is off there
+SESSION_PROBE = environ.get('SESSION_PROBE', 'true').lower() == 'true' and HAR_MODE not in ('record', 'replay')
+
+def context_options(storage_state=None) -> dict:
+    """browser.new_context arguments for the shared mobile profile (sync and async)."""
+    return {
+        "storage_state": storage_state,
+        "user_agent": DEFAULT_USER_AGENT,
+        "viewport": DEFAULT_VIEWPORT,
+        "extra_http_headers": DEFAULT_HEADERS,
+    }
+
+def new_context(browser, storage_state=None, har_name=None):
+    """
+    Creates a browser context with the shared mobile profile (UA, viewport, headers)
+    and the request routing layer (see routing.py).
+    With har_name and HAR_MODE=record/replay the context is recorded to or
+    served from HAR_DIR/<har_name>.har (see har.py).
     """
-    Saves the current browser context state (cookies, local storage) to a file.
+    context = browser.new_context(**context_options(storage_state))
+    install_router(context)
+    if POPUP_AUTO_CLOSE:
+        context.add_init_script(POPUP_OBSERVER_JS)
+    if har_name:
+        attach_har(context, har_name)
+    return context
+
+def launch_browser(playwright, headless=True, slow_mo=0):
     """
-    context.storage_state(path=path)
+    Attaches to the warm browser daemon (browser_daemon.py) when one is running,
+    otherwise launches a fresh Chromium. Headed runs always launch locally.
+    browser.close() on an attached browser only drops our contexts and disconnects.
+    """
+    use_daemon = headless and environ.get('BROWSER_DAEMON', 'true').lower() == 'true'
+    endpoint = daemon_endpoint() if use_daemon else None
+    if endpoint:
+        hold_lease()
+        try:
+            browser = playwright.chromium.connect_over_cdp(endpoint, slow_mo=slow_mo, timeout=3000)
+            print(f"Attached to browser daemon at {endpoint}")
+            return browser
+        except Exception as e:
+            print(f"Browser daemon unavailable ({e}). Launching browser...")
+    return playwright.chromium.launch(headless=headless, slow_mo=slow_mo)
+
+def persist_session(storage_state: dict, path=SESSION_PATH):
+    """Writes a context's storage_state() result as the stored session (sync and async)."""
+    if HAR_MODE == "replay":
+        # Replayed cookies are redacted, keep the real session file intact
+        print("HAR replay: session not saved")
+        return
+    save_state(storage_state, path)
     print(f"Session saved to {path}")
 
+def save_session(context, path=SESSION_PATH):
+    """
+    Saves the current browser context state (cookies, local storage) to a file
+    atomically and marks the session as verified (see session.py).
+    """
+    persist_session(context.storage_state(), path)
+
+def save_session_meta(context):
+    """Records that the context's session was just verified."""
+    write_meta(context.cookies())
+
+
+def probe_answer(response):
+    """
+    Reads the session probe response: a logged-in user requesting the login
+    page is redirected away from it.
+
+    Returns:
+        True/False when the answer is known, None when the probe was inconclusive.
+    """
+    if 300 <= response.status < 400:
+        location = response.headers.get("location", "")
+        return "/login" not in location and "errorPage" not in location
+    if response.status == 200:
+        return False
+    return None
+
+def probe_session(context):
+    """
+    Checks session validity with one HTTP request over the context's request API
+    (shares cookies with the browser, nothing is rendered).
+    See probe_answer for the result.
+    """
+    try:
+        response = context.request.get(SESSION_PROBE_URL, max_redirects=0, timeout=GLOBAL_TIMEOUT)
+    except Exception as e:
+        print(f"Session probe failed: {e}")
+        return None
+    return probe_answer(response)
+
 def setup_dialog_handler(page: Page):
     """
     Sets up a robust handler to automatically accept any alerts/dialogs.
@@ -79,73 +227,88 @@ def setup_dialog_handler(page: Page):
         page.on("dialog", handle_dialog)
         setattr(page, "_dialog_handler_active", True)
 
-def dismiss_popups(page: Page):
-    """Dismiss common mobile popups that might block clicks."""
+def dismiss_popups(page: Page) -> int:
+    """
+    Dismiss common mobile popups that might block clicks.
+    All visible close buttons are found and clicked in one evaluate.
+    """
     try:
-        # On mobile, popups often have specific close buttons
-        # visible=true is a bit slow, so we use a faster selector first
-        close_buttons = page.locator(".btn_close, .close, .btn_pop_close, button:has-text('닫기'), a:has-text('오늘 하루 보지 않기')")
-        count = close_buttons.count()
-        for i in range(count):
-            try:
-                btn = close_buttons.nth(i)
-                if btn.is_visible(timeout=500):
-                    btn.click(timeout=1000)
-            except:
-                pass
+        closed = page.evaluate(POPUP_SWEEP_JS)
+        if closed:
+            print(f"Dismissed {closed} popup(s)")
+        return closed
     except Exception:
-        pass
+        return 0
 
 
 
 def check_logged_in_elements(page: Page, timeout: int = 2000) -> bool:
-    """Helper to check for visual indicators of being logged in."""
+    """
+    Helper to check for visual indicators of being logged in.
+    Logout/login markers and URL patterns are raced (see page_state.py),
+    so an ambiguous page costs one timeout, not one per marker.
+    """
     try:
-        # 1. Check for logout indicators (strongly indicates logged in)
-        if page.locator("#logoutBtn, .btn_logout, .btn-logout, a:has-text('로그아웃')").first.is_visible(timeout=timeout):
-            return True
-            
-        # 2. Check for login indicators (strongly indicates NOT logged in)
-        if page.locator("#btnLogin, .btn_login, .btn-login, a:has-text('로그인')").first.is_visible(timeout=timeout):
-            return False
-            
-        return False
+        return detect_state(page, (LOGGED_IN, LOGGED_OUT, ERROR_PAGE), timeout=timeout) == LOGGED_IN
     except Exception:
         return False
 
 
-def is_logged_in(page: Page) -> bool:
+def is_logged_in(page: Page, probe: bool = SESSION_PROBE) -> bool:
     """
     Check if the user is currently logged in.
     This is a non-intrusive check.
+    With probe=True a recently verified session is trusted as-is, otherwise one
+    HTTP request decides; page checks below are only the fallback.
     """
-    try:
-        # First check current page without navigation
-        if check_logged_in_elements(page, timeout=1000):
-            return True
-        
-        # If we are on a page that strongly indicates login/logout state, trust it
-        if "/login" in page.url:
-             return False
-        if "/mypage" in page.url:
-             return True
+    if probe:
+        try:
+            if session_status(page.context.cookies())["state"] == "fresh":
+                print("Session verified recently. Skipping probe.")
+                return True
+            result = probe_session(page.context)
+            if result is not None:
+                if result:
+                    save_session_meta(page.context)
+                return result
+        except Exception as e:
+            print(f"Session probe error: {e}")
 
-        # If not sure, go to a page that uniquely identifies login state
+    try:
+        # Not on the site yet: the login page identifies the state
+        # (a live session is redirected away from it)
         if page.url == "about:blank" or "dhlottery.co.kr" not in page.url:
             print("Navigating to check session state...")
             # Use 'commit' to catch the initial headers/redirect
-            response = page.goto("https://m.dhlottery.co.kr/login", timeout=GLOBAL_TIMEOUT, wait_until="commit")
-            # If we were redirected away from login to main or mypage, we ARE logged in
-            if "/login" not in page.url and ("main" in page.url or "mypage" in page.url):
-                print(f"Redirected from login to {page.url} - session is active.")
-                return True
-        
-        # Final visual check
-        return check_logged_in_elements(page, timeout=2000)
+            page.goto(LOGIN_URL, timeout=GLOBAL_TIMEOUT, wait_until="commit")
+
+        # Logout/login markers, /login, /mypage and error pages, whichever shows first
+        state = detect_state(page, (LOGGED_IN, LOGGED_OUT, ERROR_PAGE), timeout=2000)
+        print(f"Page state: {state} ({page.url})")
+        return state == LOGGED_IN
     except Exception:
         return False
 
 
+def login_failure(state: str, url: str) -> str:
+    """
+    Interprets the state detect_state returned after the login click
+    (sync and async login). Returns None on success, else the failure message.
+    """
+    if state == INVALID_CREDENTIALS:
+        return "Login failed: Invalid ID or password."
+    if state in LOGIN_ERROR_SCREENSHOT_STATES:
+        return f"Login failed: {state} ({url})"
+    if state == LOGGED_IN:
+        print('Login successful')
+    elif "login" not in url and "dhlottery" in url:
+        # UNKNOWN: no signal within the timeout, check URL as fallback
+        print(f"Login likely successful (Redirected to {url})")
+    else:
+        return f"Login failed: Still on login page ({url})"
+    return None
+
+
 def login(page: Page) -> None:
     """
     동행복권 사이트에 로그인합니다.
@@ -156,6 +319,7 @@ def login(page: Page) -> None:
     
     # Setup alert handler to automatically accept any alerts
     setup_dialog_handler(page)
+    use_profile(page, "default")
 
     # 1. Quick check if already logged in
     if is_logged_in(page):
@@ -165,7 +329,7 @@ def login(page: Page) -> None:
     print('Starting login process...')
     
     # 2. Go directly to login page if not already there
-    target_url = "https://m.dhlottery.co.kr/login"
+    target_url = LOGIN_URL
     if target_url not in page.url:
         print(f"Navigating to login page: {target_url}")
         try:
@@ -187,7 +351,8 @@ def login(page: Page) -> None:
         page.screenshot(path=f"login_form_failed_{int(time.time())}.png")
         raise e
     
-    # 3. Fill and submit login form
+    # 3. Fill and submit login form, racing the outcome signals
+    # (logged-in markers, credential error, error page, login POST response)
     try:
         print(f"Logging in as {USER_ID[:3]}***...")
         
@@ -199,7 +364,8 @@ def login(page: Page) -> None:
         page.locator("#inpUserPswdEncn").fill(PASSWD)
         
         # Click login button
-        page.click("#btnLogin")
+        state = detect_state(page, (LOGGED_IN, INVALID_CREDENTIALS, ERROR_PAGE, LOGIN_FAILED),
+                             timeout=GLOBAL_TIMEOUT, action=lambda: page.click("#btnLogin"), login_response=True)
     except Exception as e:
         print(f"Form submission failed: {e}")
         screenshot_path = f"login_submit_failed_{int(time.time())}.png"
@@ -211,65 +377,89 @@ def login(page: Page) -> None:
             return
         raise Exception(f"Login click failed: {e}")
 
-    # 5. Wait for success indicator
-    print("Verifying login...")
-    try:
-        # Wait up to 10s for login to finalize
-        success = False
-        start_t = time.time()
-        while time.time() - start_t < 10:
-            if check_logged_in_elements(page, timeout=500):
-                success = True
-                break
-            # If we see an error message, stop early
-            if page.get_by_text("아이디 또는 비밀번호가 일치하지 않습니다").is_visible(timeout=100):
-                raise Exception("Invalid credentials.")
-            time.sleep(0.5)
-            
-        if success:
-            print('Login successful')
-        else:
-            # Check URL as fallback
-            if "login" not in page.url and "dhlottery" in page.url:
-                print(f"Login likely successful (Redirected to {page.url})")
-            else:
-                raise TimeoutError("Login verification timed out")
+    # 5. Check the first signal that resolved
+    print(f"Verifying login... ({state})")
+    failure = login_failure(state, page.url)
+    if failure:
+        if state in LOGIN_ERROR_SCREENSHOT_STATES:
+            page.screenshot(path=f"login_error_{int(time.time())}.png")
+        raise Exception(failure)
 
+    # Let the post-login redirect settle so session cookies are stable
+    wait_for_load_state(page, "domcontentloaded", replaced=2.0, name="login_settle")
+
+
+def refreshed_session(cookies: list):
+    """
+    Cookies of a fresh stored session that differs from ours (refreshed by
+    another script while we waited for the session lock), else None.
+    """
+    stored = load_state()
+    if stored and session_fingerprint(stored.get("cookies", [])) != session_fingerprint(cookies):
+        if session_status(stored["cookies"])["state"] == "fresh":
+            return stored["cookies"]
+    return None
+
+
+def ensure_session(page: Page, sr=None) -> bool:
+    """
+    Makes sure the page's context is logged in, logging in only when the
+    stored session is stale (see session.session_status):
+    fresh -> nothing, verify -> one check, refresh/missing -> login + save.
+    The refresh runs under the session lock; a session refreshed by another
+    script while we waited is reused instead of logging in again.
+
+    Returns:
+        bool: True if a login was performed
+    """
+    context = page.context
+    status = session_status(context.cookies())
+    if status["state"] == "fresh":
+        print(f"Session is fresh ({status['reason']}).")
+        return False
+
+    with session_lock():
+        cookies = refreshed_session(context.cookies())
+        if cookies:
+            context.add_cookies(cookies)
+            print("Using the session refreshed by another run.")
+            return False
+
+        if status["state"] == "verify" and is_logged_in(page):
+            print("Session is valid.")
+            return False
+        if status["state"] == "refresh":
+            # Log in again before the server drops the session mid-purchase
+            context.clear_cookies()
+
+        print(f"Session {status['state']} ({status['reason']}). Logging in...")
+        if sr:
+            sr.stage("LOGIN")
+        login(page)
+        save_session(context)
+        return True
 
-    except Exception:
-        print("Login verification timed out. Checking content...")
-        if check_logged_in_elements(page, timeout=2000):
-             print('Logged in successfully (detected via check helper)')
-        else:
-             content = page.content()
-             if "아이디 또는 비밀번호가 일치하지 않습니다" in content:
-                 raise Exception("Login failed: Invalid ID or password.")
-             else:
-                 if "/login" in page.url:
-                      raise Exception(f"Login failed: Still on login page ({page.url})")
-                 print(f"Assuming login might have worked (URL: {page.url})")
-
-    # Give a bit more time for session cookies to be stable
-    time.sleep(2)
-    
 
 def main():
     """
     Standalone login script that saves the session for other scripts to use.
     """
     from playwright.sync_api import sync_playwright
-    sr = ScriptReporter("Login Session")
+    sr = TimedReporter("Login Session")
+
+    # No browser at all when the stored session is still fresh
+    status = session_status()
+    if status["state"] == "fresh" and "--force" not in sys.argv:
+        print(f"Session is fresh ({status['reason']}). Use --force to log in anyway.")
+        sr.success({"session_path": SESSION_PATH, "login": False})
+        return
     
     with sync_playwright() as playwright:
         try:
             print("Launching browser for initial login...")
             HEADLESS = os.environ.get('HEADLESS', 'true').lower() == 'true'
-            browser = playwright.chromium.launch(headless=HEADLESS, slow_mo=0 if HEADLESS else 500)
-            context = browser.new_context(
-                user_agent=DEFAULT_USER_AGENT,
-                viewport=DEFAULT_VIEWPORT,
-                extra_http_headers=DEFAULT_HEADERS
-            )
+            browser = launch_browser(playwright, headless=HEADLESS, slow_mo=0 if HEADLESS else 500)
+            context = new_context(browser, har_name="login")
             page = context.new_page()
             
             sr.stage("LOGIN")
@@ -9,13 +9,116 @@ import datetime
 from os import environ
 from pathlib import Path
 from dotenv import load_dotenv
-from playwright.sync_api import Playwright, sync_playwright
-from login import login, SESSION_PATH, DEFAULT_USER_AGENT, DEFAULT_VIEWPORT, DEFAULT_HEADERS, GLOBAL_TIMEOUT, setup_dialog_handler
+from playwright.sync_api import Playwright, sync_playwright, Page
+from login import login, ensure_session, new_context, launch_browser, SESSION_PATH, GLOBAL_TIMEOUT, setup_dialog_handler
+from routing import use_profile
+from waits import wait_for_dom_change, wait_for_response, wait_for_selector
+from tickets import MAX_GAMES_PER_DRAW, TicketFileError, read_manual_numbers, split_slips
+from number_gen import generate_from_rules
+from ledger import already_bought, parse_response, purchase_summary, read_purchase
 
 # .env loading is handled by login module import
 
 
-from script_reporter import ScriptReporter
+from spans import TimedReporter
+
+GAME_URL = "https://ol.dhlottery.co.kr/olotto/game_mobile/game645.do"
+# 구매 완료 후 회차/게임 번호가 표시되는 결과 레이어
+RESULT_SELECTORS = ["#popupLayerResult", "#popReceipt", "#report"]
+# 구매 요청 (응답: 결과 코드, 회차, 발행 번호, 잔액)
+BUY_RESPONSE_PATTERN = re.compile(r"/execBuy\.do")
+# 자동/선택완료로 추가된 게임이 표시되는 목록 (추가 대기 범위)
+GAME_LIST_SELECTOR = "#gameList"
+
+# 번호판(.lt-num)을 한 번 훑어 "정확한 텍스트 -> element" 인덱스를 window에 저장
+# (':has-text("1")'은 11~19, 21, 31, 41에도 매칭되므로 텍스트 완전 일치만 사용)
+BOARD_INDEX_JS = """
+(selector) => {
+    const board = {};
+    document.querySelectorAll(selector).forEach(el => {
+        const text = el.textContent.trim();
+        if (/^\\d{1,2}$/.test(text) && !(Number(text) in board)) board[Number(text)] = el;
+    });
+    window.__lotto645Board = {selector, board};
+    return Object.keys(board).map(Number).sort((a, b) => a - b);
+}
+"""
+
+# 선택 표시(on/active/selected 클래스 등)가 번호판에 없을 때 읽는 선택 번호 표시 영역
+# (실제 페이지에서 확인되지 않은 후보들: 읽지 못하면 경고만 하고 진행, check_selection 참고)
+SELECTED_DISPLAY_SELECTOR = "#selectedNum span, .selected_num span, .selected-num .num, .sel_num span"
+
+# 한 게임의 번호 6개를 한 번의 evaluate로 선택하고 선택 상태를 반환
+# (남아 있는 다른 선택은 먼저 해제, 인덱스가 DOM에서 떨어졌으면 다시 인덱싱)
+# 선택 상태는 번호판 표시에서 읽고, 표시가 하나도 없으면 선택 번호 표시 영역에서 읽음
+SELECT_GAME_JS = """
+([numbers, display]) => {
+    const index = window.__lotto645Board;
+    const isOn = el => el.classList.contains('on') || el.classList.contains('active') ||
+        el.classList.contains('selected') || el.getAttribute('aria-pressed') === 'true' ||
+        !!(el.querySelector('input:checked') || (el.matches('input') && el.checked));
+    const marked = () => Object.entries(index.board).filter(([n, el]) => isOn(el)).map(([n]) => Number(n));
+    const shown = () => Array.from(document.querySelectorAll(display))
+        .map(el => el.textContent.trim()).filter(t => /^\\d{1,2}$/.test(t)).map(Number);
+    const selected = () => {
+        const fromBoard = marked();
+        if (fromBoard.length) return {numbers: fromBoard, source: 'board'};
+        const fromDisplay = shown();
+        return {numbers: fromDisplay, source: fromDisplay.length ? 'display' : 'none'};
+    };
+    if (!index || Object.values(index.board).some(el => !el.isConnected)) {
+        return {stale: true, missing: numbers, selected: [], source: 'none'};
+    }
+    const wanted = new Set(numbers);
+    for (const n of selected().numbers) {
+        if (!wanted.has(n) && index.board[n]) index.board[n].click();
+    }
+    const current = new Set(selected().numbers);
+    const missing = [];
+    for (const n of numbers) {
+        const el = index.board[n];
+        if (!el) { missing.push(n); continue; }
+        if (!current.has(n)) el.click();
+    }
+    const after = selected();
+    return {stale: false, missing, selected: after.numbers.sort((a, b) => a - b), source: after.source};
+}
+"""
+
+
+def generate_numbers(count: int, manual_numbers: list = None) -> list:
+    """
+    GENERATOR_RULES(JSON) 조건으로 수동 게임 count개를 생성합니다.
+    이미 선택된 manual_numbers와 같은 조합은 만들지 않습니다.
+    """
+    rules = json.loads(environ.get('GENERATOR_RULES', '{}'))
+    games = generate_from_rules(count, rules, avoid=manual_numbers)
+    for game in games:
+        print(f"Generated game: {game}")
+    return games
+
+
+def load_game_config():
+    """
+    .env 설정(AUTO_GAMES, MANUAL_NUMBERS, MANUAL_NUMBERS_FILE, GENERATED_GAMES)에서 게임 설정 반환
+    파일 번호와 생성 번호는 MANUAL_NUMBERS 뒤에 구매 한도까지 추가됩니다.
+
+    Returns:
+        tuple: (auto_games, manual_numbers)
+    """
+    auto_games = int(environ.get('AUTO_GAMES', '0'))
+    manual_numbers = json.loads(environ.get('MANUAL_NUMBERS', '[]'))
+    ticket_file = environ.get('MANUAL_NUMBERS_FILE')
+    if ticket_file:
+        limit = MAX_GAMES_PER_DRAW - auto_games - len(manual_numbers)
+        manual_numbers = manual_numbers + read_manual_numbers(ticket_file, limit)
+    generated_games = int(environ.get('GENERATED_GAMES', '0'))
+    if generated_games > 0:
+        count = min(generated_games, MAX_GAMES_PER_DRAW - auto_games - len(manual_numbers))
+        if count < generated_games:
+            print(f"Generating {max(count, 0)} of {generated_games} game(s) (purchase limit)")
+        manual_numbers = manual_numbers + generate_numbers(count, manual_numbers)
+    return auto_games, manual_numbers
 
 
 def parse_arguments():
@@ -26,21 +129,54 @@ def parse_arguments():
     - Auto: ./lotto645.py 1000  (1게임)
     - Auto: ./lotto645.py 3000  (3게임)
     - Manual: ./lotto645.py 1 2 3 4 5 6  (수동 번호)
+    - File:   ./lotto645.py --file tickets.csv  (CSV/JSONL 수동 번호 파일)
+    - Gen:    ./lotto645.py --generate 3  (GENERATOR_RULES 조건으로 수동 번호 생성)
     
     Returns:
         tuple: (auto_games, manual_numbers)
     """
     if len(sys.argv) == 1:
         # No arguments - use .env configuration
-        auto_games = int(environ.get('AUTO_GAMES', '0'))
-        manual_numbers = json.loads(environ.get('MANUAL_NUMBERS', '[]'))
-        return auto_games, manual_numbers
+        return load_game_config()
     
     # Parse command-line arguments
     args = sys.argv[1:]
     
+    # Case 0: Ticket file (manual games, up to the purchase limit)
+    if args[0] in ("-f", "--file"):
+        if len(args) != 2:
+            print(f"Error: {args[0]} requires exactly one file path")
+            sys.exit(1)
+        try:
+            manual_numbers = read_manual_numbers(args[1], MAX_GAMES_PER_DRAW)
+        except TicketFileError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if not manual_numbers:
+            print(f"Error: No valid tickets in {args[1]}")
+            sys.exit(1)
+        print(f"Manual mode: {len(manual_numbers)} game(s) from {args[1]}")
+        return 0, manual_numbers
+
+    # Case 0b: Generated manual games
+    elif args[0] in ("-g", "--generate"):
+        try:
+            count = int(args[1]) if len(args) == 2 else 0
+        except ValueError:
+            count = 0
+        if not 1 <= count <= MAX_GAMES_PER_DRAW:
+            print(f"Error: {args[0]} requires a game count from 1 to {MAX_GAMES_PER_DRAW}")
+            sys.exit(1)
+        try:
+            manual_numbers = generate_numbers(count)
+        except (ValueError, TicketFileError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Manual mode: {count} generated game(s)")
+        return 0, manual_numbers
+
     # Case 1: Single argument (auto games by amount)
-    if len(args) == 1:
+    elif len(args) == 1:
         amount_str = args[0].replace(',', '')  # Remove commas
         try:
             amount = int(amount_str)
@@ -92,46 +228,72 @@ def parse_arguments():
         print(f"                where AMOUNT is 1000, 2000, 3000, 4000, or 5000")
         print(f"  Manual game:  ./lotto645.py [N1] [N2] [N3] [N4] [N5] [N6]")
         print(f"                where each N is a number from 1 to 45 (no duplicates)")
+        print(f"  Ticket file:  ./lotto645.py --file [PATH]")
+        print(f"                CSV (6 numbers per row) or JSONL ([1,2,3,4,5,6] per line)")
+        print(f"  Generated:    ./lotto645.py --generate [COUNT]")
+        print(f"                COUNT games from GENERATOR_RULES (see number_gen.py)")
         print(f"\nExamples:")
         print(f"  ./lotto645.py 3000          # Buy 3 auto games")
         print(f"  ./lotto645.py 1 2 3 4 5 6   # Buy 1 manual game with numbers 1,2,3,4,5,6")
         sys.exit(1)
 
 
-def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: ScriptReporter) -> dict:
+def index_board(page: Page, selector: str = ".lt-num") -> list:
     """
-    로또 6/45를 자동 및 수동으로 구매합니다.
+    번호판을 한 번 스캔하여 번호 -> element 인덱스를 만듭니다.
+
+    Returns:
+        list: 인덱싱된 번호 목록 (정상이면 1~45)
     """
-    GAME_URL = "https://ol.dhlottery.co.kr/olotto/game_mobile/game645.do"
-    
-    # Create browser, context, and page
-    HEADLESS = environ.get('HEADLESS', 'true').lower() == 'true'
-    browser = playwright.chromium.launch(headless=HEADLESS, slow_mo=0 if HEADLESS else 500)
+    numbers = page.evaluate(BOARD_INDEX_JS, selector)
+    if numbers != list(range(1, 46)):
+        print(f"Warning: board index has {len(numbers)} number(s), expected 1-45")
+    return numbers
 
-    # Load session if exists
-    storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
-    context = browser.new_context(
-        storage_state=storage_state, 
-        user_agent=DEFAULT_USER_AGENT,
-        viewport=DEFAULT_VIEWPORT,
-        extra_http_headers=DEFAULT_HEADERS
-    )
-    
-    try:
-        page = context.new_page()
-        setup_dialog_handler(page)
 
-        # 1. Session Check & Login
-        from login import is_logged_in
-        sr.stage("CHECK_SESSION")
-        if not is_logged_in(page):
-            print("Session expired or missing. Logging in...")
-            sr.stage("LOGIN")
-            login(page)
-        else:
-            print("Session is valid.")
-        
-        # 2. Navigate to Game Page
+def check_selection(result: dict, wanted: list) -> bool:
+    """
+    SELECT_GAME_JS 결과 판정 (동기/비동기 흐름 공용).
+    번호판에 없는 번호가 있거나 읽은 선택이 요청과 다를 때만 실패합니다.
+    선택 상태를 읽을 수 없으면(표시 셀렉터는 추정값) 경고 후 진행합니다.
+    """
+    if result["missing"]:
+        print(f"Number(s) {result['missing']} not found on board")
+        return False
+    if result["source"] == "none":
+        print("Warning: selection state not readable (no selected marker on the board and no "
+              "selected-number display). Continuing with the clicked numbers.")
+        return True
+    if result["selected"] != wanted:
+        print(f"Selection mismatch: wanted {wanted}, {result['source']} shows {result['selected']}")
+        return False
+    return True
+
+
+def select_game(page: Page, numbers: list) -> bool:
+    """
+    수동 게임 1개의 번호 6개를 인덱스로 한 번에 선택하고 선택 상태를 1회 검증합니다.
+    인덱스가 오래되었으면(번호판 재렌더링) 한 번 다시 인덱싱합니다.
+
+    Returns:
+        bool: 선택이 요청과 다르다고 확인되지 않으면 True (check_selection)
+    """
+    wanted = sorted(int(n) for n in numbers)
+    result = page.evaluate(SELECT_GAME_JS, [wanted, SELECTED_DISPLAY_SELECTOR])
+    if result["stale"]:
+        index_board(page)
+        result = page.evaluate(SELECT_GAME_JS, [wanted, SELECTED_DISPLAY_SELECTOR])
+    return check_selection(result, wanted)
+
+
+def purchase(page: Page, auto_games: int, manual_numbers: list, sr: TimedReporter) -> dict:
+    """
+    로그인된 페이지에서 로또 6/45를 자동 및 수동으로 구매합니다.
+    브라우저/컨텍스트 관리는 호출자(run, workflow)가 담당합니다.
+    """
+    use_profile(page, "default")
+    try:
+        # 1. Navigate to Game Page
         sr.stage("NAVIGATE")
         print(f"Navigating to Lotto 6/45 mobile game: {GAME_URL}")
         try:
@@ -148,10 +310,10 @@ def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: Scrip
             page.screenshot(path=f"lotto645_nav_failed_{int(time.time())}.png")
             raise e
 
-        # Give a moment for components to initialize
-        time.sleep(1)
+        # Wait for the game components to initialize
+        wait_for_selector(page, "button:has-text('자동 1매 추가'), .lt-num", replaced=1.0, name="lotto645_board")
         
-        # 3. Selection Flow
+        # 2. Selection Flow
         sr.stage("SELECT_NUMBERS")
         
         # Automatic games
@@ -163,8 +325,8 @@ def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: Scrip
                 try:
                     # Ensure button is visible/ready
                     if auto_btn.is_visible(timeout=3000):
-                        auto_btn.click()
-                        time.sleep(0.5)
+                        wait_for_dom_change(page, auto_btn.click, selector=GAME_LIST_SELECTOR, replaced=0.5,
+                                            name="lotto645_auto_added")
                     else:
                         print(f"Auto button not visible for game {i+1}")
                         break
@@ -174,21 +336,19 @@ def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: Scrip
 
         # Manual numbers
         if manual_numbers and len(manual_numbers) > 0:
+            # Index the board once; each game is then one evaluate
+            index_board(page)
+            select_done = page.locator("#btnSelectNum, button:has-text('선택완료')").first
             for numbers in manual_numbers:
                 print(f"Adding manual game: {numbers}")
-                # Select each number
-                for number in numbers:
-                    num_el = page.locator(f".lt-num:has-text('{number}')").first
-                    if num_el.is_visible(timeout=2000):
-                        num_el.click()
-                    else:
-                        print(f"Number {number} not found on board")
-                
+                if not select_game(page, numbers):
+                    page.screenshot(path=f"lotto645_select_failed_{int(time.time())}.png")
+                    raise Exception(f"Could not select manual numbers {numbers}")
+
                 # Click '선택완료' to add to list
-                select_done = page.locator("#btnSelectNum, button:has-text('선택완료')").first
                 if select_done.is_visible(timeout=2000):
-                    select_done.click()
-                time.sleep(0.5)
+                    wait_for_dom_change(page, select_done.click, selector=GAME_LIST_SELECTOR, replaced=0.5,
+                                        name="lotto645_manual_added")
 
         # Check total games added
         # (This is a simplified check, ideally we'd look at the UI list)
@@ -197,32 +357,38 @@ def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: Scrip
             print('No games selected to purchase!')
             return {"processed_count": 0}
 
-        # 4. Final Purchase
+        # 3. Final Purchase
         sr.stage("PURCHASE")
         print(f"Clicking 'Purchase' (구매하기) for {total_games} games...")
         buy_btn = page.locator("#btnBuy, button:has-text('구매하기')").first
-        if buy_btn.is_visible(timeout=5000):
-            buy_btn.click()
-        else:
+        if not buy_btn.is_visible(timeout=5000):
             print("Purchase button not visible. Check if games were added successfully.")
             page.screenshot(path=f"lotto645_no_buy_btn_{int(time.time())}.png")
             return {"processed_count": 0, "status": "failed"}
-        
-        # 5. Confirm purchase popup
-        print("Confirming final purchase...")
-        try:
-            # Mobile uses a custom popup layer with '확인' button
-            confirm_btn = page.locator("#popupLayerConfirm button:has-text('확인'), button:has-text('확인'), a:has-text('확인')").first
-            if confirm_btn.is_visible(timeout=3000):
-                confirm_btn.click()
-                print("Final confirmation clicked.")
-        except Exception:
-            # Fallback for standard alert (though dialog handler should catch it)
-            print("No confirmation popup found, assuming initial dialog handler handled it.")
-
-        time.sleep(2)
-        print(f'Lotto 6/45: Purchase process completed.')
-        return {"processed_count": total_games}
+
+        def submit():
+            buy_btn.click()
+            # 4. Confirm purchase popup
+            print("Confirming final purchase...")
+            try:
+                # Mobile uses a custom popup layer with '확인' button
+                confirm_btn = page.locator("#popupLayerConfirm button:has-text('확인'), button:has-text('확인'), a:has-text('확인')").first
+                if confirm_btn.is_visible(timeout=3000):
+                    confirm_btn.click()
+                    print("Final confirmation clicked.")
+            except Exception:
+                # Fallback for standard alert (though dialog handler should catch it)
+                print("No confirmation popup found, assuming initial dialog handler handled it.")
+
+        # 5. The purchase response decides (result code, round, issued numbers, balance);
+        # the receipt layer is read only when the response is not readable
+        response = wait_for_response(page, BUY_RESPONSE_PATTERN, submit, timeout=GLOBAL_TIMEOUT,
+                                     replaced=2.0, name="lotto645_buy_response")
+        result = parse_response("645", response) if response else None
+        if result is not None:
+            return purchase_summary("645", result, "response")
+        wait_for_selector(page, ", ".join(RESULT_SELECTORS), replaced=0, name="lotto645_result")
+        return purchase_summary("645", read_purchase(page, "645", RESULT_SELECTORS))
 
     except Exception as e:
         print(f"Flow interrupted: {e}")
@@ -231,13 +397,93 @@ def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: Scrip
         except:
             pass
         raise
+
+
+def plan_slips(auto_games: int, manual_numbers: list) -> list:
+    """
+    구매 한도(MAX_GAMES_PER_DRAW)를 적용하고 장부에 이미 있는 번호를 경고한 뒤
+    슬립(최대 5게임) 단위로 나눕니다. (동기/비동기 구매 공통)
+
+    Returns:
+        list of (auto_games, manual_numbers) per slip
+    """
+    total_games = auto_games + len(manual_numbers)
+    if total_games > MAX_GAMES_PER_DRAW:
+        print(f"Warning: {total_games} game(s) requested, purchase limit is {MAX_GAMES_PER_DRAW}. "
+              f"Extra games are skipped.")
+        auto_games = min(auto_games, MAX_GAMES_PER_DRAW)
+        manual_numbers = manual_numbers[:MAX_GAMES_PER_DRAW - auto_games]
+
+    # Same numbers already bought for this round (ledger, indexed by mask)
+    for numbers in already_bought(manual_numbers):
+        print(f"Warning: {numbers} was already bought for this round (ledger)")
+
+    return split_slips(auto_games, manual_numbers)
+
+
+def add_slip_result(summary: dict, result: dict) -> bool:
+    """
+    슬립 구매 결과를 summary에 합칩니다.
+
+    Returns:
+        bool: 다음 슬립을 구매해도 되면 True (failed/unknown이면 False)
+    """
+    summary["processed_count"] += result.get("processed_count", 0)
+    summary["games"] += result.get("games", [])
+    for key in ("round", "balance"):
+        if key in result:
+            summary[key] = result[key]
+    # failed or unknown: do not buy the next slip on top of an unclear result
+    if result.get("status") in ("failed", "unknown"):
+        summary["status"] = result["status"]
+        return False
+    return True
+
+
+def purchase_slips(page: Page, auto_games: int, manual_numbers: list, sr: TimedReporter) -> dict:
+    """
+    구매 한도(MAX_GAMES_PER_DRAW)까지만 남기고 슬립(최대 5게임) 단위로 purchase를 반복합니다.
+    """
+    slips = plan_slips(auto_games, manual_numbers)
+    if len(slips) <= 1:
+        slip_auto, slip_manual = slips[0] if slips else (0, [])
+        return purchase(page, slip_auto, slip_manual, sr)
+    summary = {"processed_count": 0, "games": []}
+    for i, (slip_auto, slip_manual) in enumerate(slips, 1):
+        print(f"Slip {i}/{len(slips)}: {slip_auto} auto, {len(slip_manual)} manual")
+        if not add_slip_result(summary, purchase(page, slip_auto, slip_manual, sr)):
+            break
+    return summary
+
+
+def run(playwright: Playwright, auto_games: int, manual_numbers: list, sr: TimedReporter) -> dict:
+    """
+    로또 6/45를 자동 및 수동으로 구매합니다.
+    """
+    # Create browser, context, and page
+    HEADLESS = environ.get('HEADLESS', 'true').lower() == 'true'
+    browser = launch_browser(playwright, headless=HEADLESS, slow_mo=0 if HEADLESS else 500)
+
+    # Load session if exists
+    storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
+    context = new_context(browser, storage_state, har_name="lotto645")
+    
+    try:
+        page = context.new_page()
+        setup_dialog_handler(page)
+
+        # Log in only when the stored session is stale
+        sr.stage("CHECK_SESSION")
+        ensure_session(page, sr)
+
+        return purchase_slips(page, auto_games, manual_numbers, sr)
     finally:
         context.close()
         browser.close()
 
 
 if __name__ == "__main__":
-    sr = ScriptReporter("Lotto 6/45")
+    sr = TimedReporter("Lotto 6/45")
     
     try:
         # Parse command-line arguments or use .env configuration
@@ -245,7 +491,11 @@ if __name__ == "__main__":
         
         with sync_playwright() as playwright:
             process_result = run(playwright, auto_games, manual_numbers, sr)
-            sr.success(process_result)
+        if process_result.get("status") == "failed":
+            raise Exception(f"Lotto 6/45 purchase failed: {process_result.get('message')}")
+        if process_result.get("status") == "unknown":
+            raise Exception("Lotto 6/45 purchase result unknown. Check the purchase history before retrying.")
+        sr.success(process_result)
             
     except Exception as e:
         sr.fail(traceback.format_exc())
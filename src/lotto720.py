@@ -5,51 +5,62 @@ import re
 from os import environ
 from pathlib import Path
 from dotenv import load_dotenv
-from playwright.sync_api import Playwright, sync_playwright
-from login import login, SESSION_PATH, DEFAULT_USER_AGENT, DEFAULT_VIEWPORT, DEFAULT_HEADERS, GLOBAL_TIMEOUT, setup_dialog_handler
+from playwright.sync_api import Playwright, sync_playwright, Page
+from login import login, ensure_session, new_context, launch_browser, SESSION_PATH, GLOBAL_TIMEOUT, setup_dialog_handler
+from routing import use_profile
+from waits import (
+    wait_for_count_increase, wait_for_dom_change, wait_for_response, wait_for_selector, wait_for_spinner_gone,
+)
+from ledger import parse_response, purchase_summary, read_purchase
 
 import sys
 import traceback
-from script_reporter import ScriptReporter
+from spans import TimedReporter
 
 # .env loading is handled by login module import
 
+GAME_URL = "https://el.dhlottery.co.kr/game_mobile/pension720/game.jsp"
+# 구매 완료 후 회차/발행 번호가 표시되는 결과 레이어
+RESULT_SELECTORS = ["#resultLayer", "#popReceipt"]
+# 구매 요청 (응답: 결과 코드, 회차, 발행 번호, 잔액)
+BUY_RESPONSE_PATTERN = re.compile(r"/connPro\.jsp")
+# 보조 신호 (있으면 먼저 기다림, 없거나 시간 초과면 기존 스피너/구매하기 대기로 진행)
+# 자동번호 요청과 선택 번호 목록, 선택완료 후 구매 영역의 번호 목록
+AUTO_RESPONSE_PATTERN = re.compile(r"/makeAutoNo\.jsp")
+AUTO_RESPONSE_TIMEOUT = 3000
+JO_SELECTOR = "ul.jo"
+SELECTED_LIST_SELECTOR = "#selectedNumbers"
+TICKET_LIST_SELECTOR = "#ticketList"
+LIST_FILL_TIMEOUT = 2000
 
-def run(playwright: Playwright, sr: ScriptReporter) -> None:
+
+def list_count(page: Page, selector: str):
+    """Items in the list, or None when the page has no such list."""
+    if not page.locator(selector).count():
+        return None
+    return page.locator(f"{selector} li").count()
+
+
+def wait_for_list_fill(page: Page, selector: str, before, name: str) -> bool:
+    """Soft wait for the list to grow; skipped when the list does not exist."""
+    if before is None:
+        return False
+    if not wait_for_count_increase(page, f"{selector} li", before, timeout=LIST_FILL_TIMEOUT, name=name):
+        print(f"{selector} did not change. Continuing.")
+        return False
+    return True
+
+
+def purchase(page: Page, sr: TimedReporter) -> dict:
     """
-    연금복권 720+를 구매합니다.
+    로그인된 페이지에서 연금복권 720+를 구매합니다.
     '모든 조'를 선택하여 임의의 번호로 5매(5,000원)를 구매합니다.
+    브라우저/컨텍스트 관리는 호출자(run, workflow)가 담당합니다.
+    결과 레이어에서 읽은 회차/발행 번호를 장부(ledger)에 기록하고 반환합니다.
     """
-    GAME_URL = "https://el.dhlottery.co.kr/game_mobile/pension720/game.jsp"
-    
-    # Create browser, context, and page
-    HEADLESS = environ.get('HEADLESS', 'true').lower() == 'true'
-    browser = playwright.chromium.launch(headless=HEADLESS)
-
-    # Load session if exists
-    storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
-    context = browser.new_context(
-        storage_state=storage_state,
-        user_agent=DEFAULT_USER_AGENT,
-        viewport=DEFAULT_VIEWPORT,
-        extra_http_headers=DEFAULT_HEADERS
-    )
-    
+    use_profile(page, "default")
     try:
-        page = context.new_page()
-        setup_dialog_handler(page)
-
-        # 1. Session Check & Login
-        from login import is_logged_in
-        sr.stage("CHECK_SESSION")
-        if not is_logged_in(page):
-            print("Session expired or missing. Logging in...")
-            sr.stage("LOGIN")
-            login(page)
-        else:
-            print("Session is valid.")
-        
-        # 2. Navigate to Game Page
+        # 1. Navigate to Game Page
         sr.stage("NAVIGATE")
         print(f"Navigating to Lotto 720 game: {GAME_URL}")
         try:
@@ -66,10 +77,10 @@ def run(playwright: Playwright, sr: ScriptReporter) -> None:
             page.screenshot(path=f"lotto720_nav_failed_{int(time.time())}.png")
             raise e
 
-        # Give a small moment for components to initialize
-        time.sleep(1)
+        # Wait for the game components to initialize
+        wait_for_selector(page, "a.btn_gray_st1.large.full, a:has-text('번호 선택하기')", replaced=1.0, name="lotto720_ready")
         
-        # 3. Purchase Flow
+        # 2. Purchase Flow
         sr.stage("PURCHASE_PROCESS")
         
         # Step 1: Open Number Selection
@@ -83,7 +94,8 @@ def run(playwright: Playwright, sr: ScriptReporter) -> None:
             page.screenshot(path=f"lotto720_select_btn_failed_{int(time.time())}.png")
             raise e
         
-        time.sleep(1) # Wait for animation
+        # Wait for the selection layer to open
+        wait_for_selector(page, "a:has-text('자동번호')", replaced=1.0, name="lotto720_select_layer")
 
         # Step 2: Ensure 'All Jo' is selected & Click Automatic
         print("Ensuring 'All Jo' (모든조) is selected and clicking 'Automatic' (자동번호)...")
@@ -91,15 +103,19 @@ def run(playwright: Playwright, sr: ScriptReporter) -> None:
             # Select 'All Jo'
             all_jo = page.locator("li:has-text('모든조'), span.group.all").first
             if all_jo.is_visible(timeout=2000):
-                all_jo.click()
-                time.sleep(0.3)
+                wait_for_dom_change(page, all_jo.click, selector=JO_SELECTOR, attributes=True,
+                                    replaced=0.3, name="lotto720_all_jo")
             
-            # Click 'Automatic'
-            page.locator("a.btn_wht.xsmall:has-text('자동번호'), a:has-text('자동번호')").first.click()
-            
-            # Wait for any spinner to disappear
-            page.wait_for_selector("text=통신중입니다", state="hidden", timeout=5000)
-            time.sleep(0.5)
+            # Click 'Automatic'. The auto-number response and the selected list
+            # are optional signals; the spinner wait decides as before.
+            auto_btn = page.locator("a.btn_wht.xsmall:has-text('자동번호'), a:has-text('자동번호')").first
+            selected_before = list_count(page, SELECTED_LIST_SELECTOR)
+            if wait_for_response(page, AUTO_RESPONSE_PATTERN, auto_btn.click, timeout=AUTO_RESPONSE_TIMEOUT,
+                                 replaced=0.5, name="lotto720_auto_response") is None:
+                print("Auto-number response not seen. Relying on the spinner.")
+            if not wait_for_spinner_gone(page, timeout=5000, name="lotto720_auto_spinner"):
+                raise TimeoutError("Automatic number request did not finish")
+            wait_for_list_fill(page, SELECTED_LIST_SELECTOR, selected_before, "lotto720_auto_numbers")
         except Exception as e:
             print(f"Automatic selection failed: {e}")
             page.screenshot(path=f"lotto720_auto_failed_{int(time.time())}.png")
@@ -107,27 +123,33 @@ def run(playwright: Playwright, sr: ScriptReporter) -> None:
         
         # Step 3: Confirm Selection
         print("Confirming selection...")
+        tickets_before = list_count(page, TICKET_LIST_SELECTOR)
         page.locator("a.btn_blue.full.large:has-text('선택완료'), a:has-text('선택완료')").first.click()
-        time.sleep(0.8)
+        wait_for_list_fill(page, TICKET_LIST_SELECTOR, tickets_before, "lotto720_selection_done")
+        wait_for_selector(page, "a:has-text('구매하기')", replaced=0.8, name="lotto720_buy_ready")
 
         # Step 4: Final Purchase
         print("Clicking 'Purchase' (구매하기)...")
-        page.locator("a.btn_blue.large.full:has-text('구매하기'), a:has-text('구매하기')").first.click()
-        
-        # Step 5: Verify Result
+        # The dialog handler accepts the 'Are you sure?' alert; the purchase
+        # response decides (result code, round, issued tickets, balance)
+        buy_btn = page.locator("a.btn_blue.large.full:has-text('구매하기'), a:has-text('구매하기')").first
+        response = wait_for_response(page, BUY_RESPONSE_PATTERN, buy_btn.click, timeout=GLOBAL_TIMEOUT,
+                                     replaced=0, name="lotto720_buy_response")
+        result = parse_response("720", response) if response else None
+        if result is not None:
+            return purchase_summary("720", result, "response")
+
+        # Step 5: Response not readable, read the result layer once before closing it
         print("Verifying success...")
-        try:
-            # Wait for results modal or confirmation
-            # The dialog handler should have accepted the initial 'Are you sure?' alert.
-            # Now we look for the final confirm button in the result popup.
-            final_confirm = page.locator("a.btn_lgray.medium:has-text('확인'), a.btn_blue:has-text('확인'), a:has-text('확인')").first
-            if final_confirm.is_visible(timeout=10000):
-                final_confirm.click()
-                print("Lotto 720: Purchase successful.")
-            else:
-                print("Result confirmation button not visible, assuming success if no error alert shown.")
-        except Exception:
-             print("Result confirmation timeout. Login/Balance may need check.")
+        if not wait_for_selector(page, ", ".join(RESULT_SELECTORS), timeout=10000, replaced=0, name="lotto720_result"):
+            print("Result layer not visible. Login/Balance may need check.")
+            page.screenshot(path=f"lotto720_no_result_{int(time.time())}.png")
+            return {"processed_count": 0, "status": "unknown"}
+        result = read_purchase(page, "720", RESULT_SELECTORS)
+        final_confirm = page.locator("a.btn_lgray.medium:has-text('확인'), a.btn_blue:has-text('확인'), a:has-text('확인')").first
+        if final_confirm.is_visible():
+            final_confirm.click()
+        return purchase_summary("720", result)
 
     except Exception as e:
         print(f"Purchase flow interrupted: {e}")
@@ -136,16 +158,44 @@ def run(playwright: Playwright, sr: ScriptReporter) -> None:
         except:
              pass
         raise
+
+
+def run(playwright: Playwright, sr: TimedReporter) -> dict:
+    """
+    연금복권 720+를 구매합니다.
+    '모든 조'를 선택하여 임의의 번호로 5매(5,000원)를 구매합니다.
+    """
+    # Create browser, context, and page
+    HEADLESS = environ.get('HEADLESS', 'true').lower() == 'true'
+    browser = launch_browser(playwright, headless=HEADLESS)
+
+    # Load session if exists
+    storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
+    context = new_context(browser, storage_state, har_name="lotto720")
+    
+    try:
+        page = context.new_page()
+        setup_dialog_handler(page)
+
+        # Log in only when the stored session is stale
+        sr.stage("CHECK_SESSION")
+        ensure_session(page, sr)
+
+        return purchase(page, sr)
     finally:
         context.close()
         browser.close()
 
 if __name__ == "__main__":
-    sr = ScriptReporter("Lotto 720")
+    sr = TimedReporter("Lotto 720")
     try:
         with sync_playwright() as playwright:
-            run(playwright, sr)
-            sr.success({"processed_count": 5})
+            result = run(playwright, sr)
+        if result.get("status") == "failed":
+            raise Exception(f"Lotto 720 purchase failed: {result.get('message')}")
+        if result.get("status") == "unknown":
+            raise Exception("Lotto 720 purchase result unknown. Check the purchase history before retrying.")
+        sr.success(result)
     except Exception:
         sr.fail(traceback.format_exc())
         sys.exit(1)
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from datetime import date
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for the dhlottery mobile site.
+# Serves login, my page, 간편충전 (with a shuffled image keypad), 연금복권 720
+# and 로또 6/45 pages carrying the selectors the scripts rely on, with
+# configurable latency, blocking popups and failure injection.
+# attach(context) routes the real https://{m,el,ol}.dhlottery.co.kr URLs of a
+# Playwright context to this server, so the flows run unchanged (see e2e_bench.py).
+# It also serves deterministic winning-number history (getLottoNumber and a
+# 720 JSON endpoint, with ETag revalidation) as a fixture for draw_history.py.
+
+MOCK_HOST_PATTERN = re.compile(r"^https://(m|el|ol)\.dhlottery\.co\.kr/")
+SESSION_COOKIE = "JSESSIONID"
+FAILURE_POINTS = ("login", "balance", "charge", "lotto720", "lotto645")
+CHARGE_AMOUNTS = [5000, 10000, 20000, 30000, 50000]
+LOTTO720_COST = 5000
+LOTTO645_GAME_COST = 1000
+MAX_645_GAMES = 5
+
+STYLE = """
+body { margin: 0; font-family: sans-serif; font-size: 14px; }
+header { padding: 8px; border-bottom: 1px solid #ddd; }
+.hidden { display: none !important; }
+.popup { position: fixed; inset: 0; background: rgba(0,0,0,.5); display: flex; align-items: center; justify-content: center; z-index: 100; }
+.popup .box, .layer { background: #fff; padding: 16px; border: 1px solid #999; }
+.layer { position: fixed; left: 16px; right: 16px; top: 120px; z-index: 50; }
+.nppfs-keypad { display: none; grid-template-columns: repeat(3, 64px); gap: 6px; padding: 6px; background: #e2e5ea; width: max-content; }
+img.kpd-data { width: 64px; height: 64px; display: block; }
+.lt-num { display: inline-block; width: 36px; height: 36px; line-height: 36px; margin: 2px; text-align: center; border: 1px solid #ccc; border-radius: 50%; }
+.lt-num.on { background: #fc0; }
+a, button { display: inline-block; margin: 4px; padding: 8px; }
+"""
+
+LAYOUT = """<!DOCTYPE html>
+<html lang="ko"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>동행복권 (mock)</title><style>{{STYLE}}</style></head>
+<body>{{POPUP}}{{BODY}}</body></html>"""
+
+POPUP = """<div class="popup" id="noticePopup"><div class="box"><p>공지사항</p>
+<a href="#" class="btn_close" onclick="document.getElementById('noticePopup').remove(); return false;">닫기</a></div></div>"""
+
+LOGGED_IN_HEADER = """<header><a id="logoutBtn" class="btn_logout" href="/logout">로그아웃</a></header>"""
+LOGGED_OUT_HEADER = """<header><a class="btn_login" href="/login">로그인</a></header>"""
+
+LOGIN_BODY = """<form id="loginForm" method="post" action="/login">
+{{ERROR}}
+<input type="text" id="inpUserId" name="userId" placeholder="아이디">
+<input type="password" id="inpUserPswdEncn" name="userPswdEncn" placeholder="비밀번호">
+<button type="submit" id="btnLogin">로그인</button>
+</form>"""
+
+LOGIN_ERROR = """<p class="error">아이디 또는 비밀번호가 일치하지 않습니다.</p>"""
+
+MAIN_BODY = """{{HEADER}}<main><p>동행복권 메인</p></main>"""
+
+MYPAGE_BODY = """{{HEADER}}<section class="money">
+<p>예치금 <strong id="navTotalAmt">{{BALANCE}}원</strong></p>
+<p>구매가능 <strong id="divCrntEntrsAmt">{{BALANCE}}원</strong></p>
+</section>"""
+
+ERROR_BODY = """<h1>일시적인 오류가 발생했습니다</h1>"""
+
+CHARGE_BODY = """{{HEADER}}
+<select id="EcAmt" name="EcAmt">{{OPTIONS}}</select>
+<button type="button" class="btn-rec01" id="btnCharge">충전하기</button>
+<div class="nppfs-keypad" id="keypad">{{KEYS}}</div>
+<div class="layer hidden" id="alertLayer"><p id="alertMsg"></p><button type="button" id="btnAlertPop">확인</button></div>
+<script>
+const PIN_LENGTH = {{PIN_LENGTH}};
+const pressed = [];
+const keypad = document.getElementById('keypad');
+document.getElementById('btnCharge').addEventListener('click', () => {
+    const images = Array.from(keypad.querySelectorAll('img.kpd-data'));
+    Promise.all(images.map(img => img.complete ? null : new Promise(resolve => { img.onload = resolve; img.onerror = resolve; })))
+        .then(() => { keypad.style.display = 'grid'; });
+});
+keypad.querySelectorAll('img.kpd-data').forEach((img, index) => img.addEventListener('click', () => {
+    if (pressed.length >= PIN_LENGTH) return;
+    pressed.push(index);
+    if (pressed.length === PIN_LENGTH) submit();
+}));
+function submit() {
+    fetch('/mypage/chargePro', {method: 'POST', headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({amount: document.getElementById('EcAmt').value, keys: pressed})})
+        .then(response => response.json()).then(data => {
+            keypad.style.display = 'none';
+            document.getElementById('alertMsg').textContent = data.message;
+            document.getElementById('alertLayer').classList.remove('hidden');
+            if (data.result === 'OK') history.replaceState(null, '', '?result=OK');
+        });
+}
+document.getElementById('btnAlertPop').addEventListener('click', () => document.getElementById('alertLayer').classList.add('hidden'));
+</script>"""
+
+LOTTO720_BODY = """{{HEADER}}
+<a href="#" class="btn_gray_st1 large full" id="btnSelectOpen">번호 선택하기</a>
+<div class="layer hidden" id="selectLayer">
+<ul class="jo"><li class="on"><span class="group all">모든조</span></li>{{JO}}</ul>
+<a href="#" class="btn_wht xsmall" id="btnAutoNo">자동번호</a>
+<ul id="selectedNumbers"></ul>
+<a href="#" class="btn_blue full large" id="btnSelectDone">선택완료</a>
+</div>
+<div class="hidden" id="buyArea"><ul id="ticketList"></ul><a href="#" class="btn_blue large full" id="btnBuy720">구매하기</a></div>
+<div class="layer hidden" id="spinner">통신중입니다</div>
+<div class="layer hidden" id="resultLayer"><p id="resultMsg"></p><p id="resultRound"></p><ul id="resultTickets"></ul>
+<p id="resultAmount"></p><a href="#" class="btn_lgray medium" id="btnResultOk">확인</a></div>
+<script>
+const $ = id => document.getElementById(id);
+const post = (url, body) => fetch(url, {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body)}).then(r => r.json());
+let tickets = [];
+$('btnSelectOpen').addEventListener('click', e => { e.preventDefault(); $('selectLayer').classList.remove('hidden'); });
+document.querySelectorAll('.jo li').forEach(li => li.addEventListener('click', () => {
+    document.querySelectorAll('.jo li').forEach(other => other.classList.remove('on'));
+    li.classList.add('on');
+}));
+$('btnAutoNo').addEventListener('click', e => {
+    e.preventDefault();
+    $('spinner').classList.remove('hidden');
+    post('/game_mobile/pension720/makeAutoNo.jsp', {all: document.querySelector('.jo li.on .all') !== null}).then(data => {
+        tickets = data.tickets;
+        $('selectedNumbers').innerHTML = tickets.map(t => `<li>${t}</li>`).join('');
+        $('spinner').classList.add('hidden');
+    });
+});
+$('btnSelectDone').addEventListener('click', e => {
+    e.preventDefault();
+    if (!tickets.length) { alert('번호를 선택해 주세요.'); return; }
+    $('selectLayer').classList.add('hidden');
+    $('ticketList').innerHTML = tickets.map(t => `<li>${t}</li>`).join('');
+    $('buyArea').classList.remove('hidden');
+});
+$('btnBuy720').addEventListener('click', e => {
+    e.preventDefault();
+    if (!confirm('구매하시겠습니까?')) return;
+    $('spinner').classList.remove('hidden');
+    post('/game_mobile/pension720/connPro.jsp', {tickets}).then(data => {
+        $('spinner').classList.add('hidden');
+        $('resultMsg').textContent = data.message;
+        $('resultRound').textContent = data.round ? `제 ${data.round}회` : '';
+        $('resultTickets').innerHTML = (data.tickets || []).map(t => `<li>${t}</li>`).join('');
+        $('resultAmount').textContent = data.amount ? `결제금액 ${data.amount.toLocaleString()}원` : '';
+        $('resultLayer').classList.remove('hidden');
+    });
+});
+$('btnResultOk').addEventListener('click', e => { e.preventDefault(); $('resultLayer').classList.add('hidden'); });
+</script>"""
+
+LOTTO645_BODY = """{{HEADER}}
+<div id="board">{{NUMBERS}}</div>
+<button type="button" id="btnSelectNum">선택완료</button>
+<button type="button" id="btnAuto">자동 1매 추가</button>
+<ul id="gameList"></ul>
+<button type="button" id="btnBuy">구매하기</button>
+<div class="layer hidden" id="popupLayerConfirm"><p>구매하시겠습니까?</p>
+<button type="button" id="btnConfirmBuy">확인</button><button type="button" id="btnCancelBuy">취소</button></div>
+<div class="layer hidden" id="popupLayerResult"><p id="resultMsg"></p><p id="resultRound"></p><ul id="resultGames"></ul>
+<p id="resultAmount"></p><button type="button" id="btnResultOk">확인</button></div>
+<script>
+const $ = id => document.getElementById(id);
+const MAX_GAMES = {{MAX_GAMES}};
+const games = [];
+let picked = [];
+function render() {
+    $('gameList').innerHTML = games.map((g, i) =>
+        `<li>${String.fromCharCode(65 + i)} ${g.mode === 'auto' ? '자동' : g.numbers.join(' ')}</li>`).join('');
+}
+document.querySelectorAll('.lt-num').forEach(el => el.addEventListener('click', () => {
+    const n = Number(el.textContent);
+    if (el.classList.contains('on')) { el.classList.remove('on'); picked = picked.filter(p => p !== n); return; }
+    if (picked.length >= 6) { alert('번호는 6개까지 선택할 수 있습니다.'); return; }
+    el.classList.add('on');
+    picked.push(n);
+}));
+$('btnSelectNum').addEventListener('click', () => {
+    if (picked.length !== 6) { alert('번호 6개를 선택해 주세요.'); return; }
+    if (games.length >= MAX_GAMES) { alert('최대 5게임까지 구매할 수 있습니다.'); return; }
+    games.push({mode: 'manual', numbers: [...picked].sort((a, b) => a - b)});
+    picked = [];
+    document.querySelectorAll('.lt-num.on').forEach(el => el.classList.remove('on'));
+    render();
+});
+$('btnAuto').addEventListener('click', () => {
+    if (games.length >= MAX_GAMES) { alert('최대 5게임까지 구매할 수 있습니다.'); return; }
+    games.push({mode: 'auto', numbers: null});
+    render();
+});
+$('btnBuy').addEventListener('click', () => {
+    if (!games.length) { alert('선택된 게임이 없습니다.'); return; }
+    $('popupLayerConfirm').classList.remove('hidden');
+});
+$('btnCancelBuy').addEventListener('click', () => $('popupLayerConfirm').classList.add('hidden'));
+$('btnConfirmBuy').addEventListener('click', () => {
+    $('popupLayerConfirm').classList.add('hidden');
+    fetch('/olotto/game_mobile/execBuy.do', {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({games})})
+        .then(r => r.json()).then(data => {
+            const pad = n => String(n).padStart(2, '0');
+            $('resultMsg').textContent = data.message;
+            $('resultRound').textContent = data.round ? `제 ${data.round}회` : '';
+            $('resultGames').innerHTML = (data.games || []).map(g =>
+                `<li>${g.slot} ${g.mode} ${g.numbers.map(pad).join(' ')}</li>`).join('');
+            $('resultAmount').textContent = data.amount ? `결제금액 ${data.amount.toLocaleString()}원` : '';
+            $('popupLayerResult').classList.remove('hidden');
+            games.length = 0;
+            render();
+        });
+});
+$('btnResultOk').addEventListener('click', () => $('popupLayerResult').classList.add('hidden'));
+</script>"""
+
+
+def render(template: str, **values) -> str:
+    """{{NAME}} substitution (keeps JS/CSS braces untouched)."""
+    for name, value in values.items():
+        template = template.replace("{{" + name + "}}", str(value))
+    return template
+
+
+def parse_failures(spec: str) -> dict:
+    """'login=0.2,charge=1' -> {'login': 0.2, 'charge': 1.0}"""
+    failures = {}
+    for item in filter(None, (s.strip() for s in (spec or "").split(","))):
+        name, _, rate = item.partition("=")
+        if name not in FAILURE_POINTS:
+            raise ValueError(f"Unknown failure point: {name} (choose from {', '.join(FAILURE_POINTS)})")
+        failures[name] = float(rate or 1.0)
+    return failures
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes; with Nagle on, keep-alive clients
+    # wait ~40 ms per response for the delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.site.respond(self)
+
+    def do_POST(self):
+        self.server.site.respond(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockSite:
+    """
+    In-process mock of the dhlottery mobile site on 127.0.0.1.
+
+    Args:
+        latency_ms / jitter_ms: added to every response (uniform jitter)
+        popup_rate: probability that the login page shows a blocking notice popup
+        failures: {failure point: probability}, see FAILURE_POINTS
+        pin: 간편충전 PIN accepted by the keypad
+        balance: starting deposit of every new session
+        history_rounds: {game: latest published round} for the history
+            endpoints; by default the real draw calendar decides
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, popup_rate: float = 0.0,
+                 failures: dict = None, pin: str = "123456", balance: int = 20000,
+                 seed: int = None, port: int = 0, history_rounds: dict = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.popup_rate = popup_rate
+        self.failures = failures or {}
+        self.pin = pin
+        self.balance = balance
+        self.port = port
+        self.history_rounds = dict(history_rounds or {})
+        self.rng = random.Random(seed)
+        self.sessions = {}
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self) -> "MockSite":
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.site = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    # --- helpers ---------------------------------------------------------
+
+    def _chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def _fails(self, point: str) -> bool:
+        return self._chance(self.failures.get(point, 0.0))
+
+    def _session(self, handler):
+        cookie = SimpleCookie(handler.headers.get("Cookie", ""))
+        token = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        return token, self.sessions.get(token)
+
+    def _new_session(self):
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.sessions[token] = {"balance": self.balance, "keypad": None}
+        return token
+
+    @staticmethod
+    def _url(handler, host: str, path: str) -> str:
+        # Behind attach() redirects point at the real hosts (routed back here),
+        # served standalone they stay on this server
+        return f"https://{host}{path}" if handler.headers.get("X-Mock-Host") else path
+
+    @staticmethod
+    def _page(body: str, popup: bool = False):
+        html = render(LAYOUT, STYLE=STYLE, POPUP=POPUP if popup else "", BODY=body)
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, html.encode()
+
+    @staticmethod
+    def _json(data: dict, status: int = 200):
+        return status, {"Content-Type": "application/json; charset=utf-8"}, json.dumps(data, ensure_ascii=False).encode()
+
+    def _redirect(self, handler, host: str, path: str, headers: dict = None):
+        return 302, dict(headers or {}, Location=self._url(handler, host, path)), b""
+
+    def _keypad(self, session: dict) -> str:
+        """Renders a freshly shuffled keypad for the session, returns the <img> tags."""
+        from keypad_bench import render_keypad
+
+        with self._lock:
+            seed = self.rng.randint(0, 2 ** 31)
+        img, buttons, labels = render_keypad(random.Random(seed), button_size=64)
+        token = secrets.token_hex(8)
+        images = []
+        for b in buttons:
+            buf = io.BytesIO()
+            img.crop((b['x'], b['y'], b['x'] + b['w'], b['y'] + b['h'])).save(buf, format="PNG")
+            images.append(buf.getvalue())
+        session["keypad"] = {"token": token, "labels": labels, "images": images}
+        return "".join(f'<img class="kpd-data" src="/nppfs/keypad/{token}/{i}.png" alt="">' for i in range(len(labels)))
+
+    def _sale_round(self, game: str) -> int:
+        """Round on sale: the one after the latest published draw."""
+        from draw_history import expected_round
+
+        return self.history_rounds.get(game, expected_round(game)) + 1
+
+    def _draw(self, handler, game: str, round_number: int):
+        """Deterministic winning numbers per round, 304 when the ETag matches."""
+        from draw_history import GAMES, expected_round, from_day
+
+        latest = self.history_rounds.get(game, expected_round(game))
+        if not 1 <= round_number <= latest:
+            data = {"returnValue": "fail"}
+        else:
+            rng = random.Random(f"{game}-{round_number}")
+            day = from_day((GAMES[game]["first"].date() - date(1970, 1, 1)).days + 7 * (round_number - 1))
+            if game == "645":
+                picked = rng.sample(range(1, 46), 7)
+                data = {"returnValue": "success", "drwNo": round_number, "drwNoDate": day, "bnusNo": picked[6],
+                        **{f"drwtNo{i}": n for i, n in enumerate(sorted(picked[:6]), 1)}}
+            else:
+                digits = lambda: "".join(str(rng.randint(0, 9)) for _ in range(6))
+                data = {"returnValue": "success", "round": round_number, "date": day,
+                        "group": rng.randint(1, 5), "numbers": digits(), "bonus": digits()}
+        status, headers, payload = self._json(data)
+        etag = f'"{hashlib.sha1(payload).hexdigest()[:16]}"'
+        self.stats[f"history_{game}"] += 1
+        if handler.headers.get("If-None-Match") == etag:
+            self.stats["history_not_modified"] += 1
+            return 304, {"ETag": etag}, b""
+        return status, dict(headers, ETag=etag), payload
+
+    # --- request handling ------------------------------------------------
+
+    def respond(self, handler):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        with self._lock:
+            delay = self.latency_ms + (self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+        try:
+            status, headers, payload = self.dispatch(handler, urlsplit(handler.path).path, body)
+        except Exception as e:
+            status, headers, payload = 500, {"Content-Type": "text/plain"}, f"mock error: {e}".encode()
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def dispatch(self, handler, path: str, body: bytes):
+        method = handler.command
+        token, session = self._session(handler)
+        header = LOGGED_IN_HEADER if session else LOGGED_OUT_HEADER
+        self.stats[f"{method} {path}"] += 1
+
+        # www.dhlottery.co.kr (당첨번호 이력)
+        query = parse_qs(urlsplit(handler.path).query)
+        if path == "/common.do" and query.get("method") == ["getLottoNumber"]:
+            return self._draw(handler, "645", int(query.get("drwNo", ["0"])[0] or 0))
+        if path == "/pt720/winning.json":
+            return self._draw(handler, "720", int(query.get("round", ["0"])[0] or 0))
+
+        # m.dhlottery.co.kr
+        if path in ("/", "/main"):
+            return self._page(render(MAIN_BODY, HEADER=header))
+        if path == "/login" and method == "GET":
+            if session:
+                return self._redirect(handler, "m.dhlottery.co.kr", "/main")
+            return self._page(render(LOGIN_BODY, ERROR=""), popup=self._chance(self.popup_rate))
+        if path == "/login" and method == "POST":
+            form = parse_qs(body.decode())
+            if not form.get("userId") or not form.get("userPswdEncn") or self._fails("login"):
+                self.stats["login_failed"] += 1
+                return self._page(render(LOGIN_BODY, ERROR=LOGIN_ERROR))
+            token = self._new_session()
+            self.stats["login_ok"] += 1
+            domain = "; Domain=.dhlottery.co.kr" if handler.headers.get("X-Mock-Host") else ""
+            cookie = f"{SESSION_COOKIE}={token}; Path=/{domain}; HttpOnly"
+            return self._redirect(handler, "m.dhlottery.co.kr", "/main", {"Set-Cookie": cookie})
+        if path == "/logout":
+            with self._lock:
+                self.sessions.pop(token, None)
+            return self._redirect(handler, "m.dhlottery.co.kr", "/main")
+
+        login_required = path.startswith(("/mypage", "/game_mobile", "/olotto", "/nppfs"))
+        if login_required and not session:
+            if method == "POST":
+                return self._json({"result": "FAIL", "message": "로그인이 필요합니다."}, 401)
+            return self._redirect(handler, "m.dhlottery.co.kr", "/login")
+
+        if path == "/mypage/home":
+            if self._fails("balance"):
+                return 500, {"Content-Type": "text/html; charset=utf-8"}, render(LAYOUT, STYLE=STYLE, POPUP="", BODY=ERROR_BODY).encode()
+            return self._page(render(MYPAGE_BODY, HEADER=header, BALANCE=f"{session['balance']:,}"))
+        if path == "/mypage/mndpChrg":
+            options = "".join(f'<option value="{a}">{a:,}원</option>' for a in CHARGE_AMOUNTS)
+            return self._page(render(CHARGE_BODY, HEADER=header, OPTIONS=options,
+                                     KEYS=self._keypad(session), PIN_LENGTH=len(self.pin)))
+        match = re.fullmatch(r"/nppfs/keypad/(\w+)/(\d+)\.png", path)
+        if match:
+            keypad = session.get("keypad")
+            if not keypad or keypad["token"] != match.group(1) or int(match.group(2)) >= len(keypad["images"]):
+                return 404, {"Content-Type": "text/plain"}, b"not found"
+            return 200, {"Content-Type": "image/png"}, keypad["images"][int(match.group(2))]
+        if path == "/mypage/chargePro":
+            data = json.loads(body or b"{}")
+            keypad = session.get("keypad") or {"labels": []}
+            labels = keypad["labels"]
+            entered = "".join(labels[k] if 0 <= k < len(labels) and len(labels[k]) == 1 else "?" for k in data.get("keys", []))
+            amount = int(data.get("amount") or 0)
+            session["keypad"] = None
+            if entered != self.pin or amount not in CHARGE_AMOUNTS or self._fails("charge"):
+                self.stats["charge_failed"] += 1
+                return self._json({"result": "FAIL", "message": "비밀번호가 일치하지 않습니다."})
+            session["balance"] += amount
+            self.stats["charge_ok"] += 1
+            return self._json({"result": "OK", "message": f"{amount:,}원 충전이 완료되었습니다."})
+
+        # el.dhlottery.co.kr (연금복권 720)
+        if path == "/game_mobile/pension720/game.jsp":
+            jo = "".join(f'<li><span class="group">{n}조</span></li>' for n in range(1, 6))
+            return self._page(render(LOTTO720_BODY, HEADER=header, JO=jo))
+        if path == "/game_mobile/pension720/makeAutoNo.jsp":
+            data = json.loads(body or b"{}")
+            with self._lock:
+                number = "".join(str(self.rng.randint(0, 9)) for _ in range(6))
+            groups = range(1, 6) if data.get("all", True) else [self.rng.randint(1, 5)]
+            return self._json({"result": "OK", "tickets": [f"{g}조 {number}" for g in groups]})
+        if path == "/game_mobile/pension720/connPro.jsp":
+            tickets = json.loads(body or b"{}").get("tickets", [])
+            cost = LOTTO720_COST // 5 * len(tickets)
+            if not tickets or session["balance"] < cost or self._fails("lotto720"):
+                self.stats["lotto720_failed"] += 1
+                return self._json({"result": "FAIL", "message": "구매에 실패했습니다."})
+            session["balance"] -= cost
+            self.stats["lotto720_tickets"] += len(tickets)
+            return self._json({"result": "OK", "message": f"{len(tickets)}매 구매가 완료되었습니다.",
+                               "round": self._sale_round("720"), "amount": cost, "tickets": tickets,
+                               "balance": session["balance"]})
+
+        # ol.dhlottery.co.kr (로또 6/45)
+        if path == "/olotto/game_mobile/game645.do":
+            numbers = "".join(f'<span class="lt-num">{n}</span>' for n in range(1, 46))
+            return self._page(render(LOTTO645_BODY, HEADER=header, NUMBERS=numbers, MAX_GAMES=MAX_645_GAMES))
+        if path == "/olotto/game_mobile/execBuy.do":
+            games = json.loads(body or b"{}").get("games", [])
+            cost = LOTTO645_GAME_COST * len(games)
+            if not games or len(games) > MAX_645_GAMES or session["balance"] < cost or self._fails("lotto645"):
+                self.stats["lotto645_failed"] += 1
+                return self._json({"result": "FAIL", "message": "구매에 실패했습니다."})
+            with self._lock:
+                bought = [{"slot": chr(65 + i), "mode": "수동" if g.get("numbers") else "자동",
+                           "numbers": g.get("numbers") or sorted(self.rng.sample(range(1, 46), 6))}
+                          for i, g in enumerate(games)]
+            session["balance"] -= cost
+            self.stats["lotto645_games"] += len(games)
+            return self._json({"result": "OK", "message": f"{len(games)}게임 구매가 완료되었습니다.",
+                               "round": self._sale_round("645"), "amount": cost, "games": bought,
+                               "balance": session["balance"]})
+
+        return 404, {"Content-Type": "text/plain"}, b"not found"
+
+    # --- Playwright bridge -----------------------------------------------
+
+    def forward(self, method: str, url: str, headers: dict, body: bytes, cookies: list):
+        """
+        Replays one browser request against this server.
+
+        Returns:
+            (status, headers, body, cookies): cookies are add_cookies() entries
+            for any Set-Cookie of the response.
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        skip = {"host", "cookie", "content-length"}
+        out = {k: v for k, v in headers.items() if k.lower() not in skip}
+        out["X-Mock-Host"] = parts.hostname
+        if cookies:
+            out["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=out)
+            response = conn.getresponse()
+            payload = response.read()
+            response_headers, new_cookies = {}, []
+            for name, value in response.getheaders():
+                if name.lower() == "set-cookie":
+                    for morsel in SimpleCookie(value).values():
+                        new_cookies.append({
+                            "name": morsel.key, "value": morsel.value,
+                            "domain": morsel["domain"] or parts.hostname, "path": morsel["path"] or "/",
+                            "httpOnly": True, "secure": True,
+                        })
+                elif name.lower() not in ("content-length", "connection", "transfer-encoding"):
+                    response_headers[name] = value
+            return response.status, response_headers, payload, new_cookies
+        finally:
+            conn.close()
+
+    def attach(self, context):
+        """
+        Routes the dhlottery hosts of a (sync API) browser context to this server.
+        Requests the context's RequestRouter would block fall back to it, so
+        blocking behaves like on the live site.
+        """
+        def handle(route):
+            request = route.request
+            router = getattr(context, "_request_router", None)
+            if router is not None and router.should_block(request.resource_type, request.url):
+                route.fallback()
+                return
+            try:
+                status, headers, body, cookies = self.forward(
+                    request.method, request.url, request.headers, request.post_data_buffer,
+                    context.cookies(request.url),
+                )
+                if cookies:
+                    context.add_cookies(cookies)
+                route.fulfill(status=status, headers=headers, body=body)
+            except Exception as e:
+                print(f"Mock route failed for {request.url}: {e}")
+                try:
+                    route.abort()
+                except Exception:
+                    pass
+
+        context.route(MOCK_HOST_PATTERN, handle)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Local mock of the dhlottery mobile site")
+    parser.add_argument("--port", type=int, default=8645)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--popup-rate", type=float, default=0.0)
+    parser.add_argument("--fail", default="", help=f"failure injection, e.g. login=0.2,charge=1 ({', '.join(FAILURE_POINTS)})")
+    parser.add_argument("--pin", default="123456")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    site = MockSite(args.latency_ms, args.jitter_ms, args.popup_rate, parse_failures(args.fail),
+                    args.pin, seed=args.seed, port=args.port).start()
+    print(f"Mock dhlottery site at {site.base_url}/login (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        site.stop()
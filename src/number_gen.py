@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+import time
+
+from tickets import MAX_NUMBER, NUMBERS_PER_TICKET, first_unique, load_tickets, popcount, ticket_masks
+
+# Constrained 6/45 number generator for manual games.
+# Candidates are sampled in NumPy batches (random k-subsets of the allowed
+# pool plus the required numbers) and filtered with vectorized checks:
+# sum range, odd count, no repeat of a past winning combination and no
+# duplicate game (45-bit masks). Only the optional minimum Hamming distance
+# between games is greedy, one vector comparison per accepted game.
+#
+# Rules (dict, e.g. GENERATOR_RULES in .env):
+#   exclude: [n, ...]       never use these numbers
+#   include: [n, ...]       every game contains these numbers
+#   sum: [low, high]        sum of the six numbers
+#   odd: [low, high]        number of odd numbers
+#   min_distance: d         popcount(a ^ b) >= d between games (2, 4, ... 12)
+#   past_file: path         CSV/JSONL of past winning combinations to avoid
+#   avoid_winners: true     skip every 6/45 winning combination in draw_history
+
+MAX_ROUNDS = 50
+
+
+def _parse_numbers(value: str) -> list:
+    return [int(v) for v in value.replace(" ", "").split(",") if v]
+
+
+def _parse_range(value: str) -> list:
+    low, _, high = value.partition("-")
+    return [int(low), int(high or low)]
+
+
+def past_masks(past) -> "np.ndarray":
+    """Bitmasks of past combinations (list of 6-number lists, or a ticket file path)."""
+    import numpy as np
+
+    if past is None:
+        return np.empty(0, dtype=np.uint64)
+    if isinstance(past, str):
+        past = load_tickets(past)["tickets"]
+    return np.sort(ticket_masks(np.asarray(past, dtype=np.int64).reshape(-1, NUMBERS_PER_TICKET)))
+
+
+def generate(count: int, exclude=(), include=(), sum_range=None, odd=None, min_distance: int = 0,
+             past=None, seed=None, batch_size: int = None) -> list:
+    """
+    Generates `count` distinct 6/45 games that satisfy the rules.
+
+    Returns:
+        list: [[6 sorted ints], ...] ready for lotto645 manual_numbers
+
+    Raises:
+        ValueError: rules are contradictory or too strict to fill `count`
+    """
+    import numpy as np
+
+    include = sorted(set(int(n) for n in include))
+    exclude = set(int(n) for n in exclude)
+    if any(not 1 <= n <= MAX_NUMBER for n in list(include) + list(exclude)):
+        raise ValueError("Numbers must be between 1 and 45")
+    if exclude & set(include):
+        raise ValueError(f"Numbers both required and excluded: {sorted(exclude & set(include))}")
+    pool = np.array([n for n in range(1, MAX_NUMBER + 1) if n not in exclude and n not in include], dtype=np.int64)
+    k = NUMBERS_PER_TICKET - len(include)
+    if k < 0 or len(pool) < k:
+        raise ValueError(f"Cannot build 6 numbers from {len(include)} required and {len(pool)} allowed")
+    if count <= 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    blocked = past_masks(past)
+    batch_size = batch_size or max(4 * count, 1024)
+    accepted = np.zeros(count, dtype=np.uint64)
+    games = []
+
+    for _ in range(MAX_ROUNDS):
+        # random k-subset of the pool per row, then the required numbers
+        picks = pool[np.argpartition(rng.random((batch_size, len(pool))), k - 1, axis=1)[:, :k]] if k else \
+            np.empty((batch_size, 0), dtype=np.int64)
+        numbers = np.sort(np.hstack([picks, np.tile(np.array(include, dtype=np.int64), (batch_size, 1))]), axis=1)
+
+        keep = np.ones(batch_size, dtype=bool)
+        if sum_range:
+            total = numbers.sum(axis=1)
+            keep &= (total >= sum_range[0]) & (total <= sum_range[1])
+        if odd:
+            odd_count = (numbers % 2).sum(axis=1)
+            keep &= (odd_count >= odd[0]) & (odd_count <= odd[1])
+        masks = ticket_masks(numbers)
+        if len(blocked):
+            keep &= ~np.isin(masks, blocked)
+        if games:
+            keep &= ~np.isin(masks, accepted[:len(games)])
+
+        # first occurrence of each mask, in sampling order
+        index = np.flatnonzero(keep)
+        index = index[first_unique(masks[index])]
+        if not min_distance:
+            index = index[:count - len(games)]
+            accepted[len(games):len(games) + len(index)] = masks[index]
+            games.extend(numbers[index].tolist())
+        else:
+            for i in index:
+                if games and popcount(accepted[:len(games)] ^ masks[i]).min() < min_distance:
+                    continue
+                accepted[len(games)] = masks[i]
+                games.append(numbers[i].tolist())
+                if len(games) == count:
+                    break
+        if len(games) == count:
+            return games
+    raise ValueError(f"Only {len(games)} of {count} game(s) satisfy the rules; relax the constraints")
+
+
+def generate_from_rules(count: int, rules: dict, seed=None, avoid: list = None) -> list:
+    """
+    generate() with a rules dict (GENERATOR_RULES format).
+    avoid: extra combinations to skip (e.g. manual games already chosen).
+    """
+    past = list(avoid or [])
+    if rules.get("past_file"):
+        past += load_tickets(rules["past_file"])["tickets"]
+    if rules.get("avoid_winners"):
+        from draw_history import load_history
+        past += load_history("645")["numbers"].tolist()
+    return generate(
+        count,
+        exclude=rules.get("exclude", ()),
+        include=rules.get("include", ()),
+        sum_range=rules.get("sum"),
+        odd=rules.get("odd"),
+        min_distance=int(rules.get("min_distance", 0)),
+        past=past or None,
+        seed=seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate constrained 6/45 manual games")
+    parser.add_argument("-n", "--count", type=int, default=5)
+    parser.add_argument("--exclude", type=_parse_numbers, default=[], help="e.g. 1,13,44")
+    parser.add_argument("--include", type=_parse_numbers, default=[], help="e.g. 7")
+    parser.add_argument("--sum", type=_parse_range, help="sum range, e.g. 100-170")
+    parser.add_argument("--odd", type=_parse_range, help="odd count range, e.g. 2-4")
+    parser.add_argument("--min-distance", type=int, default=0, help="minimum popcount(a ^ b) between games")
+    parser.add_argument("--past-file", help="CSV/JSONL of past winning combinations to avoid")
+    parser.add_argument("--avoid-winners", action="store_true", help="skip stored winning combinations (draw_history)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", action="store_true", help="print as MANUAL_NUMBERS JSON")
+    args = parser.parse_args()
+
+    rules = {"exclude": args.exclude, "include": args.include, "sum": args.sum, "odd": args.odd,
+             "min_distance": args.min_distance, "past_file": args.past_file, "avoid_winners": args.avoid_winners}
+    start = time.perf_counter()
+    try:
+        games = generate_from_rules(args.count, rules, args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(games))
+    else:
+        for game in games:
+            print(" ".join(f"{n:2d}" for n in game))
+        print(f"{len(games)} game(s) in {elapsed * 1000:.1f} ms")
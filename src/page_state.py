@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import re
+import time
+
+from playwright.sync_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+# Page state detector.
+# All login/logout/error signals are evaluated together in one polled
+# wait_for_function, so whichever appears first decides and an ambiguous
+# page costs one timeout instead of one per signal. The login POST response
+# is raced alongside through a response listener.
+
+LOGGED_IN = "logged_in"
+LOGGED_OUT = "logged_out"
+INVALID_CREDENTIALS = "invalid_credentials"
+ERROR_PAGE = "error_page"
+LOGIN_FAILED = "login_failed"        # login POST answered with an HTTP error
+READY = "ready"                      # ready_selector is visible
+UNKNOWN = "unknown"                  # nothing resolved before the timeout
+
+LOGOUT_SELECTOR = "#logoutBtn, .btn_logout, .btn-logout"
+LOGIN_SELECTOR = "#btnLogin, .btn_login, .btn-login"
+INVALID_CREDENTIALS_TEXT = "아이디 또는 비밀번호가 일치하지 않습니다"
+ERROR_TEXTS = ["일시적인 오류가 발생했습니다"]
+LOGIN_POST_PATTERN = re.compile(r"/login|[?&]method=login|LoginCheck", re.I)
+
+POLL_MS = 50
+# with a response listener the page wait is sliced so the response is seen promptly
+RESPONSE_SLICE_MS = 200
+
+# Signals in priority order; only computed for accepted states
+STATE_JS = """
+({accept, logout, login, invalidText, errorTexts, ready}) => {
+    const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length) &&
+        getComputedStyle(el).visibility !== 'hidden';
+    const any = selector => Array.from(document.querySelectorAll(selector)).some(visible);
+    const labelled = text => Array.from(document.querySelectorAll('a, button'))
+        .some(el => (el.innerText || '').trim() === text && visible(el));
+    const bodyText = () => document.body ? document.body.innerText : '';
+    const url = location.href;
+    const signals = [
+        ['error_page', () => /errorPage/i.test(url) || errorTexts.some(t => bodyText().includes(t))],
+        ['invalid_credentials', () => bodyText().includes(invalidText)],
+        ['ready', () => !!ready && any(ready)],
+        ['logged_in', () => any(logout) || labelled('로그아웃') || /\\/mypage/.test(location.pathname)],
+        ['logged_out', () => any(login) || labelled('로그인') || /\\/login|method=login/.test(url)],
+    ];
+    for (const [state, check] of signals) {
+        if (accept.includes(state) && check()) return state;
+    }
+    return null;
+}
+"""
+
+
+def _login_response_state(response) -> str:
+    """State implied by the login POST response, or None while undecided."""
+    if response.status >= 400:
+        return LOGIN_FAILED
+    if 300 <= response.status < 400:
+        location = response.headers.get("location", "")
+        if location and not LOGIN_POST_PATTERN.search(location):
+            return LOGGED_IN
+    return None
+
+
+def _state_arg(accept, ready_selector: str = None) -> dict:
+    return {"accept": list(accept), "logout": LOGOUT_SELECTOR, "login": LOGIN_SELECTOR,
+            "invalidText": INVALID_CREDENTIALS_TEXT, "errorTexts": ERROR_TEXTS, "ready": ready_selector}
+
+
+def _response_listener(accept, outcome: dict):
+    """Response handler recording the state implied by the login POST into outcome."""
+    def on_response(response):
+        if response.request.method == "POST" and LOGIN_POST_PATTERN.search(response.url):
+            state = _login_response_state(response)
+            if state in accept:
+                outcome.setdefault("state", state)
+    return on_response
+
+
+def _next_wait(outcome: dict, deadline: float, login_response: bool):
+    """(state, wait_ms): a decided state, or how long the next page wait may take."""
+    if "state" in outcome:
+        return outcome["state"], 0
+    remaining = int((deadline - time.monotonic()) * 1000)
+    if remaining <= 0:
+        return UNKNOWN, 0
+    return None, min(remaining, RESPONSE_SLICE_MS) if login_response else remaining
+
+
+def detect_state(page, accept=(LOGGED_IN, LOGGED_OUT, ERROR_PAGE), timeout: int = 2000, action=None,
+                 ready_selector: str = None, login_response: bool = False) -> str:
+    """
+    Waits until one of the accepted states is visible and returns it
+    (UNKNOWN on timeout). Navigations during the wait are followed.
+
+    Args:
+        accept: states that end the wait (LOGGED_IN, LOGGED_OUT, INVALID_CREDENTIALS,
+                ERROR_PAGE, READY, LOGIN_FAILED)
+        action: callable run after the response listener is attached (e.g. the login click)
+        ready_selector: selector for the READY state (e.g. the balance element)
+        login_response: also race the login POST response
+    """
+    outcome = {}
+    on_response = _response_listener(accept, outcome)
+    arg = _state_arg(accept, ready_selector)
+    if login_response:
+        page.on("response", on_response)
+    try:
+        if action:
+            action()
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            state, wait_ms = _next_wait(outcome, deadline, login_response)
+            if state:
+                return state
+            try:
+                return page.wait_for_function(STATE_JS, arg=arg, polling=POLL_MS, timeout=wait_ms).json_value()
+            except PlaywrightTimeoutError:
+                continue
+            except PlaywrightError:
+                if page.is_closed():
+                    return UNKNOWN
+                # execution context destroyed by a navigation: wait for the new document
+                try:
+                    page.wait_for_load_state("domcontentloaded", timeout=wait_ms)
+                except PlaywrightError:
+                    pass
+    finally:
+        if login_response:
+            page.remove_listener("response", on_response)
+
+
+async def detect_state_async(page, accept=(LOGGED_IN, LOGGED_OUT, ERROR_PAGE), timeout: int = 2000, action=None,
+                             ready_selector: str = None, login_response: bool = False) -> str:
+    """detect_state for playwright.async_api pages (action is a coroutine function)."""
+    outcome = {}
+    on_response = _response_listener(accept, outcome)
+    arg = _state_arg(accept, ready_selector)
+    if login_response:
+        page.on("response", on_response)
+    try:
+        if action:
+            await action()
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            state, wait_ms = _next_wait(outcome, deadline, login_response)
+            if state:
+                return state
+            try:
+                handle = await page.wait_for_function(STATE_JS, arg=arg, polling=POLL_MS, timeout=wait_ms)
+                return await handle.json_value()
+            except PlaywrightTimeoutError:
+                continue
+            except PlaywrightError:
+                if page.is_closed():
+                    return UNKNOWN
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=wait_ms)
+                except PlaywrightError:
+                    pass
+    finally:
+        if login_response:
+            page.remove_listener("response", on_response)
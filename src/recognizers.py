@@ -0,0 +1,397 @@
+import os
+import time
+from abc import ABC, abstractmethod
+
+# Keypad digit recognizers behind one interface:
+#   recognize(images) -> [(digit or None, confidence 0..1), ...]
+# Engines: "tesseract" (external binary), "template" (in-process NumPy
+# correlation), "auto" (template first, tesseract for low-confidence crops).
+
+OCR_CONFIGS = [
+    r'--oem 3 --psm 10 -c tessedit_char_whitelist=0123456789',
+    r'--oem 3 --psm 8 -c tessedit_char_whitelist=0123456789',
+]
+TEMPLATE_SIZE = 16                # matches glyph_cache.GLYPH_SIZE so learned glyphs are templates
+TEMPLATE_FONT_SIZES = (24, 32, 40)
+TEMPLATE_FONTS = ["DejaVuSans-Bold.ttf", "DejaVuSans.ttf", "Arial Bold.ttf", "Arial.ttf"]
+GLYPH_MARGIN = 0.1                # fraction of the crop trimmed on each side (button outline)
+SCORE_FLOOR = 0.42                # best template correlation below this: not a digit (전체삭제/백스페이스)
+CONSISTENT_CONFIDENCE = 0.9       # every digit claimed by exactly one button: keypad is self-consistent
+
+
+def preprocess_button(button_img):
+    """전처리: 흑백 변환 및 대비 향상 후 이진화 (버튼당 1회)"""
+    from PIL import ImageEnhance
+
+    gray = button_img.convert('L')
+    enhanced = ImageEnhance.Contrast(gray).enhance(2.0)
+    return enhanced.point(lambda p: p > 128 and 255)
+
+
+class RecognitionError(RuntimeError):
+    """Raised when buttons cannot be decided reliably and no fallback engine is available."""
+
+
+class Recognizer(ABC):
+    name = "base"
+
+    @abstractmethod
+    def recognize(self, images: list) -> list:
+        """Returns [(digit or None, confidence)] for each preprocessed button image."""
+
+    def iter_recognize(self, images: list):
+        """
+        Yields (index, digit or None, confidence) as soon as each crop is decided,
+        most confident first. Closing the generator early cancels pending work.
+        """
+        results = self.recognize(images)
+        for i in sorted(range(len(results)), key=lambda i: results[i][1], reverse=True):
+            yield (i,) + tuple(results[i])
+
+
+# --- tesseract -------------------------------------------------------------
+
+def configure_tesseract():
+    """TESSERACT_PATH 또는 일반적인 설치 경로에서 tesseract 실행 파일을 설정합니다."""
+    import pytesseract
+
+    tesseract_cmd = os.environ.get('TESSERACT_PATH')
+    if not tesseract_cmd:
+        common_paths = ["/usr/local/bin/tesseract", "/opt/homebrew/bin/tesseract", "/usr/bin/tesseract"]
+        for path in common_paths:
+            if os.path.exists(path):
+                tesseract_cmd = path
+                break
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    return tesseract_cmd
+
+
+def _ocr_digit(image, config: str, timeout: float):
+    """단일 버튼 이미지를 OCR하여 한 자리 숫자 또는 None 반환"""
+    import pytesseract
+
+    result = pytesseract.image_to_string(image, config=config, timeout=max(timeout, 0.1)).strip()
+    if result.isdigit() and len(result) == 1:
+        return result
+    return None
+
+
+def iter_ocr(images: list, workers: int = 4, deadline: float = 8.0):
+    """
+    전처리된 버튼 이미지들을 워커 풀에서 병렬로 OCR하고, 완료되는 순서대로
+    (index, 숫자 또는 None)을 내보냅니다.
+    첫 번째 설정으로 전체를 처리한 뒤, 실패한 버튼만 다음 설정으로 재시도합니다.
+    deadline(초)이 지나거나 제너레이터가 닫히면 남은 작업을 취소합니다.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
+
+    failed = list(range(len(images)))
+    deadline_at = time.monotonic() + deadline
+    # tesseract는 외부 프로세스이므로 스레드 풀로 충분
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for n, config in enumerate(OCR_CONFIGS):
+            last_pass = n == len(OCR_CONFIGS) - 1
+            pending, failed = failed, []
+            remaining = deadline_at - time.monotonic()
+            if not pending or remaining <= 0:
+                failed = pending
+                break
+            futures = {pool.submit(_ocr_digit, images[i], config, remaining): i for i in pending}
+            try:
+                for future in as_completed(futures, timeout=remaining):
+                    i = futures[future]
+                    try:
+                        digit = future.result()
+                    except Exception as e:
+                        print(f"OCR error on button {i}: {e}")
+                        digit = None
+                    if digit:
+                        yield i, digit
+                    elif last_pass:
+                        yield i, None
+                    else:
+                        failed.append(i)
+            except FutureTimeout:
+                print(f"OCR deadline ({deadline}s) reached")
+                failed = [i for f, i in futures.items() if not f.done()] + failed
+                break
+        for i in failed:
+            yield i, None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def recognize_buttons(images: list, workers: int = 4, deadline: float = 8.0) -> list:
+    """
+    전처리된 버튼 이미지들을 병렬 OCR합니다 (iter_ocr 참고).
+
+    Returns:
+        list: 각 이미지에 대한 숫자(str) 또는 None
+    """
+    results = [None] * len(images)
+    for i, digit in iter_ocr(images, workers, deadline):
+        results[i] = digit
+    return results
+
+
+class TesseractRecognizer(Recognizer):
+    name = "tesseract"
+
+    def __init__(self, workers: int = 4, deadline: float = 8.0):
+        self.workers = workers
+        self.deadline = deadline
+        configure_tesseract()
+
+    def recognize(self, images: list) -> list:
+        digits = recognize_buttons(images, self.workers, self.deadline)
+        return [(d, 1.0 if d else 0.0) for d in digits]
+
+    def iter_recognize(self, images: list):
+        for i, digit in iter_ocr(images, self.workers, self.deadline):
+            yield i, digit, 1.0 if digit else 0.0
+
+
+# --- NumPy template matching -----------------------------------------------
+
+def glyph_image(image):
+    """
+    Binarized crop -> TEMPLATE_SIZE x TEMPLATE_SIZE 'L' image of the ink (255 = ink),
+    None for a blank crop. Ink is the minority colour; the crop is cut to the
+    ink's bounding box so position and scale inside the button do not matter.
+    Shared by normalize_glyph and glyph_cache.glyph_key so cache keys and
+    templates see the same pixels.
+    """
+    import numpy as np
+    from PIL import Image, ImageFilter
+
+    # Drop the button outline and isolated noise specks first
+    w, h = image.size
+    mx, my = round(w * GLYPH_MARGIN), round(h * GLYPH_MARGIN)
+    image = image.convert('L').crop((mx, my, w - mx, h - my)).filter(ImageFilter.MedianFilter(3))
+
+    arr = np.asarray(image, dtype=np.float32) / 255.0
+    ink = arr < 0.5
+    if ink.mean() > 0.5:
+        ink = ~ink
+    # Bounding box from rows/columns that carry real ink, not stray pixels
+    rows = np.nonzero(ink.sum(axis=1) > max(1, ink.shape[1] * 0.03))[0]
+    cols = np.nonzero(ink.sum(axis=0) > max(1, ink.shape[0] * 0.03))[0]
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    ink = ink[rows.min():rows.max() + 1, cols.min():cols.max() + 1]
+    return Image.fromarray((ink * 255).astype(np.uint8)).resize((TEMPLATE_SIZE, TEMPLATE_SIZE), Image.BILINEAR)
+
+
+def normalize_glyph(image):
+    """Binarized crop -> zero-mean, unit-norm TEMPLATE_SIZE^2 vector (see glyph_image)."""
+    import numpy as np
+
+    small = glyph_image(image)
+    if small is None:
+        return None
+    vec = np.asarray(small, dtype=np.float32).ravel()
+    vec -= vec.mean()
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else None
+
+
+def _bits_to_vector(bits: int):
+    import numpy as np
+
+    n = TEMPLATE_SIZE * TEMPLATE_SIZE
+    vec = np.array([(bits >> (n - 1 - i)) & 1 for i in range(n)], dtype=np.float32) * 255.0
+    vec -= vec.mean()
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else None
+
+
+def _load_font(size: int):
+    from PIL import ImageFont
+
+    for name in TEMPLATE_FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has no scalable default font
+        return ImageFont.load_default()
+
+
+def render_digit_templates() -> list:
+    """Font-rendered bootstrap templates: [(digit, vector)]."""
+    from PIL import Image, ImageDraw
+
+    templates = []
+    for size in TEMPLATE_FONT_SIZES:
+        font = _load_font(size)
+        for digit in "0123456789":
+            canvas = Image.new('L', (size * 2, size * 2), 255)
+            ImageDraw.Draw(canvas).text((size // 2, size // 4), digit, fill=0, font=font)
+            vec = normalize_glyph(canvas)
+            if vec is not None:
+                templates.append((digit, vec))
+    return templates
+
+
+class TemplateRecognizer(Recognizer):
+    """
+    Classifies crops by normalized cross-correlation against digit templates:
+    glyphs learned by glyph_cache (exact site artwork) plus font-rendered
+    bootstrap templates. confidence is the best correlation, reduced when the
+    runner-up digit is nearly as close.
+
+    Crops scoring below SCORE_FLOOR are rejected as non-digits, and a digit
+    claimed by several crops goes to the best-scoring one (the others become
+    unknown). When every digit ends up claimed by exactly one crop the set is
+    self-consistent: digits are raised to CONSISTENT_CONFIDENCE and rejected
+    crops are confident non-digits. Otherwise rejected crops stay unknown
+    (confidence 0), since an unclaimed digit may be among them.
+    """
+    name = "template"
+
+    def __init__(self, templates: list = None, include_cache: bool = True):
+        import numpy as np
+
+        templates = list(templates) if templates is not None else render_digit_templates()
+        if include_cache:
+            from glyph_cache import GlyphCache
+
+            for entry in GlyphCache.load().entries:
+                vec = _bits_to_vector(entry["bits"])
+                if vec is not None:
+                    templates.append((entry["digit"], vec))
+        self.labels = [digit for digit, _ in templates]
+        self.matrix = np.stack([vec for _, vec in templates]) if templates else np.zeros((0, TEMPLATE_SIZE ** 2))
+
+    def recognize(self, images: list) -> list:
+        import numpy as np
+
+        vectors = [normalize_glyph(img) for img in images]
+        valid = [i for i, v in enumerate(vectors) if v is not None]
+        results = [(None, 0.0)] * len(images)
+        if not valid or not len(self.labels):
+            return results
+
+        scores = np.stack([vectors[i] for i in valid]) @ self.matrix.T   # (crops, templates)
+        labels = np.array(self.labels)
+        picks = {}
+        for row, i in zip(scores, valid):
+            best_by_label = {}
+            for label in set(self.labels):
+                best_by_label[label] = float(row[labels == label].max())
+            ranked = sorted(best_by_label.items(), key=lambda kv: kv[1], reverse=True)
+            label, best = ranked[0]
+            if best < SCORE_FLOOR:
+                continue
+            runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+            confidence = max(0.0, min(best, 1.0) - max(0.0, 0.1 - (best - runner_up)))
+            picks[i] = (label, best, confidence)
+
+        # One button per digit
+        claims = {}
+        for i in sorted(picks, key=lambda i: picks[i][1], reverse=True):
+            claims.setdefault(picks[i][0], []).append(i)
+        consistent = set(claims) == set(self.labels) and all(len(c) == 1 for c in claims.values())
+        for label, (i, *others) in claims.items():
+            confidence = picks[i][2]
+            results[i] = (label, max(confidence, CONSISTENT_CONFIDENCE) if consistent else confidence)
+        if consistent:
+            results = [(None, 1.0) if i not in picks else r for i, r in enumerate(results)]
+        return results
+
+
+class FallbackRecognizer(Recognizer):
+    """
+    Runs primary, then sends crops below min_confidence to fallback.
+    Without a fallback, low-confidence crops raise RecognitionError instead of
+    being dropped, so a partial keypad is never mistaken for a readable one.
+    iter_recognize only raises once the confident crops have been yielded.
+    """
+    name = "auto"
+
+    def __init__(self, primary: Recognizer, fallback: Recognizer = None, min_confidence: float = 0.8):
+        self.primary = primary
+        self.fallback = fallback
+        self.min_confidence = min_confidence
+
+    def _no_fallback(self, low: list):
+        return RecognitionError(
+            f"{self.primary.name}: {len(low)} low-confidence button(s) and no fallback OCR engine. "
+            "Install tesseract (or set TESSERACT_PATH), or set OCR_ENGINE=template to accept template guesses"
+        )
+
+    def recognize(self, images: list) -> list:
+        results = self.primary.recognize(images)
+        low = [i for i, (digit, conf) in enumerate(results) if conf < self.min_confidence]
+        if low and not self.fallback:
+            raise self._no_fallback(low)
+        if low:
+            print(f"{self.primary.name}: {len(low)} low-confidence button(s), falling back to {self.fallback.name}")
+        unresolved = set(low)
+        if low:
+            for i, result in zip(low, self.fallback.recognize([images[i] for i in low])):
+                if result[0]:
+                    results[i] = result
+                    unresolved.discard(i)
+        # A wrong PIN digit is worse than an unknown one: drop unconfirmed guesses
+        for i in unresolved:
+            results[i] = (None, results[i][1])
+        return results
+
+    def iter_recognize(self, images: list):
+        results = self.primary.recognize(images)
+        low = [i for i, (digit, conf) in enumerate(results) if conf < self.min_confidence]
+        confident = [i for i in range(len(results)) if i not in low]
+        for i in sorted(confident, key=lambda i: results[i][1], reverse=True):
+            yield (i,) + tuple(results[i])
+        if low and not self.fallback:
+            raise self._no_fallback(low)
+        if low:
+            print(f"{self.primary.name}: {len(low)} low-confidence button(s), falling back to {self.fallback.name}")
+            unresolved = set(low)
+            for j, digit, conf in self.fallback.iter_recognize([images[i] for i in low]):
+                if digit:
+                    unresolved.discard(low[j])
+                    yield low[j], digit, conf
+            low = [i for i in low if i in unresolved]
+        # A wrong PIN digit is worse than an unknown one: drop unconfirmed guesses
+        for i in low:
+            yield i, None, results[i][1]
+
+
+def get_recognizer(engine: str = None) -> Recognizer:
+    """
+    OCR_ENGINE (tesseract | template | auto) 설정에 따라 인식기를 생성합니다.
+    auto: NumPy 템플릿 우선, 신뢰도 낮은 버튼만 tesseract
+          (tesseract가 없으면 신뢰도 낮은 버튼에서 RecognitionError)
+    """
+    engine = (engine or os.environ.get('OCR_ENGINE', 'auto')).lower()
+    workers = int(os.environ.get('OCR_WORKERS', '4'))
+    deadline = float(os.environ.get('OCR_DEADLINE', '8'))
+    min_confidence = float(os.environ.get('OCR_MIN_CONFIDENCE', '0.8'))
+
+    if engine == "tesseract":
+        return TesseractRecognizer(workers, deadline)
+    if engine == "template":
+        return TemplateRecognizer()
+    if engine != "auto":
+        raise ValueError(f"Unknown OCR_ENGINE: {engine}")
+
+    try:
+        primary = TemplateRecognizer()
+    except ImportError:
+        print("numpy not available. Using tesseract only.")
+        return TesseractRecognizer(workers, deadline)
+    fallback = TesseractRecognizer(workers, deadline) if configure_tesseract() or _tesseract_on_path() else None
+    return FallbackRecognizer(primary, fallback, min_confidence)
+
+
+def _tesseract_on_path() -> bool:
+    import shutil
+
+    return shutil.which("tesseract") is not None
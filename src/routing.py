@@ -0,0 +1,197 @@
+import re
+from collections import Counter
+from os import environ
+
+# Analytics / ad hosts seen on the mobile site; never needed by any flow
+TRACKER_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"facebook\.(net|com)/.*(tr|fbevents)",
+    r"wcs\.naver\.(net|com)",
+    r"wcslog",
+    r"criteo\.(com|net)",
+    r"kakao.*pixel",
+    r"hotjar\.com",
+]
+
+# Rough per-request body sizes (bytes) used for the bytes-saved estimate when a
+# blocked type was never loaded with a Content-Length in this run (median-ish
+# mobile transfer sizes; trackers are mostly small scripts/pixels)
+TYPICAL_BYTES = {
+    "image": 12_000,
+    "font": 30_000,
+    "media": 150_000,
+    "script": 15_000,
+    "stylesheet": 8_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+    "other": 2_000,
+}
+
+# Per-flow rules. allow_urls wins over block_types, block_urls always win.
+PROFILES = {
+    # login, balance, 645, 720: DOM only, no pixels needed
+    "default": {
+        "block_types": {"image", "font", "media"},
+        "block_urls": TRACKER_PATTERNS,
+        "allow_urls": [r"nppfs"],
+    },
+    # charge: keypad buttons are images that must be rendered for OCR
+    "keypad": {
+        "block_types": {"font", "media"},
+        "block_urls": TRACKER_PATTERNS,
+        "allow_urls": [r"nppfs"],
+    },
+}
+
+
+class RequestRouter:
+    """
+    Context-wide request filter with a switchable per-flow profile.
+    Blocked requests are aborted before they hit the network; loaded bytes are
+    taken from Content-Length so no extra round-trip is spent per request.
+    Chunked responses have no Content-Length and are only counted in
+    unsized_responses. Bytes saved is an estimate: blocked requests times the
+    average sized load of the same type in this run, else TYPICAL_BYTES.
+    """
+
+    def __init__(self, profile: str = "default"):
+        self.profile = profile
+        self._compiled = {}
+        self.blocked = Counter()
+        self.allowed = 0
+        self.loaded_bytes = 0
+        self.unsized_responses = 0
+        self._sized = Counter()          # resource type -> responses with Content-Length
+        self._sized_bytes = Counter()    # resource type -> their bytes
+
+    def _rules(self):
+        if self.profile not in self._compiled:
+            rules = PROFILES[self.profile]
+            self._compiled[self.profile] = (
+                rules["block_types"],
+                [re.compile(p) for p in rules["block_urls"]],
+                [re.compile(p) for p in rules["allow_urls"]],
+            )
+        return self._compiled[self.profile]
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        block_types, block_urls, allow_urls = self._rules()
+        if any(p.search(url) for p in block_urls):
+            return True
+        if any(p.search(url) for p in allow_urls):
+            return False
+        return resource_type in block_types
+
+    def use(self, profile: str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown routing profile: {profile}")
+        self.profile = profile
+
+    def _handle(self, route):
+        request = route.request
+        try:
+            if self.should_block(request.resource_type, request.url):
+                self.blocked[request.resource_type] += 1
+                route.abort("blockedbyclient")
+            else:
+                self.allowed += 1
+                route.continue_()
+        except Exception:
+            # Page/context already closed
+            pass
+
+    async def _handle_async(self, route):
+        request = route.request
+        try:
+            if self.should_block(request.resource_type, request.url):
+                self.blocked[request.resource_type] += 1
+                await route.abort("blockedbyclient")
+            else:
+                self.allowed += 1
+                await route.continue_()
+        except Exception:
+            # Page/context already closed
+            pass
+
+    def _on_response(self, response):
+        try:
+            size = int(response.headers["content-length"])
+        except (KeyError, ValueError):
+            self.unsized_responses += 1
+            return
+        self.loaded_bytes += size
+        try:
+            resource_type = response.request.resource_type
+        except Exception:
+            return
+        self._sized[resource_type] += 1
+        self._sized_bytes[resource_type] += size
+
+    def estimated_saved_bytes(self) -> int:
+        saved = 0
+        for resource_type, count in self.blocked.items():
+            if self._sized[resource_type]:
+                average = self._sized_bytes[resource_type] / self._sized[resource_type]
+            else:
+                average = TYPICAL_BYTES.get(resource_type, TYPICAL_BYTES["other"])
+            saved += count * average
+        return int(saved)
+
+    def summary(self) -> dict:
+        return {
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "allowed_requests": self.allowed,
+            "loaded_bytes": self.loaded_bytes,
+            "unsized_responses": self.unsized_responses,
+            "estimated_saved_bytes": self.estimated_saved_bytes(),
+        }
+
+    def report(self):
+        s = self.summary()
+        by_type = ", ".join(f"{k}={v}" for k, v in sorted(s["blocked_by_type"].items())) or "none"
+        print(f"Routing: blocked {s['blocked_requests']} request(s) ({by_type}), "
+              f"allowed {s['allowed_requests']}, loaded {s['loaded_bytes']:,} bytes "
+              f"(+{s['unsized_responses']} without Content-Length), "
+              f"saved ~{s['estimated_saved_bytes']:,} bytes (est.)")
+
+
+def _attach_router(context, profile: str):
+    if environ.get('BLOCK_RESOURCES', 'true').lower() != 'true':
+        return None, False
+    router = getattr(context, "_request_router", None)
+    if router is not None:
+        return router, False
+    router = RequestRouter(profile)
+    context.on("response", router._on_response)
+    context.on("close", lambda _: router.report())
+    setattr(context, "_request_router", router)
+    return router, True
+
+
+def install_router(context, profile: str = "default"):
+    """
+    Installs a RequestRouter on the context (once) and prints its summary when
+    the context closes. Returns None when BLOCK_RESOURCES=false.
+    """
+    router, created = _attach_router(context, profile)
+    if created:
+        context.route("**/*", router._handle)
+    return router
+
+
+async def install_router_async(context, profile: str = "default"):
+    """install_router for playwright.async_api contexts."""
+    router, created = _attach_router(context, profile)
+    if created:
+        await context.route("**/*", router._handle_async)
+    return router
+
+
+def use_profile(page, profile: str):
+    """Switches the routing profile for the page's context, if routing is installed."""
+    router = getattr(page.context, "_request_router", None)
+    if router is not None:
+        router.use(profile)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from os import environ
+from pathlib import Path
+
+# Session file manager around SESSION_PATH (Playwright storage state).
+# Writes are atomic (tmp + fsync + rename) so readers never see a torn file,
+# logins are serialized with an flock so concurrent scripts log in once, and
+# a metadata file tracks when the cookies were last verified and when they
+# expire. session_status() answers "is the session fresh" without a browser.
+# Settings are read lazily because .env is loaded by login.py.
+
+SESSION_PATH = "/tmp/dhlotto_session.json"
+SESSION_META_PATH = str(Path(SESSION_PATH).with_suffix(".meta.json"))
+SESSION_LOCK_PATH = f"{SESSION_PATH}.lock"
+SESSION_LOCK_TIMEOUT = 120  # seconds; a login takes well under this
+
+
+def _seconds(name: str, default: str) -> int:
+    return int(environ.get(name, default))
+
+
+def session_cookies(cookies: list) -> list:
+    return [c for c in cookies if c.get("domain", "").lstrip(".").endswith("dhlottery.co.kr")]
+
+
+def session_fingerprint(cookies: list) -> str:
+    """Stable hash of the dhlottery cookies, used to tie metadata to one session."""
+    pairs = sorted(f"{c['name']}={c['value']}" for c in session_cookies(cookies))
+    return hashlib.sha256("\n".join(pairs).encode()).hexdigest() if pairs else ""
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def session_lock(timeout: float = SESSION_LOCK_TIMEOUT):
+    """
+    Exclusive cross-process lock for refreshing the session.
+    Not re-entrant: do not nest (flock blocks on a second descriptor).
+    """
+    fd = os.open(SESSION_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+    deadline = time.time() + timeout
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.time() > deadline:
+                    raise TimeoutError(f"Session lock busy for {timeout}s ({SESSION_LOCK_PATH})")
+                time.sleep(0.2)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def load_state(path=SESSION_PATH):
+    """Returns the stored storage state dict, or None."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_meta(path=SESSION_META_PATH) -> dict:
+    """Loads session validity metadata (last verified time, cookie expiry)."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(cookies: list, path=SESSION_META_PATH):
+    """
+    Records that these cookies were just verified.
+    cookie_expires is the earliest expiry among persistent dhlottery cookies
+    (session cookies without expiry are ignored).
+    """
+    expiries = [c["expires"] for c in session_cookies(cookies) if c.get("expires", -1) > 0]
+    meta = {
+        "verified_at": time.time(),
+        "cookie_expires": min(expiries) if expiries else None,
+        "fingerprint": session_fingerprint(cookies),
+    }
+    try:
+        _write_json_atomic(path, meta)
+    except OSError as e:
+        print(f"Could not write session metadata: {e}")
+
+
+def save_state(state: dict, path=SESSION_PATH, meta_path=SESSION_META_PATH):
+    """Atomically stores a storage state and marks its cookies as verified."""
+    _write_json_atomic(path, state)
+    write_meta(state.get("cookies", []), meta_path)
+
+
+def session_status(cookies: list = None, meta: dict = None, now: float = None) -> dict:
+    """
+    Classifies a session without any network access.
+
+    Returns:
+        {'state', 'reason', 'expires_at', 'verified_age'} where state is
+        'fresh'   - verified within SESSION_FRESH_SECONDS, use as-is
+        'verify'  - probably valid, check it once (probe/page)
+        'refresh' - expired or expiring within SESSION_REFRESH_MARGIN, log in again
+        'missing' - no dhlottery cookies at all
+    """
+    if cookies is None:
+        cookies = (load_state() or {}).get("cookies", [])
+    meta = load_meta() if meta is None else meta
+    now = now or time.time()
+    fresh_seconds = _seconds('SESSION_FRESH_SECONDS', '600')
+    margin = _seconds('SESSION_REFRESH_MARGIN', '3600')
+    idle_seconds = _seconds('SESSION_IDLE_SECONDS', '0')
+
+    status = {"state": "verify", "reason": "not verified recently", "expires_at": None, "verified_age": None}
+    if not session_cookies(cookies):
+        return dict(status, state="missing", reason="no session cookies")
+
+    ours = meta.get("fingerprint") == session_fingerprint(cookies)
+    expiries = [c["expires"] for c in session_cookies(cookies) if c.get("expires", -1) > 0]
+    expires_at = min(expiries) if expiries else None
+    if ours and meta.get("verified_at"):
+        status["verified_age"] = now - meta["verified_at"]
+        if idle_seconds:
+            idle_expiry = meta["verified_at"] + idle_seconds
+            expires_at = min(expires_at, idle_expiry) if expires_at else idle_expiry
+    status["expires_at"] = expires_at
+
+    if expires_at is not None and expires_at <= now:
+        return dict(status, state="refresh", reason="expired")
+    if expires_at is not None and expires_at - now < margin:
+        return dict(status, state="refresh", reason=f"expires in {int(expires_at - now)}s")
+    if status["verified_age"] is not None and status["verified_age"] < fresh_seconds:
+        return dict(status, state="fresh", reason=f"verified {int(status['verified_age'])}s ago")
+    return status
+
+
+if __name__ == "__main__":
+    # Fast freshness check for shell scripts: no browser, no network.
+    #   session.py check   -> exit 0 if fresh, 1 otherwise
+    #   session.py status  -> JSON
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    status = session_status()
+    if command == "status":
+        print(json.dumps(status, indent=2))
+    else:
+        print(f"Session {status['state']}: {status['reason']}")
+    sys.exit(0 if status["state"] == "fresh" else 1)
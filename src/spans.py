@@ -0,0 +1,204 @@
+import atexit
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from script_reporter import ScriptReporter
+
+# Timed stages for ScriptReporter.
+# Every sr.stage() opens a span that is closed by the next stage or by
+# success()/fail(). Waits (waits.py) and keypad OCR (charge.py) attach
+# sub-spans to the stage that is open at the time. On finish the spans are
+# appended to a JSON lines file and the last run is written as a Prometheus
+# textfile-collector file (one file per script).
+
+METRICS_DIR = os.environ.get('METRICS_DIR', "/tmp/dhlotto_metrics")
+
+_active = None  # TimedReporter of the running script
+
+
+def _slug(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_") or "script"
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class TimedReporter(ScriptReporter):
+    """ScriptReporter that records each stage as a timed span with sub-spans."""
+
+    def __init__(self, title="Task", adapters=None, metrics_dir: str = None):
+        global _active
+        super().__init__(title, adapters)
+        self.run_id = uuid.uuid4().hex[:12]
+        self.script = _slug(title)
+        self.metrics_dir = METRICS_DIR if metrics_dir is None else metrics_dir
+        self.spans = []
+        self._open = None
+        self._start = time.perf_counter()
+        self._finished = False
+        _active = self
+        atexit.register(self._finish, "aborted")
+
+    def _close_stage(self, outcome: str):
+        if self._open is None:
+            return
+        span = self._open
+        span["end"] = time.time()
+        span["duration"] = round(time.perf_counter() - span.pop("_t0"), 6)
+        span["outcome"] = outcome
+        self.spans.append(span)
+        self._open = None
+
+    def stage(self, stage_name):
+        self._close_stage("ok")
+        super().stage(stage_name)
+        self._open = {
+            "kind": "stage", "name": stage_name, "parent": None,
+            "start": time.time(), "_t0": time.perf_counter(),
+        }
+
+    def add_span(self, kind: str, name: str, duration: float, ok: bool = True, **attrs):
+        """Records a finished sub-span under the stage that is currently open."""
+        end = time.time()
+        self.spans.append({
+            "kind": kind, "name": name, "parent": self.current_stage,
+            "start": end - duration, "end": end, "duration": round(duration, 6),
+            "outcome": "ok" if ok else "fail", **attrs,
+        })
+
+    def success(self, detail=None):
+        self._finish("ok")
+        super().success(detail)
+
+    def fail(self, error_trace):
+        self._finish("fail")
+        super().fail(error_trace)
+
+    def _finish(self, outcome: str):
+        if self._finished:
+            return
+        self._finished = True
+        self._close_stage(outcome)
+        self.outcome = outcome
+        self.duration = time.perf_counter() - self._start
+        if not self.metrics_dir:
+            return
+        try:
+            Path(self.metrics_dir).mkdir(parents=True, exist_ok=True)
+            self.write_jsonl(Path(self.metrics_dir) / "spans.jsonl")
+            self.write_textfile(Path(self.metrics_dir) / f"lotto_{self.script}.prom")
+        except OSError as e:
+            print(f"Could not write stage metrics: {e}")
+
+    def write_jsonl(self, path):
+        base = {"run_id": self.run_id, "script": self.script, "host": self.host}
+        with open(path, "a") as f:
+            f.write(json.dumps({**base, "kind": "run", "name": self.title, "parent": None,
+                                "start": self.start_time, "end": self.start_time + self.duration,
+                                "duration": round(self.duration, 6), "outcome": self.outcome}) + "\n")
+            for span in self.spans:
+                f.write(json.dumps({**base, **span}, ensure_ascii=False) + "\n")
+
+    def write_textfile(self, path):
+        """Last-run gauges for node_exporter's textfile collector (written atomically)."""
+        script = _label(self.script)
+        stages, stage_ok, subspans = {}, {}, {}
+        for span in self.spans:
+            if span["kind"] == "stage":
+                # 같은 stage가 여러 번 열리면 (GET_BALANCE 등) 합산
+                stages[span["name"]] = stages.get(span["name"], 0.0) + span["duration"]
+                stage_ok[span["name"]] = stage_ok.get(span["name"], True) and span["outcome"] == "ok"
+            else:
+                key = (span["parent"], span["kind"], span["name"])
+                total, count = subspans.get(key, (0.0, 0))
+                subspans[key] = (total + span["duration"], count + 1)
+
+        lines = [
+            "# HELP lotto_run_duration_seconds Duration of the last run.",
+            "# TYPE lotto_run_duration_seconds gauge",
+            f'lotto_run_duration_seconds{{script="{script}"}} {self.duration:.6f}',
+            "# HELP lotto_run_success Whether the last run succeeded.",
+            "# TYPE lotto_run_success gauge",
+            f'lotto_run_success{{script="{script}"}} {int(self.outcome == "ok")}',
+            "# HELP lotto_run_timestamp_seconds Start time of the last run.",
+            "# TYPE lotto_run_timestamp_seconds gauge",
+            f'lotto_run_timestamp_seconds{{script="{script}"}} {self.start_time:.0f}',
+            "# HELP lotto_stage_duration_seconds Duration of each stage in the last run.",
+            "# TYPE lotto_stage_duration_seconds gauge",
+        ]
+        lines += [f'lotto_stage_duration_seconds{{script="{script}",stage="{_label(s)}"}} {d:.6f}'
+                  for s, d in stages.items()]
+        lines += [
+            "# HELP lotto_stage_success Whether every occurrence of the stage completed.",
+            "# TYPE lotto_stage_success gauge",
+        ]
+        lines += [f'lotto_stage_success{{script="{script}",stage="{_label(s)}"}} {int(ok)}'
+                  for s, ok in stage_ok.items()]
+        lines += [
+            "# HELP lotto_span_duration_seconds Total duration of sub-spans (waits, OCR) per stage.",
+            "# TYPE lotto_span_duration_seconds gauge",
+        ]
+        lines += [f'lotto_span_duration_seconds{{script="{script}",stage="{_label(p)}",kind="{k}",name="{_label(n)}"}} {t:.6f}'
+                  for (p, k, n), (t, _c) in subspans.items()]
+        lines += [
+            "# HELP lotto_span_count Number of sub-spans per stage.",
+            "# TYPE lotto_span_count gauge",
+        ]
+        lines += [f'lotto_span_count{{script="{script}",stage="{_label(p)}",kind="{k}",name="{_label(n)}"}} {c}'
+                  for (p, k, n), (_t, c) in subspans.items()]
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def record_span(kind: str, name: str, duration: float, ok: bool = True, **attrs):
+    """Attaches a sub-span to the running TimedReporter (no-op without one)."""
+    if _active is not None and not _active._finished:
+        _active.add_span(kind, name, duration, ok, **attrs)
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """Times the block as a sub-span; set record['ok'] = False to mark it failed."""
+    record = {"ok": True}
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record["ok"] = False
+        raise
+    finally:
+        record_span(kind, name, time.perf_counter() - start, record["ok"], **attrs)
+
+
+def timed_iter(iterable, kind: str, name: str, **attrs):
+    """
+    Re-yields iterable and records one sub-span covering only the time spent
+    producing items, so a streaming consumer's own work is not counted.
+    """
+    iterator = iter(iterable)
+    elapsed, ok = 0.0, True
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    except Exception:
+        ok = False
+        raise
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+        record_span(kind, name, elapsed, ok, **attrs)
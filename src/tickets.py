@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+from pathlib import Path
+
+# Bulk manual 6/45 tickets from a file.
+# Rows are streamed from CSV (6 numbers per row) or JSON lines
+# ([1,2,3,4,5,6], {"numbers": [...]} or a list of such lists per line),
+# validated in NumPy batches (range 1-45, no repeats inside a ticket), deduped
+# across the whole file with a 45-bit mask per ticket, and cut off at the
+# online purchase limit so reading stops as soon as enough tickets are found.
+
+NUMBERS_PER_TICKET = 6
+MAX_NUMBER = 45
+MAX_GAMES_PER_SLIP = 5     # A~E, 구매하기 1회당 최대 게임 수
+MAX_GAMES_PER_DRAW = 5     # 인터넷 구매 한도: 1회차 5,000원
+BATCH_SIZE = 4096
+INT64_MAX = 2 ** 63 - 1    # rows are validated as int64 arrays
+
+REASONS = {
+    1: "expected 6 numbers",
+    2: "not a number",
+    3: "number out of range 1-45",
+    4: "duplicate number in ticket",
+}
+
+
+class TicketFileError(ValueError):
+    """Raised when a ticket file cannot be read or contains invalid rows."""
+
+
+def _cells(value) -> list:
+    return value.get("numbers", []) if isinstance(value, dict) else value
+
+
+def iter_rows(path):
+    """
+    Streams raw rows from a CSV or JSONL file.
+
+    Yields:
+        (line_number, cells) - cells are the unparsed values of one ticket
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    try:
+        with open(path, newline="") as f:
+            if suffix in (".jsonl", ".ndjson", ".json"):
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    try:
+                        value = json.loads(line)
+                    except ValueError as e:
+                        raise TicketFileError(f"{path}:{line_number}: invalid JSON ({e})")
+                    # 한 줄에 여러 게임 ([[...], [...]])도 허용
+                    if isinstance(value, list) and value and all(isinstance(v, (list, dict)) for v in value):
+                        for ticket in value:
+                            yield line_number, _cells(ticket)
+                    else:
+                        yield line_number, _cells(value)
+            else:
+                for line_number, row in enumerate(csv.reader(f), 1):
+                    cells = [c.strip() for c in row if c.strip()]
+                    if not cells or cells[0].startswith("#"):
+                        continue
+                    # Header row (e.g. "n1,n2,...") is skipped
+                    if line_number == 1 and not any(c.lstrip("-").isdigit() for c in cells):
+                        continue
+                    yield line_number, cells
+    except OSError as e:
+        raise TicketFileError(f"Cannot read ticket file {path}: {e}")
+
+
+def _to_int(value) -> int:
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    return int(value)
+
+
+def _parse(cells) -> tuple:
+    """Returns (six ints, reason code); bad rows get zeros and a non-zero reason."""
+    if not isinstance(cells, list) or len(cells) != NUMBERS_PER_TICKET:
+        return [0] * NUMBERS_PER_TICKET, 1
+    try:
+        numbers = [_to_int(c) for c in cells]
+    except (TypeError, ValueError):
+        return [0] * NUMBERS_PER_TICKET, 2
+    except OverflowError:
+        # Infinity in JSON
+        return [0] * NUMBERS_PER_TICKET, 3
+    if any(abs(n) > INT64_MAX for n in numbers):
+        # too large for the int64 batch: out of range like any other bad value
+        return [0] * NUMBERS_PER_TICKET, 3
+    return numbers, 0
+
+
+def _parse_batch(batch: list) -> tuple:
+    """
+    Converts a batch of rows to (n, 6) ints plus reason codes. CSV batches
+    (all strings, all 6 wide) are converted by NumPy in one call; anything
+    else, or a batch with a bad cell, falls back to row by row.
+    """
+    import numpy as np
+
+    rows = [cells for _, cells in batch]
+    if all(isinstance(cells, list) and len(cells) == NUMBERS_PER_TICKET for cells in rows):
+        raw = np.array(rows)
+        if raw.dtype.kind == "U":
+            try:
+                return raw.astype(np.int64), np.zeros(len(rows), dtype=np.int8)
+            except (ValueError, OverflowError):
+                pass
+    parsed = [_parse(cells) for cells in rows]
+    return [p[0] for p in parsed], [p[1] for p in parsed]
+
+
+def ticket_masks(numbers):
+    """
+    Encodes (n, 6) numbers as uint64 bitmasks (bit k set = number k).
+    Hamming distance between two games is popcount(a ^ b).
+    """
+    import numpy as np
+
+    numbers = np.asarray(numbers, dtype=np.int64)
+    bits = np.left_shift(np.uint64(1), np.clip(numbers, 0, 63).astype(np.uint64))
+    return np.bitwise_or.reduce(bits, axis=-1)
+
+
+def popcount(masks):
+    """Number of set bits per uint64 (numpy >= 2 has bitwise_count)."""
+    import numpy as np
+
+    masks = np.asarray(masks, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks)
+    return np.unpackbits(masks.view(np.uint8).reshape(*masks.shape, 8), axis=-1).sum(axis=-1, dtype=np.uint8)
+
+
+def first_unique(keys):
+    """
+    Indices of the first occurrence of each key, in original order.
+    (argsort based; np.unique hashes these sparse bitmasks slowly)
+    """
+    import numpy as np
+
+    keys = np.asarray(keys)
+    order = np.argsort(keys, kind="stable")
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = keys[order][1:] != keys[order][:-1]
+    return np.sort(order[first])
+
+
+def validate_batch(numbers, reasons=None):
+    """
+    Vectorized checks for an (n, 6) integer array.
+
+    Returns:
+        (sorted, reasons, keys): numbers sorted per row, reason code per row
+        (0 = valid), and a uint64 bitmask per row (bit k set = number k).
+    """
+    import numpy as np
+
+    try:
+        numbers = np.asarray(numbers, dtype=np.int64)
+    except OverflowError:
+        # values past int64 are out of range anyway: 0 flags them as such
+        numbers = np.asarray([[n if abs(n) <= INT64_MAX else 0 for n in row] for row in numbers], dtype=np.int64)
+    numbers = np.sort(numbers.reshape(-1, NUMBERS_PER_TICKET), axis=1)
+    reasons = np.zeros(len(numbers), dtype=np.int8) if reasons is None else np.asarray(reasons, dtype=np.int8).copy()
+    out_of_range = ((numbers < 1) | (numbers > MAX_NUMBER)).any(axis=1)
+    repeated = (np.diff(numbers, axis=1) == 0).any(axis=1)
+    reasons[(reasons == 0) & out_of_range] = 3
+    reasons[(reasons == 0) & repeated] = 4
+    keys = ticket_masks(numbers)
+    keys[reasons != 0] = 0
+    return numbers, reasons, keys
+
+
+def load_tickets(path, limit: int = None, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Streams a ticket file in batches and returns the unique valid tickets.
+    Reading stops once `limit` tickets are collected.
+
+    Returns:
+        {'tickets': [[6 sorted ints], ...], 'invalid': [(line, cells, reason)],
+         'duplicates': int, 'rows': int, 'truncated': bool}
+    """
+    import numpy as np
+
+    result = {"tickets": [], "invalid": [], "duplicates": 0, "rows": 0, "truncated": False}
+    seen = np.empty(0, dtype=np.uint64)
+    rows = iter_rows(path)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        result["rows"] += len(batch)
+        numbers, reasons, keys = validate_batch(*_parse_batch(batch))
+
+        for i in np.flatnonzero(reasons):
+            line_number, cells = batch[i]
+            result["invalid"].append((line_number, cells, REASONS[int(reasons[i])]))
+
+        # first occurrence inside the batch, then not in `seen`
+        # (sorted keys of earlier batches, searched with searchsorted)
+        valid = np.flatnonzero(reasons == 0)
+        unique = valid[first_unique(keys[valid])]
+        if len(seen):
+            position = np.searchsorted(seen, keys[unique])
+            unique = unique[seen[np.minimum(position, len(seen) - 1)] != keys[unique]]
+        result["duplicates"] += len(valid) - len(unique)
+        seen = np.sort(np.concatenate([seen, keys[unique]]))
+
+        room = None if limit is None else limit - len(result["tickets"])
+        result["tickets"].extend(numbers[unique[:room]].tolist())
+        if room is not None and (len(unique) > room or len(result["tickets"]) >= limit):
+            result["truncated"] = len(unique) > room or next(rows, None) is not None
+            break
+    return result
+
+
+def read_manual_numbers(path, limit: int = MAX_GAMES_PER_DRAW) -> list:
+    """
+    Loads manual games from a ticket file for lotto645, printing a summary.
+    Invalid rows abort (fix the file first); duplicates are skipped.
+
+    Raises:
+        TicketFileError: unreadable file or invalid rows
+    """
+    if limit <= 0:
+        print(f"Ticket file {path} ignored: purchase limit already reached")
+        return []
+    result = load_tickets(path, limit)
+    for line_number, cells, reason in result["invalid"][:10]:
+        print(f"  {path}:{line_number}: {reason}: {cells}")
+    if result["invalid"]:
+        raise TicketFileError(f"{len(result['invalid'])} invalid ticket(s) in {path}")
+    print(f"Ticket file {path}: {len(result['tickets'])} game(s) from {result['rows']} row(s), "
+          f"{result['duplicates']} duplicate(s) skipped")
+    if result["truncated"]:
+        print(f"Purchase limit reached ({limit} game(s)); remaining tickets were not read")
+    return result["tickets"]
+
+
+def split_slips(auto_games: int, manual_numbers: list, per_slip: int = MAX_GAMES_PER_SLIP) -> list:
+    """
+    Splits games into purchases of at most per_slip games (auto games first).
+
+    Returns:
+        list of (auto_games, manual_numbers) per slip
+    """
+    games = [None] * auto_games + list(manual_numbers)
+    slips = []
+    for start in range(0, len(games), per_slip):
+        chunk = games[start:start + per_slip]
+        slips.append((sum(g is None for g in chunk), [g for g in chunk if g is not None]))
+    return slips
+
+
+if __name__ == "__main__":
+    # 구매 전에 파일 전체를 한 번 검사 (한도 적용 없이)
+    parser = argparse.ArgumentParser(description="Validate a bulk 6/45 ticket file (CSV or JSONL)")
+    parser.add_argument("file")
+    parser.add_argument("--limit", type=int, help="stop after this many unique tickets")
+    parser.add_argument("--show", action="store_true", help="print the accepted tickets")
+    args = parser.parse_args()
+
+    try:
+        result = load_tickets(args.file, args.limit)
+    except TicketFileError as e:
+        print(e)
+        sys.exit(1)
+    for line_number, cells, reason in result["invalid"]:
+        print(f"{args.file}:{line_number}: {reason}: {cells}")
+    if args.show:
+        for ticket in result["tickets"]:
+            print(" ".join(f"{n:2d}" for n in ticket))
+    print(f"{result['rows']} row(s): {len(result['tickets'])} valid unique, "
+          f"{len(result['invalid'])} invalid, {result['duplicates']} duplicate(s)"
+          + (" (stopped at limit)" if result["truncated"] else ""))
+    print(f"{len(split_slips(0, result['tickets']))} slip(s) of up to {MAX_GAMES_PER_SLIP} game(s)")
+    sys.exit(1 if result["invalid"] else 0)
@@ -0,0 +1,149 @@
+import atexit
+import time
+from contextlib import contextmanager
+from spans import record_span
+
+# Signal-based replacements for fixed time.sleep() calls.
+# Every wait is recorded next to the sleep it replaced so the recovered
+# latency is visible at the end of the run (see report_waits).
+
+DEFAULT_TIMEOUT = 5000  # ms
+
+WAIT_LOG = []
+_report_registered = False
+
+_ARM_MUTATION_JS = """
+([selector, ms, attributes]) => {
+    const target = document.querySelector(selector) || document.body;
+    window.__lottoMutation = new Promise(resolve => {
+        const observer = new MutationObserver(() => { observer.disconnect(); resolve(true); });
+        observer.observe(target, {childList: true, subtree: true, attributes, characterData: true});
+        setTimeout(() => { observer.disconnect(); resolve(false); }, ms);
+    });
+}
+"""
+
+
+@contextmanager
+def _timed(name: str, replaced: float):
+    global _report_registered
+    record = {"name": name, "replaced": replaced, "ok": False}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["elapsed"] = time.perf_counter() - start
+        WAIT_LOG.append(record)
+        record_span("wait", name, record["elapsed"], record["ok"], replaced=replaced)
+        if not _report_registered:
+            atexit.register(report_waits)
+            _report_registered = True
+
+
+def wait_for_dom_change(page, action=None, selector: str = "body", timeout: int = DEFAULT_TIMEOUT,
+                        attributes: bool = False, replaced: float = 0.0, name: str = "dom_change") -> bool:
+    """
+    Waits for the first DOM mutation under selector. The observer is armed
+    before action() runs, so a change caused by the action is never missed.
+    Pass the element the action is expected to change (e.g. the list it fills):
+    unrelated churn elsewhere (timers, banners) would otherwise end the wait.
+    Attribute changes (class toggles) only count with attributes=True.
+    """
+    with _timed(name, replaced) as record:
+        try:
+            page.evaluate(_ARM_MUTATION_JS, [selector, timeout, attributes])
+            if action:
+                action()
+            record["ok"] = bool(page.evaluate("() => window.__lottoMutation"))
+        except Exception as e:
+            print(f"Wait '{name}' failed: {e}")
+        return record["ok"]
+
+
+def wait_for_response(page, url_pattern, action, timeout: int = DEFAULT_TIMEOUT,
+                      replaced: float = 0.0, name: str = "response"):
+    """
+    Runs action() and waits for a response whose URL matches url_pattern
+    (glob, regex or predicate, as in page.expect_response).
+
+    Returns:
+        Response or None on timeout.
+    """
+    with _timed(name, replaced) as record:
+        try:
+            with page.expect_response(url_pattern, timeout=timeout) as response_info:
+                action()
+            record["ok"] = True
+            return response_info.value
+        except Exception as e:
+            print(f"Wait '{name}' failed: {e}")
+            return None
+
+
+def wait_for_selector(page, selector: str, state: str = "visible", timeout: int = DEFAULT_TIMEOUT,
+                      replaced: float = 0.0, name: str = "selector") -> bool:
+    """Waits for selector to reach state (visible, hidden, attached, detached)."""
+    with _timed(name, replaced) as record:
+        try:
+            page.wait_for_selector(selector, state=state, timeout=timeout)
+            record["ok"] = True
+        except Exception as e:
+            print(f"Wait '{name}' failed: {e}")
+        return record["ok"]
+
+
+def wait_for_spinner_gone(page, selector: str = "text=통신중입니다", timeout: int = DEFAULT_TIMEOUT,
+                          replaced: float = 0.0, name: str = "spinner_gone") -> bool:
+    """Waits until the loading indicator is hidden (or was never shown)."""
+    return wait_for_selector(page, selector, state="hidden", timeout=timeout, replaced=replaced, name=name)
+
+
+def wait_for_count_increase(page, selector: str, previous: int, timeout: int = DEFAULT_TIMEOUT,
+                            replaced: float = 0.0, name: str = "count_increase") -> bool:
+    """Waits until more than `previous` elements match selector (e.g. a list grew)."""
+    with _timed(name, replaced) as record:
+        try:
+            page.wait_for_function(
+                "([sel, n]) => document.querySelectorAll(sel).length > n",
+                arg=[selector, previous],
+                timeout=timeout,
+            )
+            record["ok"] = True
+        except Exception as e:
+            print(f"Wait '{name}' failed: {e}")
+        return record["ok"]
+
+
+def wait_for_load_state(page, state: str = "domcontentloaded", timeout: int = DEFAULT_TIMEOUT,
+                        replaced: float = 0.0, name: str = "load_state") -> bool:
+    """Waits for the page to reach a load state (load, domcontentloaded, networkidle)."""
+    with _timed(name, replaced) as record:
+        try:
+            page.wait_for_load_state(state, timeout=timeout)
+            record["ok"] = True
+        except Exception as e:
+            print(f"Wait '{name}' failed: {e}")
+        return record["ok"]
+
+
+def wait_summary() -> dict:
+    waited = sum(r["elapsed"] for r in WAIT_LOG)
+    replaced = sum(r["replaced"] for r in WAIT_LOG)
+    return {
+        "waits": len(WAIT_LOG),
+        "waited_seconds": round(waited, 3),
+        "replaced_seconds": round(replaced, 3),
+        "saved_seconds": round(replaced - waited, 3),
+    }
+
+
+def report_waits():
+    if not WAIT_LOG:
+        return
+    print("Wait timings (actual vs. replaced sleep):")
+    for r in WAIT_LOG:
+        status = "ok" if r["ok"] else "timeout"
+        print(f"  {r['name']:<24} {r['elapsed']:6.3f}s vs {r['replaced']:.1f}s ({status})")
+    s = wait_summary()
+    print(f"  total: {s['waited_seconds']:.3f}s waited, {s['replaced_seconds']:.1f}s of fixed sleeps replaced "
+          f"({s['saved_seconds']:+.3f}s saved)")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from tickets import NUMBERS_PER_TICKET, popcount, ticket_masks
+from draw_history import load_history
+
+# Winning check for held tickets against the stored draw history.
+# 6/45 tickets and draws are 45-bit masks: matches = popcount(ticket & draw)
+# and the bonus hit is one shift, so a ticket x draw grid is a handful of
+# NumPy ops. 720 tickets are a group plus six digits; the prize depends on
+# how many trailing digits match, computed with a cumulative product.
+# Tickets are processed in chunks so tens of thousands of tickets against
+# every stored draw stay within a few MB.
+
+CHUNK_SIZE = 4096
+
+TIERS_645 = {1: "1등", 2: "2등", 3: "3등", 4: "4등", 5: "5등"}
+TIERS_720 = {1: "1등", 2: "2등", 3: "3등", 4: "4등", 5: "5등", 6: "6등", 7: "7등", 8: "보너스"}
+# 고정 당첨금 (6/45 1~3등은 회차별 변동, 720 1·2등·보너스는 연금)
+FIXED_PRIZES_645 = {4: 50000, 5: 5000}
+FIXED_PRIZES_720 = {3: 1000000, 4: 100000, 5: 50000, 6: 5000, 7: 1000}
+NOT_DRAWN = -1
+
+# tier by matches * 2 + bonus hit (0..13)
+_TIER_645 = [0, 0, 0, 0, 0, 0, 5, 5, 4, 4, 3, 2, 1, 1]
+
+
+def tiers_645(masks, draw_masks, bonus):
+    """
+    Prize tier per ticket x draw (0 = no prize). Shapes broadcast, e.g.
+    masks[:, None] against draw_masks[None, :] for a full grid.
+    """
+    import numpy as np
+
+    masks = np.asarray(masks, dtype=np.uint64)
+    draw_masks = np.asarray(draw_masks, dtype=np.uint64)
+    matches = popcount(masks & draw_masks).astype(np.uint8)
+    bonus_hit = (np.right_shift(masks, np.asarray(bonus, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
+    return np.asarray(_TIER_645, dtype=np.int8)[matches * 2 + bonus_hit]
+
+
+def tiers_720(groups, digits, draw_group, draw_digits, bonus_digits):
+    """
+    Prize tier per ticket x draw for 720: 1등 group and all six digits, 2등 six
+    digits in another group, 3~7등 last 5..1 digits, 8 (보너스) all six digits
+    of the bonus number (reported instead of 3~7등, it is worth more).
+    digits are (..., 6) arrays.
+    """
+    import numpy as np
+
+    digits = np.asarray(digits, dtype=np.uint8)
+    # trailing matches: reverse the digit axis, cumulative product of equality
+    same = digits == np.asarray(draw_digits, dtype=np.uint8)
+    trailing = np.cumprod(same[..., ::-1], axis=-1).sum(axis=-1)
+    tier = np.where(trailing > 0, 8 - trailing, 0).astype(np.int8)       # 1자리 7등 ... 6자리 2등
+    tier[(trailing == 6) & (np.asarray(groups) == np.asarray(draw_group))] = 1
+    bonus = (digits == np.asarray(bonus_digits, dtype=np.uint8)).all(axis=-1)
+    tier[bonus & ((tier == 0) | (tier > 2))] = 8
+    return tier
+
+
+def _draw_rows(history, rounds):
+    """History row per ticket round, and which rounds are drawn."""
+    import numpy as np
+
+    rounds = np.asarray(rounds, dtype=np.int64)
+    stored = history["round"].astype(np.int64)
+    rows = np.clip(np.searchsorted(stored, rounds), 0, len(history) - 1)
+    return rows, stored[rows] == rounds
+
+
+def check_645(rounds, numbers, history=None):
+    """
+    Checks each ticket against the draw of its own round.
+
+    Returns:
+        np.ndarray: tier per ticket, NOT_DRAWN (-1) if the round is not stored yet
+    """
+    import numpy as np
+
+    history = load_history("645") if history is None else history
+    tier = np.full(len(rounds), NOT_DRAWN, dtype=np.int8)
+    if not len(history):
+        return tier
+    for start in range(0, len(rounds), CHUNK_SIZE):
+        part = slice(start, start + CHUNK_SIZE)
+        rows, drawn = _draw_rows(history, rounds[part])
+        draws = history[rows]
+        masks = ticket_masks(np.asarray(numbers[part], dtype=np.int64))
+        tier[part] = np.where(drawn, tiers_645(masks, draws["mask"], draws["bonus"]), NOT_DRAWN)
+    return tier
+
+
+def check_720(rounds, groups, digits, history=None):
+    """720 counterpart of check_645 (digits: (n, 6))."""
+    import numpy as np
+
+    history = load_history("720") if history is None else history
+    tier = np.full(len(rounds), NOT_DRAWN, dtype=np.int8)
+    if not len(history):
+        return tier
+    for start in range(0, len(rounds), CHUNK_SIZE):
+        part = slice(start, start + CHUNK_SIZE)
+        rows, drawn = _draw_rows(history, rounds[part])
+        draws = history[rows]
+        result = tiers_720(groups[part], digits[part], draws["group"], draws["numbers"], draws["bonus"])
+        tier[part] = np.where(drawn, result, NOT_DRAWN)
+    return tier
+
+
+def _row_counts(tier, width: int):
+    """Per-row histogram of a (rows, draws) tier grid in one bincount."""
+    import numpy as np
+
+    offsets = np.arange(len(tier), dtype=np.int64)[:, None] * width
+    return np.bincount((tier + offsets).ravel(), minlength=len(tier) * width).reshape(len(tier), width)
+
+
+def tier_counts_645(numbers, history=None) -> "np.ndarray":
+    """
+    Every ticket against every stored draw ("would have won").
+
+    Returns:
+        (n_tickets, 6) counts; column k is how many draws gave tier k (0 = none)
+    """
+    import numpy as np
+
+    history = load_history("645") if history is None else history
+    counts = np.zeros((len(numbers), 6), dtype=np.int64)
+    draw_masks, bonus = history["mask"][None, :], history["bonus"][None, :]
+    for start in range(0, len(numbers), CHUNK_SIZE):
+        masks = ticket_masks(np.asarray(numbers[start:start + CHUNK_SIZE], dtype=np.int64))[:, None]
+        tier = tiers_645(masks, draw_masks, bonus)
+        counts[start:start + len(masks)] = _row_counts(tier, 6)
+    return counts
+
+
+def tier_counts_720(groups, digits, history=None) -> "np.ndarray":
+    """(n_tickets, 9) counts of 720 tiers (0 = none, 8 = 보너스) over every stored draw."""
+    import numpy as np
+
+    history = load_history("720") if history is None else history
+    counts = np.zeros((len(groups), 9), dtype=np.int64)
+    for start in range(0, len(groups), CHUNK_SIZE):
+        part = slice(start, start + CHUNK_SIZE)
+        tier = tiers_720(np.asarray(groups[part])[:, None], np.asarray(digits[part])[:, None, :],
+                         history["group"][None, :], history["numbers"][None, :, :], history["bonus"][None, :, :])
+        counts[part] = _row_counts(tier, 9)
+    return counts
+
+
+# --- held ticket files -------------------------------------------------------
+
+def _read_records(path):
+    path = Path(path)
+    with open(path, newline="") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson", ".json"):
+            for line in f:
+                if line.strip() and not line.lstrip().startswith("#"):
+                    yield json.loads(line)
+        else:
+            for row in csv.reader(f):
+                cells = [c.strip() for c in row if c.strip()]
+                if cells and not cells[0].startswith("#") and any(c[0].isdigit() for c in cells):
+                    yield cells
+
+
+def read_held_645(path, round_number: int = None) -> tuple:
+    """
+    Reads held 6/45 tickets. CSV rows are 'round,n1..n6' or 'n1..n6' (round
+    from round_number); JSONL lines {"round": N, "numbers": [...]}.
+
+    Returns:
+        (rounds, numbers) arrays
+    """
+    import numpy as np
+
+    rounds, numbers = [], []
+    for record in _read_records(path):
+        if isinstance(record, dict):
+            rounds.append(int(record.get("round") or round_number or 0))
+            numbers.append([int(n) for n in record["numbers"]])
+        else:
+            values = [int(v) for v in record]
+            if len(values) == NUMBERS_PER_TICKET + 1:
+                rounds.append(values[0])
+                numbers.append(values[1:])
+            else:
+                rounds.append(round_number or 0)
+                numbers.append(values)
+    return np.array(rounds, dtype=np.int64), np.array(numbers, dtype=np.int64).reshape(-1, NUMBERS_PER_TICKET)
+
+
+def parse_720(ticket: str) -> tuple:
+    """'3조 123456' / '3,123456' -> (group, [6 digits])"""
+    match = re.search(r"(\d)\s*(?:조|,)?\s*(\d{6})", str(ticket))
+    if not match:
+        raise ValueError(f"Not a 720 ticket: {ticket}")
+    return int(match.group(1)), [int(d) for d in match.group(2)]
+
+
+def read_held_720(path, round_number: int = None) -> tuple:
+    """
+    Reads held 720 tickets: CSV 'round,group,digits' or 'group,digits',
+    JSONL {"round": N, "ticket": "3조 123456"} or {"round", "group", "numbers"}.
+
+    Returns:
+        (rounds, groups, digits) arrays
+    """
+    import numpy as np
+
+    rounds, groups, digits = [], [], []
+    for record in _read_records(path):
+        if isinstance(record, dict):
+            ticket = record.get("ticket") or f"{record['group']},{record['numbers']}"
+            round_value = record.get("round") or round_number or 0
+        else:
+            round_value = record[0] if len(record) == 3 else (round_number or 0)
+            ticket = ",".join(record[-2:])
+        group, six = parse_720(ticket)
+        rounds.append(int(round_value))
+        groups.append(group)
+        digits.append(six)
+    return (np.array(rounds, dtype=np.int64), np.array(groups, dtype=np.uint8),
+            np.array(digits, dtype=np.uint8).reshape(-1, 6))
+
+
+def read_ledger(game: str, recheck: bool = False) -> tuple:
+    """
+    Held tickets from the purchase ledger (only unchecked ones unless recheck).
+
+    Returns:
+        (ids, rounds, numbers) for 645, (ids, rounds, groups, digits) for 720
+    """
+    import numpy as np
+    from ledger import Ledger
+
+    with Ledger() as ledger:
+        rows = ledger.tickets(game, unchecked_only=not recheck)
+    ids = np.array([row["id"] for row in rows], dtype=np.int64)
+    rounds = np.array([row["round"] for row in rows], dtype=np.int64)
+    if game == "645":
+        numbers = np.array([row["numbers"].split() for row in rows], dtype=np.int64).reshape(-1, NUMBERS_PER_TICKET)
+        return ids, rounds, numbers
+    groups = np.array([row["grp"] for row in rows], dtype=np.uint8)
+    digits = np.array([list(row["numbers"]) for row in rows], dtype=np.uint8).reshape(-1, 6)
+    return ids, rounds, groups, digits
+
+
+def store_tiers(ids, tier):
+    """Writes checked tiers back to the ledger (drawn rounds only)."""
+    from ledger import Ledger
+
+    drawn = tier != NOT_DRAWN
+    with Ledger() as ledger:
+        ledger.set_tiers(ids[drawn].tolist(), tier[drawn].tolist())
+    return int(drawn.sum())
+
+
+def summarize(tier, labels: dict, fixed: dict) -> dict:
+    import numpy as np
+
+    tier = np.asarray(tier)
+    summary = {label: int((tier == k).sum()) for k, label in labels.items()}
+    summary["미추첨"] = int((tier == NOT_DRAWN).sum())
+    summary["fixed_prize_total"] = int(sum(fixed.get(k, 0) * int((tier == k).sum()) for k in labels))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check held 6/45 or 720 tickets against the draw history")
+    parser.add_argument("game", choices=["645", "720"])
+    parser.add_argument("file", nargs="?", help="held tickets (CSV/JSONL, see read_held_645 / read_held_720)")
+    parser.add_argument("--ledger", action="store_true", help="check tickets in the purchase ledger and store the tiers")
+    parser.add_argument("--recheck", action="store_true", help="with --ledger: include tickets already checked")
+    parser.add_argument("--round", type=int, help="round for rows without one")
+    parser.add_argument("--all-draws", action="store_true", help="check every ticket against every stored draw")
+    parser.add_argument("--show", action="store_true", help="print winning tickets")
+    args = parser.parse_args()
+    if not args.file and not args.ledger:
+        parser.error("a ticket file or --ledger is required")
+
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    try:
+        if args.ledger:
+            ids, rounds, *tickets = read_ledger(args.game, args.recheck or args.all_draws)
+        elif args.game == "645":
+            rounds, *tickets = read_held_645(args.file, args.round)
+        else:
+            rounds, *tickets = read_held_720(args.file, args.round)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.game == "645":
+        numbers, = tickets
+    else:
+        groups, digits = tickets
+
+    history = load_history(args.game)
+    labels = TIERS_645 if args.game == "645" else TIERS_720
+    start = time.perf_counter()
+    if args.all_draws:
+        counts = tier_counts_645(numbers, history) if args.game == "645" else tier_counts_720(groups, digits, history)
+        elapsed = time.perf_counter() - start
+        print(f"{len(counts)} ticket(s) x {len(history)} draw(s) in {elapsed * 1000:.1f} ms")
+        print("  " + ", ".join(f"{label}: {int(counts[:, k].sum())}" for k, label in labels.items()))
+        if args.show:
+            for i in range(len(counts)):
+                won = {label: int(counts[i, k]) for k, label in labels.items() if counts[i, k]}
+                if won:
+                    ticket = numbers[i].tolist() if args.game == "645" else f"{groups[i]}조 {''.join(map(str, digits[i]))}"
+                    print(f"  {ticket}: {won}")
+        sys.exit(0)
+
+    tier = check_645(rounds, numbers, history) if args.game == "645" else check_720(rounds, groups, digits, history)
+    elapsed = time.perf_counter() - start
+    fixed = FIXED_PRIZES_645 if args.game == "645" else FIXED_PRIZES_720
+    print(f"{len(tier)} ticket(s) checked in {elapsed * 1000:.1f} ms: {summarize(tier, labels, fixed)}")
+    if args.ledger:
+        print(f"Ledger: stored tiers for {store_tiers(ids, tier)} ticket(s)")
+    if args.show:
+        for i in (tier > 0).nonzero()[0]:
+            ticket = numbers[i].tolist() if args.game == "645" else f"{groups[i]}조 {''.join(map(str, digits[i]))}"
+            print(f"  {rounds[i]}회 {ticket}: {labels[int(tier[i])]}")
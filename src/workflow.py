@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import traceback
+from pathlib import Path
+from playwright.sync_api import Playwright, sync_playwright
+from login import ensure_session, new_context, launch_browser, setup_dialog_handler, SESSION_PATH
+from balance import get_balance
+from charge import charge_deposit
+import lotto645
+import lotto720
+
+from spans import TimedReporter
+
+# .env loading is handled by login module import
+
+MIN_REQUIRED = 10000   # 충전 기준 금액
+CHARGE_AMOUNT = 10000  # 잔액 부족 시 충전 금액
+
+
+def parse_arguments():
+    """
+    커맨드라인 인자를 파싱합니다.
+
+    사용법:
+    - 전체 실행:      ./workflow.py
+    - 720 제외:       ./workflow.py --skip-720
+    - 645 제외:       ./workflow.py --skip-645
+    """
+    parser = argparse.ArgumentParser(description="Lotto purchase workflow (single browser)")
+    parser.add_argument("--skip-720", action="store_true", help="연금복권 720 구매 건너뛰기")
+    parser.add_argument("--skip-645", action="store_true", help="로또 6/45 구매 건너뛰기")
+    return parser.parse_args()
+
+
+def run(playwright: Playwright, sr: TimedReporter, buy_720: bool = True, buy_645: bool = True) -> dict:
+    """
+    하나의 브라우저/컨텍스트/페이지에서 전체 워크플로우를 실행합니다.
+    잔액 확인 -> 조건부 충전 -> 연금복권 720 -> 로또 6/45
+    """
+    HEADLESS = os.environ.get('HEADLESS', 'true').lower() == 'true'
+    browser = launch_browser(playwright, headless=HEADLESS, slow_mo=0 if HEADLESS else 500)
+
+    # Load session if exists
+    storage_state = SESSION_PATH if Path(SESSION_PATH).exists() else None
+    context = new_context(browser, storage_state, har_name="workflow")
+
+    try:
+        page = context.new_page()
+        setup_dialog_handler(page)
+
+        # Step 0: Session check (once for the whole pipeline)
+        sr.stage("CHECK_SESSION")
+        ensure_session(page, sr)
+
+        # Step 1: Check balance
+        sr.stage("GET_BALANCE")
+        balance_info = get_balance(page)
+        print(f"Available Amount: {balance_info['available_amount']:,}")
+        summary = {"available_amount": balance_info['available_amount']}
+
+        # Step 2: Charge if needed
+        if balance_info['available_amount'] < MIN_REQUIRED:
+            print(f"Balance low (₩{balance_info['available_amount']:,}). Charging ₩{CHARGE_AMOUNT:,}...")
+            sr.stage("CHARGE")
+            if not charge_deposit(page, CHARGE_AMOUNT):
+                raise Exception("Charge failed verification")
+            summary["charged"] = CHARGE_AMOUNT
+
+            print("Updating balance after charge...")
+            sr.stage("GET_BALANCE")
+            balance_info = get_balance(page)
+            print(f"Available Amount: {balance_info['available_amount']:,}")
+            summary["available_amount"] = balance_info['available_amount']
+
+        # Step 3: Buy Lotto 720
+        if buy_720:
+            print("Buying Lotto 720...")
+            summary["lotto720"] = lotto720.purchase(page, sr)
+            # Remaining balance from the purchase response
+            summary["available_amount"] = summary["lotto720"].get("balance", summary["available_amount"])
+        else:
+            print("Skipping Lotto 720")
+
+        # Step 4: Buy Lotto 645
+        if buy_645:
+            print("Buying Lotto 645...")
+            auto_games, manual_numbers = lotto645.load_game_config()
+            summary["lotto645"] = lotto645.purchase_slips(page, auto_games, manual_numbers, sr)
+            summary["available_amount"] = summary["lotto645"].get("balance", summary["available_amount"])
+        else:
+            print("Skipping Lotto 645")
+
+        return summary
+    finally:
+        context.close()
+        browser.close()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    sr = TimedReporter("Lotto Workflow")
+    try:
+        with sync_playwright() as playwright:
+            summary = run(playwright, sr, buy_720=not args.skip_720, buy_645=not args.skip_645)
+            sr.success(summary)
+    except Exception:
+        sr.fail(traceback.format_exc())
+        sys.exit(1)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import pytest
+
+import draw_history
+from draw_history import GAMES, load_history, update
+from mock_site import MockSite
+
+HISTORY_PATHS = {
+    "645": "/common.do?method=getLottoNumber&drwNo={round}",
+    "720": "/pt720/winning.json?round={round}",
+}
+PUBLISHED = 5
+
+
+def after_round(game: str, round_number: int):
+    """A moment shortly after the given round's draw."""
+    return GAMES[game]["first"] + timedelta(weeks=round_number - 1, hours=1)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    with MockSite(history_rounds={"645": PUBLISHED, "720": PUBLISHED}) as site:
+        monkeypatch.setenv("HISTORY_DIR", str(tmp_path))
+        for game, path in HISTORY_PATHS.items():
+            monkeypatch.setenv(f"LOTTO{game}_HISTORY_URL", site.base_url + path)
+        yield site
+
+
+@pytest.mark.parametrize("game", ["645", "720"])
+def test_first_fetch_stores_every_published_round(site, game):
+    assert update(game, now=after_round(game, PUBLISHED)) == PUBLISHED
+
+    history = load_history(game)
+    assert list(history["round"]) == list(range(1, PUBLISHED + 1))
+    if game == "645":
+        for row in history:
+            assert row["mask"] == sum(1 << int(n) for n in row["numbers"])
+    assert site.stats[f"history_{game}"] == PUBLISHED
+
+
+def test_up_to_date_history_makes_no_request(site):
+    now = after_round("645", PUBLISHED)
+    update("645", now=now)
+    requests = site.stats["history_645"]
+
+    assert update("645", now=now) == 0
+    assert site.stats["history_645"] == requests
+    assert len(load_history("645")) == PUBLISHED
+
+
+def test_unpublished_round_is_revalidated_with_etag(site, monkeypatch):
+    # The calendar says round 6 is drawn but the site has not published it yet
+    now = after_round("645", PUBLISHED + 1)
+    assert update("645", now=now) == PUBLISHED
+    requests = site.stats["history_645"]
+
+    # "not published" is remembered (missing_at): no request within RETRY_AFTER_SECONDS
+    assert update("645", now=now) == 0
+    assert site.stats["history_645"] == requests
+
+    # Once the retry window passes, the round is asked again with If-None-Match
+    monkeypatch.setattr(draw_history, "RETRY_AFTER_SECONDS", 0)
+    assert update("645", now=now) == 0
+    assert site.stats["history_645"] == requests + 1
+    assert site.stats["history_not_modified"] == 1
+
+    # Published now: the ETag no longer matches and the round is stored
+    site.history_rounds["645"] = PUBLISHED + 1
+    assert update("645", now=now) == 1
+    assert int(load_history("645")["round"][-1]) == PUBLISHED + 1
+    assert site.stats["history_not_modified"] == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from ledger import Ledger
+
+
+@pytest.fixture
+def ledger():
+    with Ledger(":memory:") as ledger:
+        yield ledger
+
+
+def test_record_purchase_stores_tickets(ledger):
+    tickets = [{"slot": "A", "mode": "자동", "numbers": [6, 5, 4, 3, 2, 1]},
+               {"slot": "B", "mode": "수동", "numbers": [7, 8, 9, 10, 11, 12]}]
+
+    purchase_id = ledger.record_purchase("645", 1100, tickets, purchased_at="2026-01-03T20:00:00")
+
+    purchase = ledger.conn.execute("SELECT * FROM purchases WHERE id = ?", (purchase_id,)).fetchone()
+    assert (purchase["cost"], purchase["ticket_count"]) == (2000, 2)
+    rows = ledger.tickets("645")
+    assert [row["numbers"] for row in rows] == ["1 2 3 4 5 6", "7 8 9 10 11 12"]
+    assert ledger.spend() == [{"game": "645", "month": "2026-01", "purchases": 1, "tickets": 2, "cost": 2000}]
+
+
+def test_duplicates_match_the_round_only(ledger):
+    ledger.record_purchase("645", 1100, [{"numbers": [1, 2, 3, 4, 5, 6]}])
+
+    assert ledger.duplicates(1100, [[6, 5, 4, 3, 2, 1], [1, 2, 3, 4, 5, 7]]) == [[1, 2, 3, 4, 5, 6]]
+    assert ledger.duplicates(1101, [[1, 2, 3, 4, 5, 6]]) == []
+    assert ledger.duplicates(1100, []) == []
+
+
+def test_set_tiers_marks_tickets_checked(ledger):
+    ledger.record_purchase("645", 1100, [{"numbers": [1, 2, 3, 4, 5, 6]}, {"numbers": [1, 2, 3, 4, 5, 7]}])
+    ledger.record_purchase("720", 300, [{"group": 3, "numbers": "012345"}])
+    ids = [row["id"] for row in ledger.tickets("645")]
+
+    ledger.set_tiers(ids, [0, 3])
+
+    assert ledger.tickets("645", unchecked_only=True) == []
+    assert [row["numbers"] for row in ledger.tickets("720", unchecked_only=True)] == ["012345"]
+    assert [(w["numbers"], w["tier"]) for w in ledger.winners()] == [("1 2 3 4 5 7", 3)]
@@ -0,0 +1,57 @@
+import pytest
+
+from number_gen import generate
+from tickets import popcount, ticket_masks
+
+
+def test_rules_hold_for_every_game():
+    games = generate(20, exclude=[1, 2, 3], include=[7], sum_range=(100, 160), odd=(2, 4), seed=1)
+
+    assert len(games) == 20
+    assert len({tuple(g) for g in games}) == 20
+    for game in games:
+        assert game == sorted(game) and len(set(game)) == 6
+        assert all(1 <= n <= 45 for n in game)
+        assert 7 in game and not {1, 2, 3} & set(game)
+        assert 100 <= sum(game) <= 160
+        assert 2 <= sum(n % 2 for n in game) <= 4
+
+
+def test_min_distance_between_games():
+    games = generate(10, min_distance=8, seed=2)
+    masks = ticket_masks(games)
+
+    for i in range(len(masks)):
+        for j in range(i):
+            assert int(popcount(masks[i] ^ masks[j])) >= 8
+
+
+def test_past_combinations_are_skipped():
+    past = generate(30, include=[1, 2, 3, 4, 5], seed=3)
+
+    games = generate(10, include=[1, 2, 3, 4, 5], past=past, seed=4)
+
+    assert len(games) == 10
+    assert not {tuple(g) for g in games} & {tuple(g) for g in past}
+
+
+def test_same_seed_same_games():
+    assert generate(5, seed=5) == generate(5, seed=5)
+
+
+@pytest.mark.parametrize("rules", [
+    {"include": [1], "exclude": [1]},
+    {"include": [1, 2, 3, 4, 5, 6, 7]},
+    {"exclude": list(range(1, 41))},
+    {"include": [46]},
+    {"sum_range": (1, 20)},
+])
+def test_impossible_rules_raise(rules):
+    with pytest.raises(ValueError):
+        generate(5, seed=6, **rules)
+
+
+def test_too_few_combinations_raise():
+    # 5 required numbers leave 40 possible games
+    with pytest.raises(ValueError):
+        generate(41, include=[1, 2, 3, 4, 5], seed=7)
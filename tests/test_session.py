@@ -0,0 +1,66 @@
+import pytest
+
+from session import session_fingerprint, session_status
+
+NOW = 1_800_000_000.0
+DAY = 86400
+
+
+def cookies(expires=NOW + DAY, domain=".dhlottery.co.kr"):
+    return [{"name": "JSESSIONID", "value": "abc", "domain": domain, "expires": expires}]
+
+
+def meta(cookie_list, verified_ago):
+    return {"verified_at": NOW - verified_ago, "fingerprint": session_fingerprint(cookie_list)}
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setenv("SESSION_FRESH_SECONDS", "600")
+    monkeypatch.setenv("SESSION_REFRESH_MARGIN", "3600")
+    monkeypatch.setenv("SESSION_IDLE_SECONDS", "0")
+
+
+def state(cookie_list, meta_data=None):
+    return session_status(cookie_list, meta=meta_data or {}, now=NOW)["state"]
+
+
+def test_missing_without_site_cookies():
+    assert state([]) == "missing"
+    assert state(cookies(domain=".example.com")) == "missing"
+
+
+def test_recently_verified_is_fresh():
+    jar = cookies()
+
+    assert state(jar, meta(jar, 60)) == "fresh"
+    assert state(jar, meta(jar, 601)) == "verify"
+
+
+def test_metadata_of_another_session_is_ignored():
+    other = cookies() + [{"name": "x", "value": "y", "domain": "dhlottery.co.kr"}]
+
+    assert state(cookies(), meta(other, 60)) == "verify"
+
+
+def test_unverified_session_needs_a_check():
+    assert state(cookies()) == "verify"
+    # session cookies without expiry
+    assert state(cookies(expires=-1)) == "verify"
+
+
+def test_expired_or_expiring_needs_refresh():
+    assert state(cookies(expires=NOW - 1)) == "refresh"
+    assert state(cookies(expires=NOW + 600)) == "refresh"
+    jar = cookies(expires=NOW + 600)
+    assert state(jar, meta(jar, 10)) == "refresh"
+
+
+def test_idle_timeout_expires_verified_session(monkeypatch):
+    monkeypatch.setenv("SESSION_IDLE_SECONDS", "1800")
+    jar = cookies()
+
+    assert state(jar, meta(jar, 60)) == "refresh"         # idle expiry within the margin
+    monkeypatch.setenv("SESSION_REFRESH_MARGIN", "60")
+    assert state(jar, meta(jar, 60)) == "fresh"
+    assert state(jar, meta(jar, 1900)) == "refresh"
@@ -0,0 +1,54 @@
+import pytest
+
+from tickets import REASONS, load_tickets, validate_batch
+
+HUGE = "99999999999999999999"
+
+
+@pytest.mark.parametrize("name, content", [
+    ("tickets.csv", f"1,2,3,4,5,6\n{HUGE},1,2,3,4,5\n"),
+    ("tickets.jsonl", f"[1,2,3,4,5,6]\n{{\"numbers\": [{HUGE},1,2,3,4,5]}}\n"),
+])
+def test_huge_number_is_out_of_range(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+
+    result = load_tickets(str(path))
+
+    assert result["tickets"] == [[1, 2, 3, 4, 5, 6]]
+    assert [(line, reason) for line, _, reason in result["invalid"]] == [(2, REASONS[3])]
+
+
+def test_validate_batch_accepts_huge_ints():
+    reasons = validate_batch([[int(HUGE), 1, 2, 3, 4, 5], [1, 2, 3, 4, 5, 6]])[1]
+
+    assert list(reasons) == [3, 0]
+
+
+def test_reason_codes():
+    numbers = [
+        [6, 5, 4, 3, 2, 1],
+        [0, 1, 2, 3, 4, 5],
+        [1, 2, 3, 4, 5, 46],
+        [1, 1, 2, 3, 4, 5],
+        [1, 2, 3, 4, 5, 6],
+    ]
+    reasons = validate_batch(numbers)[1]
+
+    assert list(reasons) == [0, 3, 3, 4, 0]
+
+
+def test_earlier_reason_is_kept():
+    reasons = validate_batch([[0, 0, 0, 0, 0, 0]], reasons=[2])[1]
+
+    assert list(reasons) == [2]
+
+
+def test_duplicate_tickets_are_dropped(tmp_path):
+    path = tmp_path / "tickets.csv"
+    path.write_text("1,2,3,4,5,6\n6,5,4,3,2,1\n1,2,3,4,5,7\n")
+
+    result = load_tickets(str(path))
+
+    assert result["tickets"] == [[1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 7]]
+    assert result["duplicates"] == 1
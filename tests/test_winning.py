@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from tickets import ticket_masks
+from winning import tiers_645, tiers_720
+
+DRAW = [1, 2, 3, 4, 5, 6]
+BONUS = 7
+
+
+@pytest.mark.parametrize("ticket, tier", [
+    ([1, 2, 3, 4, 5, 6], 1),
+    ([1, 2, 3, 4, 5, 7], 2),      # 5 + bonus
+    ([1, 2, 3, 4, 5, 8], 3),
+    ([1, 2, 3, 4, 7, 8], 4),      # 4 + bonus is still 4등
+    ([1, 2, 3, 4, 8, 9], 4),
+    ([1, 2, 3, 7, 8, 9], 5),
+    ([1, 2, 3, 8, 9, 10], 5),
+    ([1, 2, 7, 8, 9, 10], 0),
+    ([40, 41, 42, 43, 44, 45], 0),
+])
+def test_tiers_645(ticket, tier):
+    draw_mask = ticket_masks([DRAW])[0]
+
+    assert int(tiers_645(ticket_masks([ticket]), draw_mask, BONUS)[0]) == tier
+
+
+def test_tiers_645_grid():
+    masks = ticket_masks([[1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 7]])
+    draws = ticket_masks([DRAW, [1, 2, 3, 4, 5, 7]])
+
+    grid = tiers_645(masks[:, None], draws[None, :], np.array([BONUS, 6]))
+
+    assert grid.tolist() == [[1, 2], [2, 1]]
+
+
+def digits(text):
+    return [int(c) for c in text]
+
+
+@pytest.mark.parametrize("group, number, tier", [
+    (3, "123456", 1),
+    (1, "123456", 2),
+    (3, "023456", 3),
+    (3, "003456", 4),
+    (3, "000456", 5),
+    (3, "000056", 6),
+    (3, "000006", 7),
+    (3, "123450", 0),
+    (1, "654321", 8),             # all six bonus digits, any group
+    (1, "054321", 0),
+])
+def test_tiers_720(group, number, tier):
+    result = tiers_720(np.array([group]), np.array([digits(number)]), 3, digits("123456"), digits("654321"))
+
+    assert int(result[0]) == tier
+
+
+def test_720_bonus_beats_lower_tiers_only():
+    # a ticket matching the bonus and the last digit of the draw is 보너스, not 7등
+    result = tiers_720(np.array([1, 3]), np.array([digits("654326"), digits("123456")]), 3,
+                       digits("123456"), digits("654326"))
+
+    assert result.tolist() == [8, 1]